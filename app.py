@@ -1,8 +1,10 @@
 """PrepMaster AI — multi-page exam simulator."""
+import copy
 import random
 import sys
+import time
+import uuid
 from pathlib import Path
-from datetime import datetime, timedelta
 
 # Ensure project root is in path
 project_root = Path(__file__).resolve().parent
@@ -10,12 +12,217 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 import streamlit as st
+import streamlit.components.v1 as components
+from streamlit_autorefresh import st_autorefresh
 
-from db import get_question_counts, get_questions_by_category, get_questions_by_subcategory, get_subcategory_counts, get_subcategories_by_category
+from db import get_question_counts, get_question_by_id, get_questions_by_category, get_mock_test_questions, get_questions_by_subcategory, get_subcategory_stats, get_subcategories_by_category
 from engine import EXAM_TOTAL, GAT_RATIO, SUBJECT_RATIO, CORRECT_SCORE, INCORRECT_SCORE, SKIPPED_SCORE, EXAM_DURATION_MINUTES
-from src.mcq_discovery import get_low_count_subcategories, get_sources_for_subcategory, format_subcategory_name
 
 st.set_page_config(page_title="PrepMaster AI", layout="wide")
+
+# "A. ".."J. " — options are capped at 10 everywhere
+_LABEL_PREFIX = tuple(f"{c}. " for c in "ABCDEFGHIJ")
+
+# Session-state defaults per page; mutable values are copied on init/reset so sessions never share them.
+_TEST_DEFAULTS = {
+    "test_started": False,
+    "test_questions": [],
+    "test_answers": {},  # q_index -> selected_index (-1 = skipped)
+    "test_start_ts": None,  # time.monotonic() at exam start
+    "test_key": None,  # per-test id; the browser countdown keys its end time on it
+    "test_submitted": False,
+    "answered_count": 0,
+    "progress_shown": 0,  # answered_count the sidebar progress was last drawn with
+    "current_q": 0,
+    "_opt_cache": {},  # q_index -> radio labels; options never change during a test
+}
+_DRILL_SESSION_DEFAULTS = {
+    "q_ids": [],  # bodies live in the _drill_question cache
+    "current_idx": 0,
+    "answers": {},  # {question_id: selected_idx}
+    "started": False,
+}
+_DRILL_DEFAULTS = {
+    "category": None,
+    "subcategory": None,
+    "show_discovery": False,
+    **_DRILL_SESSION_DEFAULTS,
+}
+
+
+def _init_state(defaults: dict, state=None):
+    state = st.session_state if state is None else state
+    for k, v in defaults.items():
+        state.setdefault(k, copy.copy(v))
+
+
+def _reset_state(defaults: dict, state=None):
+    state = st.session_state if state is None else state
+    state.update({k: copy.copy(v) for k, v in defaults.items()})
+
+
+
+@st.cache_resource
+def _mcq_discovery():
+    """Drill Mode-only module, imported on first use so Dashboard/Mock Test cold starts skip it."""
+    from src import mcq_discovery
+    return mcq_discovery
+
+
+# Counts change only on import/scrape runs; serve reruns from cache instead of hitting Supabase.
+# (get_question_counts is cached in db.)
+@st.cache_data(ttl=300)
+def _cached_subcategories(category: str):
+    return get_subcategories_by_category(category)
+
+
+@st.cache_data(ttl=300)
+def _cached_subcategory_stats(category: str):
+    return get_subcategory_stats(category, low_threshold=20)
+
+
+@st.cache_data(ttl=3600)
+def _sources(sub_category: str):
+    return _mcq_discovery().get_sources_for_subcategory(sub_category)
+
+
+@st.cache_data
+def _build_subcategory_options(category: str, subcategories: tuple, counts_items: tuple, low_keys: frozenset):
+    """Selectbox rows (sub, display_name, count, is_low), rebuilt only when the counts snapshot changes."""
+    format_subcategory_name = _mcq_discovery().format_subcategory_name
+    counts = dict(counts_items)
+    options = []
+    for sub in sorted(subcategories):
+        count = counts.get(sub, 0)
+        is_low = sub in low_keys
+        if is_low:
+            display_name = f"{format_subcategory_name(sub)} ({count} questions) ⚠️ Low count"
+        else:
+            display_name = f"{format_subcategory_name(sub)} ({count} questions)"
+        options.append((sub, display_name, count, is_low))
+    return options
+
+
+# Drill bodies by id, shared across sessions so Drill Mode session state only holds ids. Bounded, and on the same
+# 5 min TTL as db's question reads so rows edited by the importer/fix scripts are picked up.
+QUESTION_CACHE_TTL = 300
+QUESTION_CACHE_MAX_ENTRIES = 5000
+
+
+def _attach_valid_opts(q: dict) -> dict:
+    """Precompute [(option_idx, text)] for non-empty options (first 10) so render paths skip the filtering."""
+    q["_valid_opts"] = [(i, opt) for i, opt in enumerate((q.get("options") or [])[:10]) if opt]
+    return q
+
+
+@st.cache_data(ttl=QUESTION_CACHE_TTL, max_entries=QUESTION_CACHE_MAX_ENTRIES, show_spinner=False)
+def _drill_question(q_id: str, _body: dict | None = None) -> dict | None:
+    """Body for q_id, or None if the row is gone. _body (not hashed) seeds the entry with an already-fetched row."""
+    q = _body if _body is not None else get_question_by_id(q_id)
+    return _attach_valid_opts(q) if q else None
+
+
+def _start_drill(questions_list: list[dict]):
+    """Cache the fetched bodies and begin a practice session over their ids."""
+    for q in questions_list:
+        _drill_question(q["id"], _body=q)
+    drill = st.session_state["drill"]
+    _reset_state(_DRILL_SESSION_DEFAULTS, drill)
+    drill["q_ids"] = [q["id"] for q in questions_list]
+    drill["started"] = True
+
+
+def _build_opt_labels(q: dict):
+    """Mock Test radio labels: 0 = Skip, 1..N = A, B, C, ... (up to 10 options). Radio k maps to answer k-1."""
+    options = q.get("options") or []
+    n_opts = min(len(options), 10)
+    return ["— Skip —"] + [_LABEL_PREFIX[i] + (options[i] or "")[:80] for i in range(n_opts)]
+
+
+# Ticks in the browser so the timer never needs a script rerun. Only the fixed duration and the test's key are templated
+# in, so the markup is identical on every rerun and the frontend keeps the mounted iframe instead of rebuilding it. The end
+# time is taken from the browser's own clock on first mount and kept in sessionStorage, so client clock skew doesn't matter.
+_COUNTDOWN_HTML = """
+<div style="font-family:sans-serif">
+  <div style="font-size:0.875rem;color:#808495">Time left</div>
+  <div id="t" style="font-size:1.75rem"></div>
+</div>
+<script>
+  const key = "prepmaster-countdown-{test_key}";
+  let end = NaN;
+  try {{ end = Number(sessionStorage.getItem(key)); }} catch (e) {{}}
+  if (!end) {{
+    end = Date.now() + {duration_s} * 1000;
+    try {{ sessionStorage.setItem(key, String(end)); }} catch (e) {{}}
+  }}
+  const el = document.getElementById("t");
+  const tick = () => {{
+    const left = Math.max(0, Math.round((end - Date.now()) / 1000));
+    el.textContent = Math.floor(left / 60) + ":" + String(left % 60).padStart(2, "0");
+    if (left === 0) clearInterval(timer);
+  }};
+  tick();
+  const timer = setInterval(tick, 1000);
+</script>
+"""
+
+
+def _update_answer(idx: int):
+    """Radio on_change: record the answer and keep answered_count in step (radio 0 = skip, k = option k-1)."""
+    answers = st.session_state["test_answers"]
+    prev = answers.get(idx, -1)
+    new = st.session_state[f"q_{idx}"] - 1
+    st.session_state["answered_count"] += (new >= 0) - (prev >= 0)
+    answers[idx] = new
+
+
+@st.fragment
+def _render_question():
+    """Current mock test question with Previous/Next. Its widgets rerun only this fragment, not the page."""
+    # The sidebar progress is outside the fragment: redraw the page once the answered count actually changes
+    if st.session_state["answered_count"] != st.session_state["progress_shown"]:
+        st.rerun()
+    questions = st.session_state["test_questions"]
+    answers = st.session_state["test_answers"]
+    n = len(questions)
+    idx = st.session_state["current_q"]
+    q = questions[idx]
+
+    st.subheader(f"Question {idx + 1} of {n}")
+    st.write(q.get("text", ""))
+
+    # Radio labels are built once per question (selected 0 -> -1, 1 -> 0, etc.)
+    opt_cache = st.session_state["_opt_cache"]
+    opt_labels = opt_cache.get(idx)
+    if opt_labels is None:
+        opt_labels = opt_cache[idx] = _build_opt_labels(q)
+    n_opts = len(opt_labels) - 1
+    ans = answers.get(idx, -1)
+    key = f"q_{idx}"
+    st.radio(
+        "Choose one:",
+        range(len(opt_labels)),
+        format_func=lambda i: opt_labels[i] if i < len(opt_labels) else "",
+        key=key,
+        index=ans + 1 if 0 <= ans < n_opts else 0,
+        on_change=_update_answer,
+        args=(idx,),
+    )
+    # Prebuild the next question's view so the Next rerun skips it
+    if idx < n - 1 and idx + 1 not in opt_cache:
+        opt_cache[idx + 1] = _build_opt_labels(questions[idx + 1])
+
+    col1, col2, _ = st.columns([1, 1, 2])
+    with col1:
+        if st.button("Previous") and idx > 0:
+            st.session_state["current_q"] = idx - 1
+            st.rerun(scope="fragment")
+    with col2:
+        if st.button("Next") and idx < n - 1:
+            st.session_state["current_q"] = idx + 1
+            st.rerun(scope="fragment")
+
+
 st.sidebar.title("PrepMaster AI")
 # Allow URL to open a specific page (e.g. after "Start Mock Test")
 default_page = st.query_params.get("page", "Dashboard")
@@ -47,35 +254,26 @@ elif page == "Mock Test":
     st.header("Mock Test")
     st.caption("100 MCQs (70% GAT, 30% Subject) · 120 minutes · Correct +1, Wrong -0.25, Skip 0")
 
-    # Initialize session state for the test
-    if "test_started" not in st.session_state:
-        st.session_state["test_started"] = False
-    if "test_questions" not in st.session_state:
-        st.session_state["test_questions"] = []
-    if "test_answers" not in st.session_state:
-        st.session_state["test_answers"] = {}  # q_index -> selected_index (-1 = skipped)
-    if "test_start_time" not in st.session_state:
-        st.session_state["test_start_time"] = None
-    if "test_submitted" not in st.session_state:
-        st.session_state["test_submitted"] = False
+    _init_state(_TEST_DEFAULTS)
 
     if not st.session_state["test_started"] and not st.session_state["test_submitted"]:
         if st.button("Start exam"):
             try:
                 n_gat = int(EXAM_TOTAL * GAT_RATIO)
                 n_subject = int(EXAM_TOTAL * SUBJECT_RATIO)
-                gat = get_questions_by_category("gat", limit=n_gat * 2).data or []
-                subj = get_questions_by_category("subject", limit=n_subject * 2).data or []
-                if len(gat) < n_gat or len(subj) < n_subject:
-                    st.warning(f"Need at least {n_gat} GAT and {n_subject} Subject questions in DB. Found GAT={len(gat)}, Subject={len(subj)}.")
+                picked = get_mock_test_questions(n_gat, n_subject)
+                found_gat = sum(1 for q in picked if q.get("category") == "gat")
+                found_subj = len(picked) - found_gat
+                if found_gat < n_gat or found_subj < n_subject:
+                    st.warning(f"Need at least {n_gat} GAT and {n_subject} Subject questions in DB. Found GAT={found_gat}, Subject={found_subj}.")
                 else:
-                    picked_gat = random.sample(gat, n_gat)
-                    picked_subj = random.sample(subj, n_subject)
-                    st.session_state["test_questions"] = picked_gat + picked_subj
-                    random.shuffle(st.session_state["test_questions"])
+                    # Rows are already randomly sampled server-side; one shuffle interleaves the categories
+                    random.shuffle(picked)
+                    _reset_state(_TEST_DEFAULTS)
+                    st.session_state["test_questions"] = picked
                     st.session_state["test_started"] = True
-                    st.session_state["test_start_time"] = datetime.utcnow()
-                    st.session_state["test_answers"] = {}
+                    st.session_state["test_start_ts"] = time.monotonic()
+                    st.session_state["test_key"] = uuid.uuid4().hex
                     st.rerun()
             except Exception as e:
                 st.error(f"Failed to load questions: {e}")
@@ -97,118 +295,72 @@ elif page == "Mock Test":
                 score += INCORRECT_SCORE
         st.metric("Score", f"{score:.2f} / {EXAM_TOTAL}")
         if st.button("Start a new test"):
-            st.session_state["test_started"] = False
-            st.session_state["test_submitted"] = False
-            st.session_state["test_questions"] = []
-            st.session_state["test_answers"] = {}
+            _reset_state(_TEST_DEFAULTS)
             st.rerun()
         st.stop()
 
     questions = st.session_state["test_questions"]
-    answers = st.session_state["test_answers"]
-    start_time = st.session_state["test_start_time"]
+    start_ts = st.session_state["test_start_ts"]
     n = len(questions)
 
     # Progress and timer
-    elapsed = (datetime.utcnow() - start_time).total_seconds() if start_time else 0
+    elapsed = time.monotonic() - start_ts if start_ts is not None else 0
     remaining_sec = max(0, EXAM_DURATION_MINUTES * 60 - int(elapsed))
-    m, s = divmod(remaining_sec, 60)
-    st.sidebar.metric("Time left", f"{m}:{s:02d}")
-    answered = sum(1 for i in range(n) if answers.get(i, -1) >= 0)
+    with st.sidebar:
+        components.html(_COUNTDOWN_HTML.format(test_key=st.session_state["test_key"], duration_s=EXAM_DURATION_MINUTES * 60), height=70)
+    answered = st.session_state["progress_shown"] = st.session_state["answered_count"]
     st.sidebar.progress(answered / n if n else 0)
     st.sidebar.caption(f"Question {answered}/{n} answered")
 
-    # Current question index (persist in session)
-    if "current_q" not in st.session_state:
-        st.session_state["current_q"] = 0
-    idx = st.session_state["current_q"]
-    q = questions[idx]
-    options = q.get("options") or []
-    correct_idx = q.get("correct_answer_idx", 0)
-    option_labels = "ABCDEFGHIJ"
-    n_opts = min(len(options), 10)
+    _render_question()
 
-    st.subheader(f"Question {idx + 1} of {n}")
-    st.write(q.get("text", ""))
-
-    # options: 0 = Skip, 1..N = A, B, C, ... (up to 10 options; selected 0 -> -1, selected 1 -> 0, etc.)
-    opt_indices = [-1] + list(range(n_opts))
-    opt_labels = ["— Skip —"] + [f"{option_labels[i]}. {(options[i] or '')[:80]}" for i in range(n_opts)]
-    key = f"q_{idx}"
-    choice_in_ui = st.radio(
-        "Choose one:",
-        range(len(opt_indices)),
-        format_func=lambda i: opt_labels[i] if i < len(opt_labels) else "",
-        key=key,
-        index=opt_indices.index(answers.get(idx, -1)) if answers.get(idx, -1) in opt_indices else 0,
-    )
-    st.session_state["test_answers"][idx] = opt_indices[choice_in_ui]
-
-    col1, col2, col3 = st.columns([1, 1, 2])
-    with col1:
-        if st.button("Previous") and idx > 0:
-            st.session_state["current_q"] = idx - 1
-            st.rerun()
-    with col2:
-        if st.button("Next") and idx < n - 1:
-            st.session_state["current_q"] = idx + 1
-            st.rerun()
+    _, _, col3 = st.columns([1, 1, 2])
     with col3:
         if st.button("Submit exam"):
             st.session_state["test_submitted"] = True
             st.rerun()
 
-    # Auto-submit when time runs out
+    # Auto-submit when time runs out: one rerun scheduled for the deadline, no periodic polling
     if remaining_sec <= 0:
         st.session_state["test_submitted"] = True
         st.rerun()
+    st_autorefresh(interval=remaining_sec * 1000, limit=1, key="autosubmit")
 
 # ----- Drill Mode -----
 elif page == "Drill Mode":
     st.header("Drill Mode")
     st.caption("Practice by category or subcategory with immediate feedback and explanations")
     
-    # Initialize drill mode session state
-    if "drill_category" not in st.session_state:
-        st.session_state["drill_category"] = None
-    if "drill_subcategory" not in st.session_state:
-        st.session_state["drill_subcategory"] = None
-    if "drill_questions" not in st.session_state:
-        st.session_state["drill_questions"] = []
-    if "drill_current_idx" not in st.session_state:
-        st.session_state["drill_current_idx"] = 0
-    if "drill_answers" not in st.session_state:
-        st.session_state["drill_answers"] = {}  # {question_id: selected_idx}
-    if "drill_started" not in st.session_state:
-        st.session_state["drill_started"] = False
-    if "drill_show_discovery" not in st.session_state:
-        st.session_state["drill_show_discovery"] = False
+    # All drill state lives in one namespaced dict; writes through `drill` mutate session state in place
+    drill = st.session_state.setdefault("drill", {})
+    _init_state(_DRILL_DEFAULTS, drill)
+    format_subcategory_name = _mcq_discovery().format_subcategory_name
     
     # If practice session is active, show practice interface
-    if st.session_state["drill_started"] and st.session_state["drill_questions"]:
-        questions = st.session_state["drill_questions"]
-        answers = st.session_state["drill_answers"]
-        current_idx = st.session_state["drill_current_idx"]
-        category = st.session_state.get("drill_category", "unknown")
-        subcategory = st.session_state.get("drill_subcategory")
+    if drill["started"] and drill["q_ids"]:
+        q_ids = drill["q_ids"]
+        answers = drill["answers"]
+        current_idx = drill["current_idx"]
+        category = drill["category"] or "unknown"
+        subcategory = drill["subcategory"]
         
-        if current_idx >= len(questions):
+        if current_idx >= len(q_ids):
             st.success("You've completed all questions in this practice session!")
             if st.button("Start New Practice Session"):
-                st.session_state["drill_started"] = False
-                st.session_state["drill_questions"] = []
-                st.session_state["drill_current_idx"] = 0
-                st.session_state["drill_answers"] = {}
+                _reset_state(_DRILL_SESSION_DEFAULTS, drill)
                 st.rerun()
             st.stop()
         
-        q = questions[current_idx]
+        q = _drill_question(q_ids[current_idx])
+        if q is None:
+            # Row deleted since the session started (e.g. by a fix script): move on to the next one
+            drill["current_idx"] += 1
+            st.rerun()
         q_id = q.get("id")
-        options = q.get("options") or []
+        valid_opts = q["_valid_opts"]
         correct_idx = q.get("correct_answer_idx", 0)
         explanation = q.get("explanation", "")
         option_labels = "ABCDEFGHIJ"
-        n_opts = min(len(options), 10)
         
         # Check if user has answered this question
         user_answer = answers.get(q_id)
@@ -223,8 +375,8 @@ elif page == "Drill Mode":
         
         # Progress indicator
         answered_count = len(answers)
-        st.progress((current_idx + 1) / len(questions))
-        st.caption(f"{practice_info} | Question {current_idx + 1} of {len(questions)} | {answered_count} answered")
+        st.progress((current_idx + 1) / len(q_ids))
+        st.caption(f"{practice_info} | Question {current_idx + 1} of {len(q_ids)} | {answered_count} answered")
         
         # Question display
         st.subheader("Question")
@@ -235,25 +387,21 @@ elif page == "Drill Mode":
         
         if not is_answered:
             # Show radio buttons for selection
-            option_display = [f"{option_labels[i]}. {(options[i] or '')}" for i in range(n_opts) if options[i]]
+            option_display = {i: _LABEL_PREFIX[i] + opt for i, opt in valid_opts}
             selected_option = st.radio(
                 "Choose your answer:",
-                options=list(range(len(option_display))),
-                format_func=lambda i: option_display[i] if i < len(option_display) else "",
+                options=list(option_display),
+                format_func=lambda i: option_display.get(i, ""),
                 key=f"radio_{q_id}"
             )
             
             if st.button("Submit Answer", type="primary"):
-                st.session_state["drill_answers"][q_id] = selected_option
+                answers[q_id] = selected_option
                 st.rerun()
         else:
             # Show results with color coding
-            for i in range(n_opts):
-                option_text = options[i] or ""
-                if not option_text:
-                    continue
-                
-                label = f"{option_labels[i]}. {option_text}"
+            for i, option_text in valid_opts:
+                label = _LABEL_PREFIX[i] + option_text
                 
                 # Determine display style
                 if i == correct_idx:
@@ -284,18 +432,15 @@ elif page == "Drill Mode":
         col1, col2, col3 = st.columns([1, 1, 2])
         with col1:
             if st.button("← Previous", disabled=current_idx == 0):
-                st.session_state["drill_current_idx"] = current_idx - 1
+                drill["current_idx"] = current_idx - 1
                 st.rerun()
         with col2:
-            if st.button("Next →", disabled=current_idx >= len(questions) - 1):
-                st.session_state["drill_current_idx"] = current_idx + 1
+            if st.button("Next →", disabled=current_idx >= len(q_ids) - 1):
+                drill["current_idx"] = current_idx + 1
                 st.rerun()
         with col3:
             if st.button("End Practice Session"):
-                st.session_state["drill_started"] = False
-                st.session_state["drill_questions"] = []
-                st.session_state["drill_current_idx"] = 0
-                st.session_state["drill_answers"] = {}
+                _reset_state(_DRILL_SESSION_DEFAULTS, drill)
                 st.rerun()
         
         st.stop()
@@ -312,7 +457,7 @@ elif page == "Drill Mode":
         
         # Category selection
         category = st.radio("Select Category", ["gat", "subject"], horizontal=True, key="drill_category_selector")
-        st.session_state["drill_category"] = category
+        drill["category"] = category
         
         # Get total count for category
         try:
@@ -350,19 +495,14 @@ elif page == "Drill Mode":
                 if st.button("Start Category Practice Session", type="primary", use_container_width=True):
                     try:
                         # Fetch questions for selected category
-                        result = get_questions_by_category(category, limit=max_questions)
-                        questions_list = result.data if hasattr(result, 'data') else result
+                        questions_list = get_questions_by_category(category, limit=max_questions, sample=True)
                         
                         if not questions_list:
                             st.error(f"No questions found for {category}")
                         else:
-                            # Shuffle questions for variety
-                            random.shuffle(questions_list)
-                            st.session_state["drill_questions"] = questions_list
-                            st.session_state["drill_current_idx"] = 0
-                            st.session_state["drill_answers"] = {}
-                            st.session_state["drill_started"] = True
-                            st.session_state["drill_subcategory"] = None  # Clear subcategory for category practice
+                            # Already in random order (sampled server-side)
+                            _start_drill(questions_list)
+                            drill["subcategory"] = None  # Clear subcategory for category practice
                             st.rerun()
                     except Exception as e:
                         st.error(f"Failed to load questions: {e}")
@@ -376,7 +516,7 @@ elif page == "Drill Mode":
             
             # Get subcategories for selected category
             try:
-                subcategories = get_subcategories_by_category(category)
+                subcategories = _cached_subcategories(category)
             except Exception as e:
                 st.error(f"Error loading subcategories: {e}")
                 st.stop()
@@ -387,36 +527,35 @@ elif page == "Drill Mode":
             
             # Get counts for all subcategories
             try:
-                subcategory_counts = get_subcategory_counts(category)
-                low_count_subs = get_low_count_subcategories(threshold=20, category=category)
+                stats = _cached_subcategory_stats(category)
+                subcategory_counts = stats["counts"]
+                low_count_subs = stats["low"]
             except Exception as e:
                 st.warning(f"Could not load subcategory counts: {e}")
                 subcategory_counts = {}
                 low_count_subs = {}
             
             # Create subcategory options with counts and warnings
-            subcategory_options = []
-            for sub in sorted(subcategories):
-                count = subcategory_counts.get(sub, 0)
-                is_low = sub in low_count_subs
-                if is_low:
-                    display_name = f"{format_subcategory_name(sub)} ({count} questions) ⚠️ Low count"
-                else:
-                    display_name = f"{format_subcategory_name(sub)} ({count} questions)"
-                subcategory_options.append((sub, display_name, count, is_low))
+            subcategory_options = _build_subcategory_options(
+                category,
+                tuple(subcategories),
+                tuple(sorted(subcategory_counts.items())),
+                frozenset(low_count_subs),
+            )
+            options_by_sub = {opt[0]: opt for opt in subcategory_options}
             
             # Subcategory selection
             if subcategory_options:
                 selected_display = st.selectbox(
                     "Select Subcategory",
-                    options=[opt[0] for opt in subcategory_options],
-                    format_func=lambda x: next(opt[1] for opt in subcategory_options if opt[0] == x),
+                    options=list(options_by_sub),
+                    format_func=lambda x: options_by_sub[x][1],
                     key="drill_subcategory_selector"
                 )
-                st.session_state["drill_subcategory"] = selected_display
+                drill["subcategory"] = selected_display
                 
                 # Show selected subcategory info
-                selected_info = next(opt for opt in subcategory_options if opt[0] == selected_display)
+                selected_info = options_by_sub[selected_display]
                 selected_count = selected_info[2]
                 is_low_count = selected_info[3]
                 
@@ -433,7 +572,7 @@ elif page == "Drill Mode":
                     st.subheader("Find More MCQs Online")
                     st.info(f"Looking for more {format_subcategory_name(selected_display)} questions online...")
                     
-                    sources = get_sources_for_subcategory(selected_display)
+                    sources = _sources(selected_display)
                     if sources:
                         st.write("**Recommended Sources:**")
                         for source in sources:
@@ -456,18 +595,14 @@ elif page == "Drill Mode":
                     if st.button("Start Practice Session", type="primary", use_container_width=True):
                         try:
                             # Fetch questions for selected subcategory
-                            result = get_questions_by_subcategory(category, selected_display, limit=100)
-                            questions_list = result.data if hasattr(result, 'data') else result
+                            questions_list = get_questions_by_subcategory(category, selected_display, limit=100)
                             
                             if not questions_list:
                                 st.error(f"No questions found for {format_subcategory_name(selected_display)}")
                             else:
                                 # Shuffle questions for variety
                                 random.shuffle(questions_list)
-                                st.session_state["drill_questions"] = questions_list
-                                st.session_state["drill_current_idx"] = 0
-                                st.session_state["drill_answers"] = {}
-                                st.session_state["drill_started"] = True
+                                _start_drill(questions_list)
                                 st.rerun()
                         except Exception as e:
                             st.error(f"Failed to load questions: {e}")
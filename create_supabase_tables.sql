@@ -17,6 +17,8 @@ CREATE TABLE IF NOT EXISTS questions (
 -- Create indexes for performance
 CREATE INDEX IF NOT EXISTS idx_questions_category ON questions(category);
 CREATE INDEX IF NOT EXISTS idx_questions_sub_category ON questions(sub_category);
+-- Most reads filter on category and sub_category together
+CREATE INDEX IF NOT EXISTS idx_questions_cat_sub ON questions(category, sub_category);
 CREATE INDEX IF NOT EXISTS idx_questions_source ON questions(source);
 
 -- Create user_stats table for tracking performance
@@ -59,6 +59,8 @@ CREATE TABLE IF NOT EXISTS session_answers (
 -- Create indexes for performance
 CREATE INDEX IF NOT EXISTS idx_questions_category ON questions(category);
 CREATE INDEX IF NOT EXISTS idx_questions_sub_category ON questions(sub_category);
+CREATE INDEX IF NOT EXISTS idx_questions_cat_sub ON questions(category, sub_category);
+CREATE INDEX IF NOT EXISTS idx_questions_source ON questions(source) WHERE source IS NOT NULL;
 CREATE INDEX IF NOT EXISTS idx_user_stats_user_id ON user_stats(user_id);
 CREATE INDEX IF NOT EXISTS idx_user_stats_question_id ON user_stats(question_id);
 CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);
@@ -91,3 +93,66 @@ SELECT
 FROM questions q
 LEFT JOIN user_stats us ON q.id = us.question_id
 WHERE (us.user_id::uuid = auth.uid() OR us IS NULL);
+
+-- A user's n weakest sub_categories (DatabaseClient.get_weak_areas): JOIN + GROUP BY + top-n in Postgres
+DROP FUNCTION IF EXISTS weak_areas_by_user(UUID);
+CREATE OR REPLACE FUNCTION weak_areas_by_user(uid UUID, n INT)
+RETURNS TABLE(sub_category TEXT, fail BIGINT, success BIGINT) AS $$
+    SELECT q.sub_category, SUM(s.fail_count), SUM(s.success_count)
+    FROM user_stats s
+    JOIN questions q ON q.id = s.question_id
+    WHERE s.user_id = uid
+    GROUP BY q.sub_category
+    ORDER BY SUM(s.fail_count) DESC
+    LIMIT n;
+$$ LANGUAGE sql STABLE;
+
+-- Close a session in one round-trip (DatabaseClient.finalize_session): insert all answers, mark the
+-- session completed, and return the per-sub_category breakdown {sub_category: {total, correct}}.
+CREATE OR REPLACE FUNCTION finalize_session(
+    p_session_id UUID,
+    p_score_earned NUMERIC,
+    p_pass_status BOOLEAN,
+    p_questions_answered INT,
+    p_answers JSONB
+)
+RETURNS JSONB AS $$
+BEGIN
+    INSERT INTO session_answers (session_id, question_id, user_choice_idx, is_correct, points_earned, time_spent_sec)
+    SELECT p_session_id, a.question_id, a.user_choice_idx, a.is_correct, a.points_earned, a.time_spent_sec
+    FROM jsonb_to_recordset(p_answers)
+        AS a(question_id UUID, user_choice_idx INT, is_correct BOOLEAN, points_earned NUMERIC, time_spent_sec INT);
+
+    UPDATE sessions
+    SET status = 'completed', score_earned = p_score_earned, pass_status = p_pass_status,
+        questions_answered = p_questions_answered, ended_at = NOW()
+    WHERE id = p_session_id;
+
+    RETURN (
+        SELECT COALESCE(jsonb_object_agg(sub, jsonb_build_object('total', t, 'correct', c)), '{}'::jsonb)
+        FROM (
+            SELECT COALESCE(q.sub_category, 'unknown') AS sub, COUNT(*) AS t, COUNT(*) FILTER (WHERE a.is_correct) AS c
+            FROM session_answers a
+            JOIN questions q ON q.id = a.question_id
+            WHERE a.session_id = p_session_id
+            GROUP BY 1
+        ) x
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Apply a session's stat deltas in one statement (DatabaseClient.bulk_update_user_stats).
+-- p_updates: [{question_id, delta_fail, delta_success, last_attempted_at, last_correct_at}, ...]
+CREATE OR REPLACE FUNCTION bump_user_stats(p_user_id UUID, p_updates JSONB)
+RETURNS VOID AS $$
+    INSERT INTO user_stats AS s (user_id, question_id, fail_count, success_count, last_attempted_at, last_correct_at)
+    SELECT p_user_id, u.question_id, SUM(u.delta_fail), SUM(u.delta_success), MAX(u.last_attempted_at), MAX(u.last_correct_at)
+    FROM jsonb_to_recordset(p_updates)
+        AS u(question_id UUID, delta_fail INT, delta_success INT, last_attempted_at TIMESTAMPTZ, last_correct_at TIMESTAMPTZ)
+    GROUP BY u.question_id  -- one row per question: ON CONFLICT can't touch a row twice
+    ON CONFLICT (user_id, question_id) DO UPDATE SET
+        fail_count = s.fail_count + EXCLUDED.fail_count,
+        success_count = s.success_count + EXCLUDED.success_count,
+        last_attempted_at = EXCLUDED.last_attempted_at,
+        last_correct_at = COALESCE(EXCLUDED.last_correct_at, s.last_correct_at);
+$$ LANGUAGE sql VOLATILE;
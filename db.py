@@ -1,21 +1,70 @@
 """Supabase CRUD. Client is cached via Streamlit."""
+import asyncio
+import functools
 import logging
 import os
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from uuid import UUID
 
+import httpx
 import streamlit as st
 from dotenv import load_dotenv
+from postgrest.exceptions import APIError
 from supabase import create_client, Client
 
 load_dotenv()
 
+UPSERT_WORKERS = int(os.environ.get("SUPABASE_UPSERT_WORKERS", "8"))
+UPSERT_RETRIES = 3
+# PostgREST connection pool; sized above UPSERT_WORKERS so parallel upserts don't queue on the transport
+MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", "64"))
+MAX_KEEPALIVE = int(os.environ.get("SUPABASE_KEEPALIVE", "32"))
+
+
+def tune_postgrest_http(client: Client, timeout: httpx.Timeout | None = None, keepalive_expiry: float = 40.0) -> Client:
+    """
+    Swap PostgREST's httpx session for one with a larger keep-alive pool and transport-level connect retries.
+    verify, proxy and http2 are carried over from the client postgrest built (timeout too, unless given). Shared with
+    src/database.py. Proxies from HTTP(S)_PROXY are not applied to a custom transport; pass them to postgrest explicitly.
+    """
+    pg = client.postgrest
+    old = pg.session
+    verify = getattr(pg, "verify", True)
+    proxy = getattr(pg, "proxy", None)
+    http2 = getattr(getattr(getattr(old, "_transport", None), "_pool", None), "_http2", True)
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE, keepalive_expiry=keepalive_expiry)
+    pg.session = type(old)(
+        base_url=old.base_url,
+        headers=old.headers,
+        timeout=timeout or old.timeout,
+        verify=verify,
+        http2=http2,
+        proxy=proxy,
+        limits=limits,
+        transport=httpx.HTTPTransport(retries=3, verify=verify, http2=http2, limits=limits),
+        follow_redirects=old.follow_redirects,
+    )
+    old.close()
+    return client
+
+
+def is_missing_rpc(e: Exception) -> bool:
+    """True if e says the RPC isn't installed (PostgREST PGRST202 / Postgres 42883), i.e. the migration wasn't applied."""
+    return isinstance(e, APIError) and e.code in ("PGRST202", "42883")
+
 
 def _env_client() -> Client:
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_KEY")
     if not url or not key:
         raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
-    return create_client(url, key)
+    return tune_postgrest_http(create_client(url, key), timeout=httpx.Timeout(30.0, connect=5.0))
 
 
 @st.cache_resource
@@ -23,17 +72,55 @@ def get_supabase() -> Client:
     return _env_client()
 
 
+@functools.lru_cache(maxsize=1)
 def get_supabase_uncached() -> Client:
-    """For CLI/scripts (no Streamlit context)."""
+    """For CLI/scripts (no Streamlit context). Process-wide singleton; get_supabase_uncached.cache_clear() for a fresh one."""
     return _env_client()
 
 
+async def get_supabase_async():
+    """Async client for CLI bulk imports (supabase-py's AsyncClient over httpx's async transport)."""
+    from supabase import acreate_client
+
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
+    return await acreate_client(url, key)
+
+
+def _dedupe_by_id(rows: list[dict]) -> list[dict]:
+    """Drop rows with a repeated id, keeping the last occurrence (same winner as a {id: row} dict) without building one."""
+    seen = set()
+    out = []
+    for r in reversed(rows):
+        i = r["id"]
+        if i in seen:
+            continue
+        seen.add(i)
+        out.append(r)
+    out.reverse()
+    return out
+
+
+def _upsert_with_retry(client: Client, chunk: list[dict]):
+    """Upsert one chunk, retrying transient failures (429/5xx, dropped connections) with jittered backoff."""
+    for attempt in range(UPSERT_RETRIES):
+        try:
+            return client.table("questions").upsert(chunk, on_conflict="id").execute()
+        except Exception as e:
+            if attempt == UPSERT_RETRIES - 1:
+                raise
+            delay = (2 ** attempt) * 0.5 + random.uniform(0, 0.5)
+            logging.getLogger(__name__).warning("Upsert failed (%s); retrying in %.1fs", e, delay)
+            time.sleep(delay)
+
+
 def upsert_questions_chunk(client: Client, rows: list[dict]):
     """Upsert a single chunk (e.g. for incremental flush). Dedupes by id within the chunk."""
     if not rows:
         return
-    by_id = {r["id"]: r for r in rows}
-    chunk = list(by_id.values())
+    chunk = _dedupe_by_id(rows)
     log = logging.getLogger(__name__)
     log.info("Upserting chunk (%d rows)", len(chunk))
     client.table("questions").upsert(chunk, on_conflict="id").execute()
@@ -42,86 +129,261 @@ def upsert_questions_chunk(client: Client, rows: list[dict]):
 def upsert_questions_bulk(client: Client, rows: list[dict], chunk_size: int = 200):
     """Bulk upsert into questions. Rows must include 'id' (uuid). Dedupes by id so no chunk has duplicates (avoids Postgres ON CONFLICT error)."""
     n_before = len(rows)
-    by_id = {r["id"]: r for r in rows}
-    rows = list(by_id.values())
+    rows = _dedupe_by_id(rows)
     if len(rows) < n_before:
         logging.getLogger(__name__).info("Deduped questions by id: %d -> %d", n_before, len(rows))
-    n_chunks = (len(rows) + chunk_size - 1) // chunk_size
+    chunks = [rows[i : i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    n_chunks = len(chunks)
+    log = logging.getLogger(__name__)
+    # Chunks hold disjoint ids after dedupe, so they can be upserted concurrently on the shared client
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as ex:
+        futures = {ex.submit(_upsert_with_retry, client, chunk): len(chunk) for chunk in chunks}
+        for done, fut in enumerate(as_completed(futures), 1):
+            fut.result()
+            log.info("Upserted chunk %d/%d (%d rows)", done, n_chunks, futures[fut])
+    clear_question_cache()
+
+
+async def upsert_questions_bulk_async(client, rows: list[dict], chunk_size: int = 200, concurrency: int = 16) -> int:
+    """Async bulk upsert: all chunks share one event loop, with at most `concurrency` requests in flight.
+    For CLI use via asyncio.run(); Streamlit keeps the sync upsert_questions_bulk. Returns the number of rows sent."""
+    rows = _dedupe_by_id(rows)
+    chunks = [rows[i : i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    n_chunks = len(chunks)
     log = logging.getLogger(__name__)
-    for i in range(0, len(rows), chunk_size):
-        chunk = rows[i : i + chunk_size]
-        chunk_num = i // chunk_size + 1
-        log.info("Upserting chunk %d/%d (%d rows)", chunk_num, n_chunks, len(chunk))
-        client.table("questions").upsert(chunk, on_conflict="id").execute()
+    sem = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def one(chunk: list[dict]):
+        nonlocal done
+        async with sem:
+            for attempt in range(UPSERT_RETRIES):
+                try:
+                    await client.table("questions").upsert(chunk, on_conflict="id").execute()
+                    break
+                except Exception as e:
+                    if attempt == UPSERT_RETRIES - 1:
+                        raise
+                    delay = (2 ** attempt) * 0.5 + random.uniform(0, 0.5)
+                    log.warning("Upsert failed (%s); retrying in %.1fs", e, delay)
+                    await asyncio.sleep(delay)
+        done += 1
+        log.info("Upserted chunk %d/%d (%d rows)", done, n_chunks, len(chunk))
+
+    await asyncio.gather(*(one(c) for c in chunks))
+    clear_question_cache()
+    return len(rows)
+
+
+def upsert_questions_stream(client: Client, rows: Iterable[dict], chunk_size: int = 200) -> int:
+    """Upsert rows from an iterator as they arrive: the caller's thread fills chunks while UPSERT_WORKERS
+    threads drain a bounded queue, so parsing overlaps network I/O and memory stays O(chunk_size * workers).
+    Repeated ids keep the last occurrence, like _dedupe_by_id: inside the open chunk it replaces the earlier row;
+    after that chunk was queued it is held back and upserted once the workers are done, so it lands last.
+    Returns the number of rows sent."""
+    log = logging.getLogger(__name__)
+    q: queue.Queue = queue.Queue(maxsize=UPSERT_WORKERS * 2)
+    errors: list[Exception] = []
+
+    def worker():
+        while True:
+            chunk = q.get()
+            try:
+                if chunk is None:
+                    return
+                if not errors:
+                    _upsert_with_retry(client, chunk)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                q.task_done()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(UPSERT_WORKERS)]
+    for t in threads:
+        t.start()
+    queued = set()  # ids in chunks already handed to the workers
+    late: dict = {}  # id -> last row seen after its first chunk was queued
+    pos: dict = {}  # id -> index in buf
+    buf = []
+    sent = 0
+    try:
+        for r in rows:
+            if errors:
+                break
+            i = r["id"]
+            if i in pos:
+                buf[pos[i]] = r
+                continue
+            if i in queued:
+                late[i] = r
+                continue
+            pos[i] = len(buf)
+            buf.append(r)
+            if len(buf) >= chunk_size:
+                q.put(buf)
+                queued.update(pos)
+                sent += len(buf)
+                log.info("Queued chunk (%d rows, %d total)", len(buf), sent)
+                buf = []
+                pos = {}
+        if buf and not errors:
+            q.put(buf)
+            sent += len(buf)
+    finally:
+        for _ in threads:
+            q.put(None)
+        for t in threads:
+            t.join()
+    if late and not errors:
+        log.info("Re-sending %d rows whose id repeated later in the stream", len(late))
+        late_rows = list(late.values())
+        for k in range(0, len(late_rows), chunk_size):
+            _upsert_with_retry(client, late_rows[k : k + chunk_size])
+        sent += len(late_rows)
+    clear_question_cache()
+    if errors:
+        raise errors[0]
+    return sent
 
 
 # --- Questions ---
 
-def get_questions(limit: int | None = None):
+# Question reads are cached for 5 min as plain list[dict] (cache_data pickles results). Writes come from the importer,
+# scrapers and fix scripts, i.e. other processes, so the running app only sees them once the 300s TTL expires.
+# Random samples (sample=True, get_mock_test_questions) are never cached.
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_questions(category: str | None, sub_category: str | None, limit: int | None) -> list[dict]:
     q = get_supabase().table("questions").select("*")
+    if category:
+        q = q.eq("category", category)
+    if sub_category:
+        q = q.eq("sub_category", sub_category)
     if limit:
         q = q.limit(limit)
-    return q.execute()
+    return q.execute().data or []
 
 
-def get_question_by_id(question_id: UUID | str):
-    return get_supabase().table("questions").select("*").eq("id", str(question_id)).single().execute()
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_question(question_id: str) -> dict | None:
+    # maybe_single: a missing row is None, not the 406 APIError .single() raises
+    r = get_supabase().table("questions").select("*").eq("id", question_id).maybe_single().execute()
+    return r.data if r is not None else None
 
 
-def get_questions_by_category(category: str, limit: int | None = None):
-    q = get_supabase().table("questions").select("*").eq("category", category)
-    if limit:
-        q = q.limit(limit)
-    return q.execute()
+def clear_question_cache():
+    """Drop this process's cached question reads. Called once at the end of each bulk write (upsert_questions_bulk*,
+    upsert_questions_stream, delete_questions_by_source); it does not reach a separately running Streamlit app."""
+    _cached_questions.clear()
+    _cached_question.clear()
+
+
+def get_questions(limit: int | None = None) -> list[dict]:
+    return _cached_questions(None, None, limit)
 
 
-def get_questions_by_subcategory(category: str, sub_category: str, limit: int | None = None):
+def get_question_by_id(question_id: UUID | str) -> dict | None:
+    return _cached_question(str(question_id))
+
+
+def get_questions_by_category(category: str, limit: int | None = None, sample: bool = False) -> list[dict]:
+    """Questions in category. sample=True returns `limit` random rows, sampled server-side (uncached)."""
+    if sample and limit:
+        return get_supabase().rpc("select_random_questions", {"p_category": category, "n": limit}).execute().data or []
+    return _cached_questions(category, None, limit)
+
+
+def _sample_category(client: Client, category: str, n: int) -> list[dict]:
+    """n random rows of category without the RPCs: page through the ids, sample here, fetch those rows."""
+    ids = []
+    page_size = 1000
+    offset = 0
+    while True:
+        data = client.table("questions").select("id").eq("category", category).range(offset, offset + page_size - 1).execute().data or []
+        ids.extend(row["id"] for row in data)
+        if len(data) < page_size:
+            break
+        offset += page_size
+    picked = random.sample(ids, min(n, len(ids)))
+    rows = []
+    for i in range(0, len(picked), 200):
+        rows.extend(client.table("questions").select("*").in_("id", picked[i : i + 200]).execute().data or [])
+    return rows
+
+
+def get_mock_test_questions(n_gat: int, n_subject: int) -> list[dict]:
+    """Random GAT + Subject pool for one mock test in a single RPC (see supabase_migration_rpc_functions.sql).
+    Samples client-side if the migration hasn't been applied."""
+    client = get_supabase()
+    try:
+        return client.rpc("get_mock_test_questions", {"n_gat": n_gat, "n_subject": n_subject}).execute().data or []
+    except Exception as e:
+        if not is_missing_rpc(e):
+            raise
+        logging.getLogger(__name__).warning(
+            f"get_mock_test_questions RPC missing (apply supabase_migration_rpc_functions.sql); sampling client-side: {e}"
+        )
+    return _sample_category(client, "gat", n_gat) + _sample_category(client, "subject", n_subject)
+
+
+def get_questions_by_subcategory(category: str, sub_category: str, limit: int | None = None) -> list[dict]:
     """Get questions filtered by both category and sub_category."""
-    q = get_supabase().table("questions").select("*").eq("category", category).eq("sub_category", sub_category)
-    if limit:
-        q = q.limit(limit)
-    return q.execute()
+    return _cached_questions(category, sub_category, limit)
 
 
 def get_subcategory_counts(category: str | None = None):
-    """Returns dict of {sub_category: count} for given category, or all categories if None."""
+    """Returns dict of {sub_category: count} for given category, or all categories if None.
+    Counted server-side by the subcategory_counts RPC; falls back to a paginated scan if it isn't installed."""
     client = get_supabase()
-    counts = {}
+    try:
+        r = client.rpc("subcategory_counts", {"p_category": category}).execute()
+        return {row["sub_category"]: row["n"] for row in r.data or []}
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"subcategory_counts RPC failed, counting client-side: {e}")
+    counts = Counter()
     
     try:
-        # Fetch all questions with category and sub_category
-        all_rows = []
+        # Only sub_category is needed (category is the filter); count each page as it arrives
         page_size = 1000
         offset = 0
         while True:
-            query = client.table("questions").select("category", "sub_category")
+            query = client.table("questions").select("sub_category")
             if category:
                 query = query.eq("category", category)
             r = query.range(offset, offset + page_size - 1).execute()
             data = r.data or []
             if not data:
                 break
-            all_rows.extend(data)
+            counts.update(row["sub_category"] or "(blank)" for row in data)
             if len(data) < page_size:
                 break
             offset += page_size
-        
-        # Count by sub_category
-        from collections import Counter
-        sub_cats = [row.get("sub_category") or "(blank)" for row in all_rows]
-        counts = dict(Counter(sub_cats))
     except Exception as e:
         logging.getLogger(__name__).error(f"Error getting subcategory counts: {e}")
     
-    return counts
+    return dict(counts)
+
+
+def get_subcategory_stats(category: str | None = None, low_threshold: int = 20):
+    """Returns {"counts": {sub_category: count}, "low": {sub_category: count}} from one counts fetch.
+    "low" holds subcategories below low_threshold, sorted by count ascending (same as mcq_discovery)."""
+    counts = get_subcategory_counts(category)
+    low = dict(sorted(((sub, n) for sub, n in counts.items() if n < low_threshold), key=lambda x: x[1]))
+    return {"counts": counts, "low": low}
 
 
 def get_subcategories_by_category(category: str):
-    """Returns list of unique subcategories for given category."""
+    """Returns list of unique subcategories for given category.
+    Uses the distinct_subcategories RPC; falls back to a paginated scan if it isn't installed."""
     client = get_supabase()
     try:
-        # Fetch distinct sub_categories
-        all_rows = []
+        r = client.rpc("distinct_subcategories", {"p_category": category}).execute()
+        return [row["sub_category"] for row in r.data or []]
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"distinct_subcategories RPC failed, scanning client-side: {e}")
+    try:
+        # Collect distinct non-empty sub_categories page by page
+        subcategories = set()
         page_size = 1000
         offset = 0
         while True:
@@ -135,31 +397,24 @@ def get_subcategories_by_category(category: str):
             data = r.data or []
             if not data:
                 break
-            all_rows.extend(data)
+            subcategories.update(row["sub_category"] for row in data if row["sub_category"])
             if len(data) < page_size:
                 break
             offset += page_size
-        
-        # Get unique subcategories
-        subcategories = sorted(set(row.get("sub_category") or "" for row in all_rows if row.get("sub_category")))
-        return [s for s in subcategories if s]  # Filter out empty strings
+        return sorted(subcategories)
     except Exception as e:
         logging.getLogger(__name__).error(f"Error getting subcategories: {e}")
         return []
 
 
+@st.cache_data(ttl=60)
 def get_question_counts():
-    """Returns dict with total, gat, subject counts (for dashboard)."""
+    """Returns dict with total, gat, subject counts (for dashboard). HEAD + count=exact: no rows are transferred."""
     client = get_supabase()
     out = {"total": 0, "gat": 0, "subject": 0}
     for cat in ("gat", "subject"):
-        try:
-            r = client.table("questions").select("id", count="exact").eq("category", cat).limit(0).execute()
-            out[cat] = getattr(r, "count", None) or len(r.data or [])
-        except Exception:
-            # Fallback: fetch ids in batches (Supabase default limit often 1000)
-            r = client.table("questions").select("id").eq("category", cat).limit(20000).execute()
-            out[cat] = len(r.data or [])
+        r = client.table("questions").select("id", count="exact", head=True).eq("category", cat).execute()
+        out[cat] = r.count or 0
     out["total"] = out["gat"] + out["subject"]
     return out
 
@@ -167,6 +422,24 @@ def get_question_counts():
 def delete_questions_by_source(client: Client, source: str):
     """Delete all questions with the given source (e.g. 'examveda')."""
     client.table("questions").delete().eq("source", source).execute()
+    clear_question_cache()
+
+
+# ~10k uuids per call keeps each RPC body well under PostgREST's 1 MB request cap
+RPC_ID_BATCH = 10000
+
+
+def set_category(client: Client, ids: list, category: str) -> int:
+    """UPDATE ... WHERE id = ANY(ids) via the set_questions_category RPC; falls back to 200-id .in_() updates."""
+    try:
+        for i in range(0, len(ids), RPC_ID_BATCH):
+            client.rpc("set_questions_category", {"p_ids": ids[i : i + RPC_ID_BATCH], "p_cat": category}).execute()
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"set_questions_category RPC failed ({e}); updating in chunks")
+        for j in range(i, len(ids), 200):
+            client.table("questions").update({"category": category}).in_("id", ids[j : j + 200]).execute()
+    clear_question_cache()
+    return len(ids)
 
 
 # --- User stats ---
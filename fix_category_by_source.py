@@ -19,22 +19,28 @@ load_dotenv()
 
 from supabase import create_client
 
+from db import set_category
+
 GAT_SOURCES = ("examveda", "pakmcqs", "indiabix")
 SUBJECT_SOURCES = ("sanfoundry",)
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--dry-run", action="store_true", help="Only print what would be updated")
-    args = parser.parse_args()
-    dry_run = args.dry_run
 
-    url = os.environ.get("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_KEY")
-    if not url or not key:
-        print("Set SUPABASE_URL and SUPABASE_KEY in .env")
-        sys.exit(1)
-    client = create_client(url, key)
+def fix_server_side(client, dry_run: bool):
+    """Both UPDATEs run inside Postgres (fix_category_by_source RPC): one round-trip, no rows transferred."""
+    r = client.rpc(
+        "fix_category_by_source",
+        {"p_gat_sources": list(GAT_SOURCES), "p_subject_sources": list(SUBJECT_SOURCES), "p_dry_run": dry_run},
+    ).execute()
+    counts = (r.data or [{}])[0]
+    verb = "Would set" if dry_run else "Set"
+    print("Category by source: GAT = examveda, pakmcqs, indiabix  |  Subject = sanfoundry")
+    print(f"  {verb} to GAT:     {counts.get('gat_updated', 0)} questions (examveda/pakmcqs/indiabix)")
+    print(f"  {verb} to Subject: {counts.get('subject_updated', 0)} questions (sanfoundry)")
+    print("Dry run. Run without --dry-run to apply." if dry_run else "Done.")
+
 
+def fix_client_side(client, dry_run: bool):
+    """Fallback when the RPC isn't installed: fetch (id, category, source), classify here, update by id."""
     # Fetch all questions (id, category, source) in pages
     all_rows = []
     page_size = 1000
@@ -79,16 +85,32 @@ def main():
         print("Dry run. Run without --dry-run to apply.")
         return
 
-    chunk_size = 200
-    for i in range(0, len(to_gat), chunk_size):
-        chunk = to_gat[i : i + chunk_size]
-        client.table("questions").update({"category": "gat"}).in_("id", chunk).execute()
-        print(f"  Updated {min(i + chunk_size, len(to_gat))}/{len(to_gat)} -> gat")
-    for i in range(0, len(to_subject), chunk_size):
-        chunk = to_subject[i : i + chunk_size]
-        client.table("questions").update({"category": "subject"}).in_("id", chunk).execute()
-        print(f"  Updated {min(i + chunk_size, len(to_subject))}/{len(to_subject)} -> subject")
+    if to_gat:
+        print(f"  Updated {set_category(client, to_gat, 'gat')} -> gat")
+    if to_subject:
+        print(f"  Updated {set_category(client, to_subject, 'subject')} -> subject")
     print("Done.")
 
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be updated")
+    args = parser.parse_args()
+    dry_run = args.dry_run
+
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        print("Set SUPABASE_URL and SUPABASE_KEY in .env")
+        sys.exit(1)
+    client = create_client(url, key)
+
+    try:
+        fix_server_side(client, dry_run)
+    except Exception as e:
+        print(f"fix_category_by_source RPC failed ({e}); falling back to client-side update", file=sys.stderr)
+        fix_client_side(client, dry_run)
+
+
 if __name__ == "__main__":
     main()
@@ -6,6 +6,7 @@ Run once: python fix_examveda_categories.py [--dry-run]
 """
 import argparse
 import os
+import re
 import sys
 from pathlib import Path
 
@@ -18,6 +19,21 @@ load_dotenv()
 
 from supabase import create_client
 
+from db import set_category
+
+# GAT = English, GK, CA, Logical Reasoning, Grammar, Analogies, etc.
+# Subject = CS/AI only. So examveda rows that are not CS topics should be gat.
+GAT_KEYWORDS = ("english", "grammar", "analogies", "general_knowledge", "current_affairs", "logical_reasoning", "gk", "ca", "lr")
+SUBJECT_KEYWORDS = ("data_structure", "oops", "operating_system", "networking", "software_engineering", "compiler", "opencv", "algorithm", "computer_fundamental")
+_SUBJECT_RE = re.compile("|".join(map(re.escape, SUBJECT_KEYWORDS)))
+
+
+def fix_server_side(client, dry_run: bool) -> int:
+    """Single UPDATE inside Postgres (fix_examveda_categories RPC). Returns rows updated (or matched, if dry_run)."""
+    r = client.rpc("fix_examveda_categories", {"p_subject_keywords": list(SUBJECT_KEYWORDS), "p_dry_run": dry_run}).execute()
+    return int(r.data or 0)
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--count", action="store_true", help="Print total examveda MCQs in DB and by category, then exit")
@@ -46,10 +62,17 @@ def main():
         print(f"  Subject: {subject}")
         return
 
-    # GAT = English, GK, CA, Logical Reasoning, Grammar, Analogies, etc.
-    # Subject = CS/AI only. So examveda rows that are not CS topics should be gat.
-    gat_keywords = ("english", "grammar", "analogies", "general_knowledge", "current_affairs", "logical_reasoning", "gk", "ca", "lr")
-    subject_keywords = ("data_structure", "oops", "operating_system", "networking", "software_engineering", "compiler", "opencv", "algorithm", "computer_fundamental")
+    if not debug:
+        try:
+            n = fix_server_side(client, dry_run)
+            if dry_run:
+                print(f"Found {n} examveda questions to set category='gat'.")
+                print("Dry run. Run without --dry-run to apply.")
+            else:
+                print(f"Done. Set category='gat' for {n} examveda questions.")
+            return
+        except Exception as e:
+            print(f"fix_examveda_categories RPC failed ({e}); falling back to client-side update", file=sys.stderr)
 
     # Fetch examveda rows that are currently subject (request enough rows)
     r = client.table("questions").select("id", "sub_category").eq("source", "examveda").eq("category", "subject").limit(50000).execute()
@@ -72,7 +95,7 @@ def main():
         sub = (row.get("sub_category") or "").strip().lower().replace("-", "_").replace(" ", "_")
         if not sub:
             continue
-        if any(k in sub for k in subject_keywords):
+        if _SUBJECT_RE.search(sub):
             continue
         # Everything else from examveda (English, GK, CA, LR, Grammar, etc.) -> gat
         to_fix.append(row["id"])
@@ -85,15 +108,7 @@ def main():
         print("Dry run. Run without --dry-run to apply.")
         return
 
-    # Update in chunks
-    chunk_size = 200
-    updated = 0
-    for i in range(0, len(to_fix), chunk_size):
-        chunk_ids = to_fix[i : i + chunk_size]
-        client.table("questions").update({"category": "gat"}).in_("id", chunk_ids).execute()
-        updated += len(chunk_ids)
-        print(f"Updated {updated}/{len(to_fix)} rows to category=gat")
-
+    updated = set_category(client, to_fix, "gat")
     print(f"Done. Set category='gat' for {updated} examveda questions.")
 
 if __name__ == "__main__":
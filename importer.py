@@ -1,45 +1,94 @@
 """Ingest .jsonl: map topic -> sub_category, Grammar/Analogies -> gat; bulk UPSERT into questions."""
-import json
 import argparse
+import asyncio
+import functools
+import hashlib
 import logging
+import mmap
 import random
+import re
+import sqlite3
 from pathlib import Path
-from uuid import uuid5, NAMESPACE_DNS
+from uuid import NAMESPACE_DNS
 
-from db import get_supabase_uncached, upsert_questions_bulk, delete_questions_by_source
+import orjson
+
+from db import (
+    get_supabase_async,
+    get_supabase_uncached,
+    upsert_questions_bulk_async,
+    upsert_questions_stream,
+    delete_questions_by_source,
+)
 
 DEFAULT_JSONL = Path(__file__).resolve().parent / "examveda_all_topics_20260110_181441.jsonl"
+# Local (id, content hash) of rows already upserted; re-imports skip rows whose hash is unchanged
+HASH_CACHE = Path(__file__).resolve().parent / ".import_cache.sqlite"
 
 # GAT = General Aptitude: English, GK, CA, Logical Reasoning, Grammar, Analogies, etc.
 # Subject = CS/AI only (data structures, OOP, OS, networking, etc.)
 # So we treat examveda as GAT unless the topic is clearly a CS subject.
 SUBJECT_TOPICS = {
-    "data structures", "data_structures", "oops", "operating system", "operating_system",
-    "networking", "software engineering", "compilers", "computer fundamentals",
-    "opencv", "ai_opencv", "algorithms",
+    "data structures", "oops", "operating system", "networking", "software engineering",
+    "compilers", "computer fundamentals", "opencv", "ai_opencv", "algorithms",
 }
 
 
+def _canon_topic(topic: str) -> str:
+    return topic.strip().lower().replace("-", "_").replace(" ", "_")
+
+
+# Pre-normalized once so the common case is a single hash lookup
+_SUBJ_CANON = frozenset(_canon_topic(s) for s in SUBJECT_TOPICS)
+# Fuzzy fallback: "any subject topic occurs in t" as one C-level scan
+_SUBJ_RE = re.compile("|".join(re.escape(s) for s in _SUBJ_CANON))
+
+
+@functools.lru_cache(maxsize=4096)
 def topic_to_category(topic: str) -> str:
-    """Map topic to category: CS/AI topics -> subject; everything else (English, GK, CA, LR, Grammar, etc.) -> gat."""
-    t = (topic or "").strip().lower().replace("-", "_").replace(" ", "_")
-    if t in SUBJECT_TOPICS:
+    """Map topic to category: CS/AI topics -> subject; everything else (English, GK, CA, LR, Grammar, etc.) -> gat.
+    Cached: a JSONL has only a few dozen distinct topics across thousands of rows."""
+    t = _canon_topic(topic or "")
+    if t in _SUBJ_CANON:
+        return "subject"
+    # Partial match for longer names that embed a subject (e.g. "intro_to_data_structures")
+    if len(t) > 3 and _SUBJ_RE.search(t):
         return "subject"
-    # Normalize for partial match (e.g. "Logical Reasoning" -> logical_reasoning)
-    for subj in SUBJECT_TOPICS:
-        if subj in t or t in subj:
-            return "subject"
     return "gat"
 
 
-def parse_line(line: str) -> dict | None:
-    """Parse one JSONL line into a questions row. Returns None if invalid/skip."""
-    line = line.strip()
-    if not line:
-        return None
+# SHA-1 state already fed with the namespace; each id only hashes its own name bytes
+_NS_SHA1 = hashlib.sha1(NAMESPACE_DNS.bytes)
+
+
+def _uuid5_str(name: str) -> str:
+    """str(uuid5(NAMESPACE_DNS, name)) without building a UUID object."""
+    h = _NS_SHA1.copy()
+    h.update(name.encode("utf-8"))
+    b = bytearray(h.digest()[:16])
+    b[6] = (b[6] & 0x0F) | 0x50  # version 5
+    b[8] = (b[8] & 0x3F) | 0x80  # RFC 4122 variant
+    x = b.hex()
+    return f"{x[:8]}-{x[8:12]}-{x[12:16]}-{x[16:20]}-{x[20:]}"
+
+
+def parse_line_bytes(
+    line: bytes,
+    _loads=orjson.loads,
+    _decode_error=orjson.JSONDecodeError,
+    _uuid5_str=_uuid5_str,
+    _isinstance=isinstance,
+    _list=list,
+    _to_category=topic_to_category,
+) -> dict | None:
+    """Parse one raw JSONL line into a questions row. Returns None if invalid/skip.
+    No strip: orjson ignores surrounding whitespace and rejects blank lines itself.
+    Hot-loop globals are bound as default args so each call resolves them as fast locals."""
     try:
-        raw = json.loads(line)
-    except json.JSONDecodeError:
+        raw = _loads(line)
+    except _decode_error:
+        return None
+    if not _isinstance(raw, dict):
         return None
     question_id = raw.get("question_id")
     if not question_id:
@@ -47,25 +96,25 @@ def parse_line(line: str) -> dict | None:
     topic = (raw.get("topic") or "").strip()
     text = raw.get("text") or raw.get("question_text") or ""
     options = raw.get("options")
-    if not isinstance(options, list) or len(options) < 2:
+    if not _isinstance(options, _list):
+        return None
+    n_opts = len(options)
+    if n_opts < 2:
         return None
     correct_option = raw.get("correct_option", 0)
-    if not isinstance(correct_option, int) or correct_option < 0:
-        correct_option = 0
-    if correct_option >= len(options):
+    if not _isinstance(correct_option, int) or correct_option < 0 or correct_option >= n_opts:
         correct_option = 0
     # DB allows 2–10 options; keep as-is (no truncation). Cap at 10 for consistency.
-    if len(options) > 10:
+    if n_opts > 10:
         options = options[:10]
-        if correct_option >= 10:
-            correct_option = 9
+        correct_option = min(correct_option, 9)
     steps = raw.get("explanation_steps") or []
-    explanation = " ".join(steps) if isinstance(steps, list) else str(steps)
+    explanation = " ".join(steps) if _isinstance(steps, _list) else str(steps)
 
-    uid = str(uuid5(NAMESPACE_DNS, question_id))
+    uid = _uuid5_str(question_id)
     return {
         "id": uid,
-        "category": topic_to_category(topic),
+        "category": _to_category(topic),
         "sub_category": topic or "unknown",
         "text": text,
         "options": options,
@@ -75,31 +124,107 @@ def parse_line(line: str) -> dict | None:
     }
 
 
+def parse_line(line: str | bytes) -> dict | None:
+    """Parse one JSONL line (str or bytes) into a questions row. Returns None if invalid/skip."""
+    line = line.strip()
+    if not line:
+        return None
+    return parse_line_bytes(line)
+
+
 def load_and_transform(path: Path):
-    """Read JSONL and yield transformed question rows."""
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            row = parse_line(line)
-            if row:
-                yield row
+    """Read JSONL and yield transformed question rows. The file is mmap'd and split into raw
+    byte lines; orjson decodes UTF-8 itself, so no text-layer decoding happens per line."""
+    with path.open("rb") as f:
+        if not f.seek(0, 2):
+            return  # mmap cannot map an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                row = parse_line_bytes(line)
+                if row:
+                    yield row
+
+
+def _open_hash_cache(path: Path) -> sqlite3.Connection:
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE IF NOT EXISTS h(id TEXT PRIMARY KEY, h BLOB)")
+    return db
 
 
-def run_import(jsonl_path: Path | None = None, chunk_size: int = 200, dry_run: bool = False, replace: bool = False):
+def skip_unchanged(db: sqlite3.Connection, rows, pending: list, batch: int = 500):
+    """Yield only rows whose blake2b content hash differs from the cache. A repeated id is compared with the version
+    already yielded for it (or the cached one), so the last occurrence wins, as in db._dedupe_by_id.
+    (id, hash) of yielded rows go to `pending` in order; write them with INSERT OR REPLACE once the upsert succeeds."""
+    latest = {}  # id -> hash of the version the DB will end up with so far
+    buf = []
+
+    def flush():
+        ids = list({r["id"] for r, _ in buf})
+        known = dict(db.execute(f"SELECT id, h FROM h WHERE id IN ({','.join('?' * len(ids))})", ids))
+        for r, h in buf:
+            i = r["id"]
+            prev = latest[i] if i in latest else known.get(i)
+            latest[i] = h
+            if prev != h:
+                pending.append((i, h))
+                yield r
+        buf.clear()
+
+    for r in rows:
+        buf.append((r, hashlib.blake2b(orjson.dumps(r, option=orjson.OPT_SORT_KEYS), digest_size=8).digest()))
+        if len(buf) >= batch:
+            yield from flush()
+    if buf:
+        yield from flush()
+
+
+async def _upsert_async(rows: list[dict], chunk_size: int, concurrency: int) -> int:
+    client = await get_supabase_async()
+    return await upsert_questions_bulk_async(client, rows, chunk_size=chunk_size, concurrency=concurrency)
+
+
+def run_import(
+    jsonl_path: Path | None = None,
+    chunk_size: int = 200,
+    dry_run: bool = False,
+    replace: bool = False,
+    use_async: bool = False,
+    concurrency: int = 16,
+    use_cache: bool = True,
+):
     path = jsonl_path or DEFAULT_JSONL
     if not path.exists():
         raise FileNotFoundError(f"JSONL not found: {path}")
-    rows = list(load_and_transform(path))
     if dry_run:
-        print(f"Dry run: would upsert {len(rows)} questions from {path}")
-        if rows:
-            print("Sample row:", rows[0])
+        n, sample = 0, None
+        for row in load_and_transform(path):
+            n += 1
+            sample = sample or row
+        print(f"Dry run: would upsert {n} questions from {path}")
+        if sample:
+            print("Sample row:", sample)
         return
     client = get_supabase_uncached()
+    cache = _open_hash_cache(HASH_CACHE) if use_cache else None
     if replace:
         delete_questions_by_source(client, "examveda")
         print("Deleted existing examveda questions")
-    upsert_questions_bulk(client, rows, chunk_size=chunk_size)
-    print(f"Upserted {len(rows)} questions from {path}")
+        if cache:
+            cache.execute("DELETE FROM h")
+            cache.commit()
+    rows = load_and_transform(path)
+    pending = []
+    if cache:
+        rows = skip_unchanged(cache, rows, pending)
+    if use_async:
+        n = asyncio.run(_upsert_async(list(rows), chunk_size, concurrency))
+    else:
+        n = upsert_questions_stream(client, rows, chunk_size=chunk_size)
+    if cache:
+        cache.executemany("INSERT OR REPLACE INTO h VALUES (?, ?)", pending)
+        cache.commit()
+        cache.close()
+    print(f"Upserted {n} questions from {path}")
 
 
 if __name__ == "__main__":
@@ -114,6 +239,17 @@ if __name__ == "__main__":
     parser.add_argument("--chunk-size", type=int, default=200, help="Upsert chunk size (default 200)")
     parser.add_argument("--dry-run", action="store_true", help="Parse only, do not upsert")
     parser.add_argument("--replace", action="store_true", help="Delete existing examveda questions, then upsert (fresh import)")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Upsert with the async client (asyncio.gather)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max in-flight upserts with --async (default 16)")
+    parser.add_argument("--no-cache", action="store_true", help=f"Upsert every row, ignoring the unchanged-row cache ({HASH_CACHE.name})")
     args = parser.parse_args()
     path = Path(args.jsonl) if args.jsonl else DEFAULT_JSONL
-    run_import(jsonl_path=path, chunk_size=args.chunk_size, dry_run=args.dry_run, replace=args.replace)
+    run_import(
+        jsonl_path=path,
+        chunk_size=args.chunk_size,
+        dry_run=args.dry_run,
+        replace=args.replace,
+        use_async=args.use_async,
+        concurrency=args.concurrency,
+        use_cache=not args.no_cache,
+    )
@@ -1,14 +1,17 @@
-"""Initialize Supabase database schema for PrepMaster AI."""
+"""Initialize Supabase database schema for PrepMaster AI.
+
+With SUPABASE_DB_URL (direct Postgres / session pooler connection string) set, the whole schema plus the
+RPC functions the app calls (supabase_migration_rpc_functions.sql) run as one psycopg transaction;
+otherwise the SQL is printed for the Supabase SQL Editor.
+"""
 import os
+from pathlib import Path
+
 from dotenv import load_dotenv
-from supabase import create_client
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-client = create_client(SUPABASE_URL, SUPABASE_KEY)
+SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
 
 # SQL schema
 SCHEMA_SQL = """
@@ -70,34 +73,42 @@ CREATE TABLE IF NOT EXISTS session_answers (
 -- Create indexes for performance
 CREATE INDEX IF NOT EXISTS idx_questions_category ON questions(category);
 CREATE INDEX IF NOT EXISTS idx_questions_sub_category ON questions(sub_category);
+CREATE INDEX IF NOT EXISTS idx_questions_cat_sub ON questions(category, sub_category);
+CREATE INDEX IF NOT EXISTS idx_questions_source ON questions(source) WHERE source IS NOT NULL;
 CREATE INDEX IF NOT EXISTS idx_user_stats_user_id ON user_stats(user_id);
 CREATE INDEX IF NOT EXISTS idx_user_stats_question_id ON user_stats(question_id);
 CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);
 CREATE INDEX IF NOT EXISTS idx_session_answers_session_id ON session_answers(session_id);
 """
 
-print("Initializing Supabase schema...")
-print(f"URL: {SUPABASE_URL}")
+# select_random_questions, get_mock_test_questions, set_questions_category, ...; Mock Test needs them
+RPC_FUNCTIONS_SQL = (Path(__file__).resolve().parent / "supabase_migration_rpc_functions.sql").read_text(encoding="utf-8")
+SETUP_SQL = SCHEMA_SQL + "\n" + RPC_FUNCTIONS_SQL
+
+
+def apply_schema(db_url: str, sql: str = SETUP_SQL):
+    """Run the schema and RPC functions in one transaction on one connection: everything applies or nothing does."""
+    import psycopg
 
-try:
-    # Execute schema (split by semicolon and execute each statement)
-    statements = [s.strip() for s in SCHEMA_SQL.split(';') if s.strip()]
-    
-    for i, stmt in enumerate(statements, 1):
-        print(f"Executing statement {i}/{len(statements)}...")
+    with psycopg.connect(db_url) as conn, conn.cursor() as cur:
+        cur.execute(sql)
+
+
+def print_manual_instructions():
+    print("Run this SQL in Supabase SQL Editor:")
+    print("Go to: https://app.supabase.com > SQL Editor > New Query")
+    print(SETUP_SQL)
+
+
+if __name__ == "__main__":
+    print("Initializing Supabase schema...")
+    if not SUPABASE_DB_URL:
+        print("SUPABASE_DB_URL not set; cannot connect to Postgres directly.\n")
+        print_manual_instructions()
+    else:
         try:
-            # Use execute_raw_query via the SQL module if available
-            # For now, just show what would be executed
-            print(f"  {stmt[:60]}...")
+            apply_schema(SUPABASE_DB_URL)
+            print("\n✓ Schema initialization complete")
         except Exception as e:
-            print(f"  Error: {e}")
-    
-    print("\n✓ Schema initialization complete")
-    print("\nNote: Due to Supabase client limitations, run this SQL in Supabase SQL Editor:")
-    print(SCHEMA_SQL)
-    
-except Exception as e:
-    print(f"Error: {e}")
-    print("\nYou need to run the schema SQL manually in Supabase SQL Editor")
-    print("Go to: https://app.supabase.com > SQL Editor > New Query")
-    print("Paste the SQL above and run it")
+            print(f"Error: {e} (transaction rolled back)\n")
+            print_manual_instructions()
@@ -2,35 +2,96 @@
 Database operations for PrepMaster AI.
 Handles Supabase CRUD for questions, user stats, and sessions.
 """
+import asyncio
+import functools
 import logging
+import threading
+import time
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from uuid import UUID
 from decimal import Decimal
 
+import httpx
+import orjson
+from postgrest.types import ReturnMethod
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import os
+import sys
+from pathlib import Path
+
+# db.py lives at the repo root (same bootstrap as src/db_manager.py)
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from db import is_missing_rpc, tune_postgrest_http
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Question pool per user is reused for this long; stats shown to the weighting lag by at most this much
+QUESTION_POOL_TTL = 60
+QUESTION_POOL_CACHE_SIZE = 128
+# get_performance_summary results are reused this long; ending any session clears them
+PERFORMANCE_SUMMARY_TTL = 300
+# Each PostgREST upsert is already one multi-row INSERT ... ON CONFLICT; larger chunks mean fewer of them
+UPSERT_CHUNK_SIZE = 1000
+
+
+def _columns_param(rows: List[Dict]) -> str:
+    """PostgREST ?columns= for a bulk body: union of keys in first-seen order, quoted (as postgrest-py sends it).
+    Without it, objects with different key sets are rejected (PGRST102)."""
+    return ",".join(f'"{k}"' for k in dict.fromkeys(k for r in rows for k in r))
+
+
+def _upsert_chunks(questions: List[Dict], chunk_size: int) -> List[List[Dict]]:
+    """
+    One row per id (last wins): a multi-row ON CONFLICT cannot touch the same row twice.
+    Rows without an id get the DB default; they are chunked on their own so columns= never lists "id" for them.
+    """
+    by_id: Dict = {}
+    no_id: List[Dict] = []
+    for q in questions:
+        if q.get("id") is None:
+            no_id.append(q)
+        else:
+            by_id[q["id"]] = q
+    return [
+        rows[i:i+chunk_size]
+        for rows in (list(by_id.values()), no_id)
+        for i in range(0, len(rows), chunk_size)
+    ]
 
 
 class DatabaseClient:
     """Wrapper around Supabase client with PrepMaster-specific operations."""
     
     def __init__(self):
-        self.client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        # Read here, not at import: importing this module never needs (or fails on) credentials
+        self._url = os.getenv("SUPABASE_URL")
+        self._key = os.getenv("SUPABASE_KEY")
+        if not self._url or not self._key:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
+        self.client: Client = tune_postgrest_http(create_client(self._url, self._key), keepalive_expiry=60.0)
+        # {user_id: (fetched_at, limit, questions)}; oldest entry evicted past QUESTION_POOL_CACHE_SIZE
+        self._qcache: Dict[str, tuple] = {}
+        self._qcache_lock = threading.Lock()
+        # Single-flight: concurrent pool fetches for the same (user_id, limit) share one query
+        self._inflight: Dict[tuple, list] = {}  # key -> [done Event, result]
+        self._inflight_lock = threading.Lock()
+        self._perf_cache: Dict[str, tuple] = {}  # {user_id: (computed_at, summary)}
     
     # ============= Questions =============
     
     def get_questions_for_session(self, user_id: UUID, limit: int = 1000) -> List[Dict]:
         """
         Fetch all available questions with user stats for weighted selection.
+        Cached per user for QUESTION_POOL_TTL seconds; update_user_stats drops that user's entry.
+        Concurrent misses for the same user wait on the first caller's query instead of repeating it.
         
         Args:
             user_id: UUID of user (for stats lookup)
@@ -39,12 +100,39 @@ class DatabaseClient:
         Returns:
             List of questions with fail_count, last_attempted_at, etc.
         """
+        key = str(user_id)
+        hit = self._qcache.get(key)
+        if hit and hit[1] == limit and time.monotonic() - hit[0] < QUESTION_POOL_TTL:
+            return list(hit[2])
+        
+        flight_key = (key, limit)
+        with self._inflight_lock:
+            flight = self._inflight.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[flight_key] = [threading.Event(), []]
+        if not leader:
+            flight[0].wait()
+            return list(flight[1])
+        
         try:
             response = self.client.table("questions_with_stats").select("*").limit(limit).execute()
-            return response.data if response.data else []
+            data = response.data if response.data else []
+            # Leaders for different users write concurrently; insert + evict must not interleave
+            with self._qcache_lock:
+                self._qcache.pop(key, None)
+                self._qcache[key] = (time.monotonic(), limit, data)
+                if len(self._qcache) > QUESTION_POOL_CACHE_SIZE:
+                    self._qcache.pop(next(iter(self._qcache)), None)
+            flight[1] = data
+            return list(data)
         except Exception as e:
             logger.error(f"Error fetching questions: {e}")
             return []
+        finally:
+            with self._inflight_lock:
+                del self._inflight[flight_key]
+            flight[0].set()
     
     def get_questions_by_category(self, category: str, limit: int = 100) -> List[Dict]:
         """Fetch questions filtered by category (gat or subject)."""
@@ -62,15 +150,10 @@ class DatabaseClient:
             return []
     
     def get_random_questions(self, category: str, count: int) -> List[Dict]:
-        """Fetch random questions by category."""
+        """Fetch random questions by category, sampled server-side by the select_random_questions
+        RPC (supabase_migration_rpc_functions.sql); only `count` rows come back."""
         try:
-            response = (
-                self.client.table("questions")
-                .select("*")
-                .eq("category", category)
-                .limit(count)
-                .execute()
-            )
+            response = self.client.rpc("select_random_questions", {"p_category": category, "n": count}).execute()
             return response.data if response.data else []
         except Exception as e:
             logger.error(f"Error fetching random questions: {e}")
@@ -103,28 +186,28 @@ class DatabaseClient:
             Dict mapping sub_category -> count
         """
         try:
-            # Fetch all questions with category and sub_category
-            all_rows = []
+            response = self.client.rpc("subcategory_counts", {"p_category": category}).execute()
+            return {row["sub_category"]: row["n"] for row in response.data or []}
+        except Exception as e:
+            logger.warning(f"subcategory_counts RPC failed, counting client-side: {e}")
+        try:
+            # Only sub_category is needed (category is the filter); count each page as it arrives
+            counts = Counter()
             page_size = 1000
             offset = 0
             while True:
-                query = self.client.table("questions").select("category", "sub_category")
+                query = self.client.table("questions").select("sub_category")
                 if category:
                     query = query.eq("category", category)
                 response = query.range(offset, offset + page_size - 1).execute()
                 data = response.data or []
                 if not data:
                     break
-                all_rows.extend(data)
+                counts.update(row["sub_category"] or "(blank)" for row in data)
                 if len(data) < page_size:
                     break
                 offset += page_size
-            
-            # Count by sub_category
-            from collections import Counter
-            sub_cats = [row.get("sub_category") or "(blank)" for row in all_rows]
-            counts = dict(Counter(sub_cats))
-            return counts
+            return dict(counts)
         except Exception as e:
             logger.error(f"Error getting subcategory counts: {e}")
             return {}
@@ -132,8 +215,13 @@ class DatabaseClient:
     def get_subcategories_by_category(self, category: str) -> List[str]:
         """Get list of unique subcategories for a given category."""
         try:
-            # Fetch distinct sub_categories
-            all_rows = []
+            response = self.client.rpc("distinct_subcategories", {"p_category": category}).execute()
+            return [row["sub_category"] for row in response.data or []]
+        except Exception as e:
+            logger.warning(f"distinct_subcategories RPC failed, scanning client-side: {e}")
+        try:
+            # Collect distinct non-empty sub_categories page by page
+            subcategories = set()
             page_size = 1000
             offset = 0
             while True:
@@ -147,14 +235,11 @@ class DatabaseClient:
                 data = response.data or []
                 if not data:
                     break
-                all_rows.extend(data)
+                subcategories.update(row["sub_category"] for row in data if row["sub_category"])
                 if len(data) < page_size:
                     break
                 offset += page_size
-            
-            # Get unique subcategories
-            subcategories = sorted(set(row.get("sub_category") or "" for row in all_rows if row.get("sub_category")))
-            return [s for s in subcategories if s]  # Filter out empty strings
+            return sorted(subcategories)
         except Exception as e:
             logger.error(f"Error getting subcategories: {e}")
             return []
@@ -168,9 +253,11 @@ class DatabaseClient:
             logger.error(f"Error upserting question: {e}")
             return False
     
-    def upsert_questions_batch(self, questions: List[Dict], chunk_size: int = 200) -> int:
+    def upsert_questions_batch(self, questions: List[Dict], chunk_size: int = UPSERT_CHUNK_SIZE) -> int:
         """
         Batch upsert questions with chunking.
+        Runs upsert_questions_batch_async on its own event loop; called from inside a running loop
+        (async code, notebooks), where asyncio.run would raise, the chunks are upserted one by one instead.
         
         Args:
             questions: List of question dicts
@@ -179,19 +266,79 @@ class DatabaseClient:
         Returns:
             Total number of questions upserted
         """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.upsert_questions_batch_async(questions, chunk_size))
         total = 0
-        for i in range(0, len(questions), chunk_size):
-            chunk = questions[i:i+chunk_size]
+        for n, chunk in enumerate(_upsert_chunks(questions, chunk_size), 1):
             try:
-                self.client.table("questions").upsert(chunk).execute()
+                self.client.table("questions").upsert(chunk, on_conflict="id", returning=ReturnMethod.minimal).execute()
+                logger.debug(f"Upserted chunk {n}: {len(chunk)} questions")
                 total += len(chunk)
-                logger.debug(f"Upserted chunk {i//chunk_size + 1}: {len(chunk)} questions")
             except Exception as e:
                 logger.error(f"Error upserting chunk: {e}")
+        logger.info(f"Total questions upserted: {total}")
+        return total
+    
+    async def upsert_questions_batch_async(
+        self,
+        questions: List[Dict],
+        chunk_size: int = UPSERT_CHUNK_SIZE,
+        concurrency: int = 8
+    ) -> int:
+        """
+        Batch upsert with up to `concurrency` chunks in flight on one event loop.
+        A failed chunk is logged and skipped; the others still go through.
+        
+        Returns:
+            Total number of questions upserted
+        """
+        sem = asyncio.Semaphore(concurrency)
+        
+        async def upsert_chunk(http: httpx.AsyncClient, n: int, chunk: List[Dict]) -> int:
+            async with sem:
+                try:
+                    await self._post_json(
+                        http,
+                        "questions",
+                        chunk,
+                        "resolution=merge-duplicates,return=minimal",
+                        params={"on_conflict": "id", "columns": _columns_param(chunk)},
+                    )
+                    logger.debug(f"Upserted chunk {n}: {len(chunk)} questions")
+                    return len(chunk)
+                except Exception as e:
+                    logger.error(f"Error upserting chunk: {e}")
+                    return 0
         
+        chunks = _upsert_chunks(questions, chunk_size)
+        # The async pool is bound to this event loop, so it is created per call
+        async with httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        ) as http:
+            done = await asyncio.gather(*(upsert_chunk(http, n, c) for n, c in enumerate(chunks, 1)))
+        total = sum(done)
         logger.info(f"Total questions upserted: {total}")
         return total
     
+    async def _post_json(self, http: httpx.AsyncClient, path: str, data, prefer: str, params: Optional[Dict] = None) -> httpx.Response:
+        """POST to PostgREST with the body encoded by orjson (bytes, UUID/datetime aware) instead of stdlib json."""
+        response = await http.post(
+            f"{self._url}/rest/v1/{path}",
+            params=params,
+            content=orjson.dumps(data),
+            headers={
+                "apikey": self._key,
+                "Authorization": f"Bearer {self._key}",
+                "Content-Type": "application/json",
+                "Prefer": prefer,
+            },
+        )
+        response.raise_for_status()
+        return response
+    
     # ============= User Stats =============
     
     def get_user_stats(self, user_id: UUID, question_id: Optional[UUID] = None) -> List[Dict]:
@@ -233,6 +380,8 @@ class DatabaseClient:
         Returns:
             True if successful
         """
+        self._qcache.pop(str(user_id), None)
+        now = datetime.utcnow().isoformat()
         try:
             # Get existing stats
             existing = self.client.table("user_stats").select("*").match({
@@ -246,10 +395,10 @@ class DatabaseClient:
                 update_data = {
                     "fail_count": stat["fail_count"] + (0 if is_correct else 1),
                     "success_count": stat["success_count"] + (1 if is_correct else 0),
-                    "last_attempted_at": datetime.utcnow().isoformat()
+                    "last_attempted_at": now
                 }
                 if is_correct:
-                    update_data["last_correct_at"] = datetime.utcnow().isoformat()
+                    update_data["last_correct_at"] = now
                 
                 self.client.table("user_stats").update(update_data).eq("id", stat["id"]).execute()
             else:
@@ -259,8 +408,8 @@ class DatabaseClient:
                     "question_id": str(question_id),
                     "fail_count": 0 if is_correct else 1,
                     "success_count": 1 if is_correct else 0,
-                    "last_attempted_at": datetime.utcnow().isoformat(),
-                    "last_correct_at": datetime.utcnow().isoformat() if is_correct else None
+                    "last_attempted_at": now,
+                    "last_correct_at": now if is_correct else None
                 }
                 self.client.table("user_stats").insert(insert_data).execute()
             
@@ -269,6 +418,32 @@ class DatabaseClient:
             logger.error(f"Error updating user stats: {e}")
             return False
     
+    def bulk_update_user_stats(self, user_id: UUID, deltas: List[Dict]) -> bool:
+        """
+        Apply all of a session's stat changes at once (bump_user_stats RPC: one
+        INSERT ... ON CONFLICT DO UPDATE) instead of a SELECT + write per answer.
+        
+        Args:
+            user_id: UUID of user
+            deltas: TestSession.stat_deltas rows
+                {question_id, delta_fail, delta_success, last_attempted_at, last_correct_at}
+        
+        Returns:
+            True if successful
+        """
+        if not deltas:
+            return True
+        self._qcache.pop(str(user_id), None)
+        try:
+            self.client.rpc("bump_user_stats", {"p_user_id": str(user_id), "p_updates": deltas}).execute()
+            return True
+        except Exception as e:
+            logger.warning(f"bump_user_stats RPC failed, updating per question: {e}")
+        ok = True
+        for d in deltas:
+            ok &= self.update_user_stats(user_id, d["question_id"], d["delta_success"] > 0)
+        return ok
+    
     # ============= Sessions =============
     
     def create_session(
@@ -328,6 +503,17 @@ class DatabaseClient:
             logger.error(f"Error saving session answer: {e}")
             return False
     
+    def save_session_answers_bulk(self, session_id: UUID, answers: List[Dict]) -> bool:
+        """Record several answers of a session with one multi-row insert."""
+        try:
+            now = datetime.utcnow().isoformat()
+            rows = [{**a, "session_id": str(session_id), "created_at": now} for a in answers]
+            self.client.table("session_answers").insert(rows).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving session answers: {e}")
+            return False
+    
     def end_session(
         self,
         session_id: UUID,
@@ -336,6 +522,8 @@ class DatabaseClient:
         questions_answered: int
     ) -> bool:
         """Finalize a session."""
+        # The session's user isn't known here; sessions end rarely, so drop every cached summary
+        self._perf_cache.clear()
         try:
             update_data = {
                 "status": "completed",
@@ -350,6 +538,46 @@ class DatabaseClient:
             logger.error(f"Error ending session: {e}")
             return False
     
+    def finalize_session(
+        self,
+        session_id: UUID,
+        score_earned: Decimal,
+        pass_status: bool,
+        questions_answered: int,
+        answers: List[Dict]
+    ) -> Optional[Dict]:
+        """
+        Save all answers and close the session in one round-trip (finalize_session RPC),
+        instead of one save_session_answer call per answer plus end_session.
+        
+        Args:
+            answers: TestSession.answer_records() rows
+        
+        Returns:
+            {sub_category: {total, correct}} for the saved answers, or None if failed (the RPC may
+            still have committed, so don't re-save the answers)
+        """
+        self._perf_cache.clear()
+        try:
+            response = self.client.rpc("finalize_session", {
+                "p_session_id": str(session_id),
+                "p_score_earned": float(score_earned),
+                "p_pass_status": pass_status,
+                "p_questions_answered": questions_answered,
+                "p_answers": answers
+            }).execute()
+            return response.data or {}
+        except Exception as e:
+            # Only a missing function falls back: after e.g. a read timeout the RPC may have committed already,
+            # and inserting the answers again would duplicate them
+            if not is_missing_rpc(e):
+                logger.error(f"finalize_session RPC failed: {e}")
+                return None
+            logger.warning(f"finalize_session RPC not installed, saving answers with one insert: {e}")
+        if answers and not self.save_session_answers_bulk(session_id, answers):
+            return None
+        return {} if self.end_session(session_id, score_earned, pass_status, questions_answered) else None
+    
     def get_session_history(self, user_id: UUID, limit: int = 10) -> List[Dict]:
         """Fetch user's session history."""
         try:
@@ -390,47 +618,57 @@ class DatabaseClient:
             List of {sub_category, fail_count, success_count, accuracy_percent}
         """
         try:
-            # This is a complex query; for now, fetch all stats and compute locally
-            stats = self.get_user_stats(user_id)
-            
-            # Group by sub_category
-            category_stats = {}
-            for stat in stats:
-                # Fetch question to get sub_category
-                q_response = (
-                    self.client.table("questions")
-                    .select("sub_category")
-                    .eq("id", stat["question_id"])
-                    .single()
-                    .execute()
-                )
-                if q_response.data:
-                    cat = q_response.data["sub_category"]
-                    if cat not in category_stats:
-                        category_stats[cat] = {"fail": 0, "success": 0}
-                    category_stats[cat]["fail"] += stat["fail_count"]
-                    category_stats[cat]["success"] += stat["success_count"]
-            
-            # Calculate accuracy and sort by fail count
+            # Already sorted by fail count and cut to top_n
             results = []
-            for cat, counts in category_stats.items():
-                total = counts["fail"] + counts["success"]
-                accuracy = (counts["success"] / total * 100) if total > 0 else 0
+            for cat, fail, success in self._weak_area_totals(user_id, top_n):
+                total = fail + success
+                accuracy = (success / total * 100) if total > 0 else 0
                 results.append({
                     "sub_category": cat,
-                    "fail_count": counts["fail"],
-                    "success_count": counts["success"],
+                    "fail_count": fail,
+                    "success_count": success,
                     "accuracy_percent": accuracy
                 })
-            
-            results.sort(key=lambda x: x["fail_count"], reverse=True)
-            return results[:top_n]
+            return results
         except Exception as e:
             logger.error(f"Error fetching weak areas: {e}")
             return []
     
+    def _weak_area_totals(self, user_id: UUID, top_n: int) -> List[tuple]:
+        """Top-n (sub_category, fail, success) by fail, in one round-trip: weak_areas_by_user RPC (GROUP BY,
+        ORDER BY, LIMIT in Postgres), or if it isn't installed, user_stats with sub_category embedded."""
+        try:
+            response = self.client.rpc("weak_areas_by_user", {"uid": str(user_id), "n": top_n}).execute()
+            return [(row["sub_category"], row["fail"], row["success"]) for row in response.data or []]
+        except Exception as e:
+            logger.warning(f"weak_areas_by_user RPC failed, grouping client-side: {e}")
+        response = (
+            self.client.table("user_stats")
+            .select("fail_count,success_count,questions(sub_category)")
+            .eq("user_id", str(user_id))
+            .execute()
+        )
+        category_stats = {}
+        for stat in response.data or []:
+            if not stat.get("questions"):
+                continue
+            counts = category_stats.setdefault(stat["questions"]["sub_category"], {"fail": 0, "success": 0})
+            counts["fail"] += stat["fail_count"]
+            counts["success"] += stat["success_count"]
+        ranked = sorted(category_stats.items(), key=lambda x: x[1]["fail"], reverse=True)[:top_n]
+        return [(cat, c["fail"], c["success"]) for cat, c in ranked]
+    
     def get_performance_summary(self, user_id: UUID) -> Dict:
-        """Get overall performance metrics for user."""
+        """Get overall performance metrics for user. Cached for PERFORMANCE_SUMMARY_TTL seconds."""
+        hit = self._perf_cache.get(str(user_id))
+        if hit and time.monotonic() - hit[0] < PERFORMANCE_SUMMARY_TTL:
+            return dict(hit[1])
+        summary = self._compute_performance_summary(user_id)
+        if summary:
+            self._perf_cache[str(user_id)] = (time.monotonic(), summary)
+        return dict(summary)
+    
+    def _compute_performance_summary(self, user_id: UUID) -> Dict:
         try:
             sessions = self.get_session_history(user_id)
             
@@ -461,13 +699,7 @@ class DatabaseClient:
             return {}
 
 
-# Singleton instance
-_db_client: Optional[DatabaseClient] = None
-
-
+@functools.lru_cache(maxsize=1)
 def get_database() -> DatabaseClient:
-    """Get or create database client singleton."""
-    global _db_client
-    if _db_client is None:
-        _db_client = DatabaseClient()
-    return _db_client
+    """Get or create database client singleton (created on first call; get_database.cache_clear() for a fresh one)."""
+    return DatabaseClient()
@@ -3,22 +3,43 @@ Mock Test Engine: Weighted question selection, scoring, and session management.
 Implements 70/30 GAT/Subject split with priority-based weighting (fail_count + days_since_practiced).
 """
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Tuple
+import queue
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
 from uuid import uuid4, UUID
 import random
-from decimal import Decimal
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+_rng = np.random.default_rng()
+
+
+def _epoch_seconds(value) -> float:
+    """last_attempted_at (datetime or ISO string, naive = UTC) -> POSIX seconds; NaN if missing/unparseable."""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return np.nan
+    if not isinstance(value, datetime):
+        return np.nan
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
 
 class TestSession:
     """Manages a single mock test session with weighted question selection and scoring."""
     
-    # Scoring constants
-    SCORE_CORRECT = Decimal("1.0")
-    SCORE_INCORRECT = Decimal("-0.25")
-    SCORE_SKIP = Decimal("0.0")
+    # Scoring constants, in quarter points (+1 / -0.25 / 0) so score arithmetic stays exact int math
+    SCORE_SCALE = 4
+    _SCORE_CORRECT = 4
+    _SCORE_INCORRECT = -1
+    _SCORE_SKIP = 0
     
     # Exam composition
     TOTAL_QUESTIONS = 100
@@ -28,13 +49,13 @@ class TestSession:
     # Timing
     TIME_LIMIT_MINUTES = 120
     TIME_LIMIT_SECONDS = TIME_LIMIT_MINUTES * 60
-    AUTO_SAVE_INTERVAL = 5  # Save every N questions
+    AUTO_SAVE_INTERVAL = 5  # Save every N questions (or every N seconds, whichever comes first)
     
     # Weighting algorithm
     FAIL_COUNT_WEIGHT = 2.0
     DAYS_WEIGHT = 1.0
     
-    def __init__(self, user_id: UUID, question_pool: List[Dict]):
+    def __init__(self, user_id: UUID, question_pool: List[Dict], db=None, session_id: Optional[UUID] = None):
         """
         Initialize test session.
         
@@ -43,75 +64,103 @@ class TestSession:
             question_pool: Pre-fetched list of questions with stats
                 Expected keys: id, category, text, options, correct_answer_idx, 
                             fail_count, last_attempted_at, explanation
+            db: Optional DatabaseClient. If given, answers are saved in the background as they
+                come in (batched by AUTO_SAVE_INTERVAL) and end_session flushes the rest; failed
+                batches are retried, and whatever is still unsaved is left in answer_records().
+            session_id: sessions row id (from DatabaseClient.create_session) when db is given
         """
-        self.session_id = uuid4()
+        self.session_id = session_id or uuid4()
         self.user_id = user_id
         self.question_pool = question_pool
         
         self.questions: List[Dict] = []
-        self.answers: List[Dict] = {}  # {question_id: {user_choice_idx, time_spent_sec}}
+        self._qid_to_idx: Dict[str, int] = {}  # str(question id) -> index in self.questions
+        self.answers: Dict[str, Dict] = {}  # {question_id: {user_choice_idx, time_spent_sec}}
+        # Running totals over self.answers, so summaries don't rescan it
+        self._answered = 0
+        self._correct = 0
+        # user_stats changes per answered question, written once via DatabaseClient.bulk_update_user_stats
+        self.stat_deltas: List[Dict] = []
         
         self.started_at = datetime.utcnow()
         self.ended_at = None
         self.status = "in_progress"
         
-        self.score_earned = Decimal("0.0")
-        self.score_total = Decimal(str(self.TOTAL_QUESTIONS))
+        # Quarter points; divide by SCORE_SCALE for display
+        self.score_earned: int = 0
+        self.score_total: int = self.TOTAL_QUESTIONS * self.SCORE_SCALE
         
         # Track current position in exam
         self.current_question_idx = 0
+        
+        # Background answer writer: submit_answer only enqueues, so the network stays off the answer path
+        self._db = db
+        self._answer_queue: queue.Queue = queue.Queue()
+        self._writer = None
+        self._unsaved: Optional[List[Dict]] = None  # set by the writer on exit: rows it could not save
+        if db is not None:
+            self._writer = threading.Thread(target=self._write_answers, daemon=True)
+            self._writer.start()
+    
+    def _write_answers(self):
+        """
+        Drain the answer queue, saving every AUTO_SAVE_INTERVAL answers or seconds; None flushes and stops.
+        A failed save keeps its rows for the next attempt; rows still unsaved at None end up in self._unsaved.
+        """
+        batch = []
+        item = {}
+        while item is not None:
+            try:
+                item = self._answer_queue.get(timeout=self.AUTO_SAVE_INTERVAL)
+                timed_out = False
+            except queue.Empty:
+                item, timed_out = {}, True
+            if item:
+                batch.append(item)
+            if batch and (item is None or timed_out or len(batch) >= self.AUTO_SAVE_INTERVAL):
+                try:
+                    saved = self._db.save_session_answers_bulk(self.session_id, batch)
+                except Exception as e:  # keep the thread alive: a dead writer would drop every later answer
+                    logger.error(f"Session {self.session_id}: answer writer error: {e}")
+                    saved = False
+                if saved:
+                    batch = []
+                else:
+                    logger.warning(f"Session {self.session_id}: {len(batch)} answers not saved yet, will retry")
+        self._unsaved = batch
     
-    def _calculate_priority_score(self, fail_count: int, last_attempted_at: datetime) -> float:
+    def _priority_weights(self, questions: List[Dict]) -> np.ndarray:
         """
-        Calculate priority score for weighted selection.
+        Sampling weight per question, as one array pass.
         
         Formula: Priority = (fail_count × 2) + days_since_last_practiced
         
         Higher scores = higher probability of selection (weak areas prioritized)
         """
-        days_since = 999  # Default for never-attempted
-        if last_attempted_at:
-            days_since = (datetime.utcnow() - last_attempted_at).days
+        n = len(questions)
+        fail = np.fromiter((q.get("fail_count") or 0 for q in questions), dtype=float, count=n)
+        last = np.fromiter((_epoch_seconds(q.get("last_attempted_at")) for q in questions), dtype=float, count=n)
         
-        return (fail_count * self.FAIL_COUNT_WEIGHT) + (days_since * self.DAYS_WEIGHT)
+        # Whole days since last attempt (floored like timedelta.days); 999 for never-attempted
+        days = np.floor((datetime.now(timezone.utc).timestamp() - last) / 86400.0)
+        days = np.where(np.isnan(days), 999.0, days)
+        
+        # Min weight of 0.1 to avoid zero-weight
+        return np.maximum(0.1, fail * self.FAIL_COUNT_WEIGHT + days * self.DAYS_WEIGHT)
     
-    def _weighted_sample(self, questions: List[Dict], size: int) -> List[Dict]:
+    def _weighted_sample(self, questions: List[Dict], size: int, weights: Optional[np.ndarray] = None) -> List[Dict]:
         """
-        Select questions using weighted random sampling.
+        Select questions using weighted random sampling (without replacement).
         Higher fail_count + longer time since practice = higher probability.
+        `weights` may be passed in when already computed (see generate_questions).
         """
-        if len(questions) <= size:
+        n = len(questions)
+        if n <= size:
             return questions
-        
-        # Calculate weights
-        weights = []
-        for q in questions:
-            fail_count = q.get("fail_count", 0)
-            last_attempted_at = q.get("last_attempted_at")
-            
-            # Parse datetime if it's a string
-            if isinstance(last_attempted_at, str):
-                try:
-                    last_attempted_at = datetime.fromisoformat(last_attempted_at.replace("Z", "+00:00"))
-                except:
-                    last_attempted_at = None
-            
-            priority = self._calculate_priority_score(fail_count, last_attempted_at)
-            # Convert priority to probability weight (ensure > 0)
-            weight = max(0.1, priority)  # Min weight of 0.1 to avoid zero-weight
-            weights.append(weight)
-        
-        # Normalize weights
-        total_weight = sum(weights)
-        if total_weight == 0:
-            weights = [1.0] * len(questions)
-            total_weight = len(questions)
-        
-        normalized_weights = [w / total_weight for w in weights]
-        
-        # Weighted random choice without replacement
-        selected = random.choices(questions, weights=normalized_weights, k=size)
-        return selected
+        if weights is None:
+            weights = self._priority_weights(questions)
+        idx = _rng.choice(n, size=size, replace=False, p=weights / weights.sum())
+        return [questions[i] for i in idx]
     
     def generate_questions(self) -> List[Dict]:
         """
@@ -121,9 +170,12 @@ class TestSession:
         Returns:
             List of selected questions
         """
-        # Separate questions by category
-        gat_questions = [q for q in self.question_pool if q.get("category") == "gat"]
-        subject_questions = [q for q in self.question_pool if q.get("category") == "subject"]
+        # Separate questions by category (one pass over the pool)
+        buckets = defaultdict(list)
+        for q in self.question_pool:
+            buckets[q.get("category")].append(q)
+        gat_questions = buckets["gat"]
+        subject_questions = buckets["subject"]
         
         logger.info(f"Available: {len(gat_questions)} GAT, {len(subject_questions)} Subject")
         
@@ -133,15 +185,18 @@ class TestSession:
         if len(subject_questions) < self.SUBJECT_COUNT:
             logger.warning(f"Only {len(subject_questions)} Subject questions available, need {self.SUBJECT_COUNT}")
         
-        # Select questions using weighted sampling
-        gat_selected = self._weighted_sample(gat_questions, min(self.GAT_COUNT, len(gat_questions)))
-        subject_selected = self._weighted_sample(subject_questions, min(self.SUBJECT_COUNT, len(subject_questions)))
+        # Select questions using weighted sampling; weights for both categories in one pass
+        n_gat = len(gat_questions)
+        weights = self._priority_weights(gat_questions + subject_questions)
+        gat_selected = self._weighted_sample(gat_questions, min(self.GAT_COUNT, n_gat), weights[:n_gat])
+        subject_selected = self._weighted_sample(subject_questions, min(self.SUBJECT_COUNT, len(subject_questions)), weights[n_gat:])
         
         # Combine and shuffle
         all_questions = gat_selected + subject_selected
         random.shuffle(all_questions)
         
         self.questions = all_questions
+        self._qid_to_idx = {str(q["id"]): i for i, q in enumerate(all_questions)}
         logger.info(f"Test session {self.session_id}: Generated {len(all_questions)} questions")
         
         return all_questions
@@ -159,38 +214,63 @@ class TestSession:
             {is_correct, points_earned, explanation}
         """
         # Find question
-        question = next((q for q in self.questions if q["id"] == question_id), None)
+        idx = self._qid_to_idx.get(str(question_id))
+        question = self.questions[idx] if idx is not None else None
         if not question:
             logger.error(f"Question {question_id} not found in session")
             return {"is_correct": False, "points_earned": 0, "error": "Question not found"}
         
         # Record answer
         is_correct = False
-        points = self.SCORE_SKIP
+        points = self._SCORE_SKIP
         
         if user_choice_idx is not None:
             is_correct = user_choice_idx == question.get("correct_answer_idx")
-            points = self.SCORE_CORRECT if is_correct else self.SCORE_INCORRECT
-        
+            points = self._SCORE_CORRECT if is_correct else self._SCORE_INCORRECT
+        points_earned = points / self.SCORE_SCALE
+        
+        answered_at = datetime.utcnow().isoformat()
+        prev = self.answers.get(str(question_id))
+        if prev:  # re-answer replaces the earlier entry
+            self._answered -= prev["user_choice_idx"] is not None
+            self._correct -= prev["is_correct"]
+        self._answered += user_choice_idx is not None
+        self._correct += is_correct
         self.answers[str(question_id)] = {
             "user_choice_idx": user_choice_idx,
             "is_correct": is_correct,
-            "points_earned": points,
+            "points_earned": points_earned,
             "time_spent_sec": time_spent_sec,
-            "answered_at": datetime.utcnow().isoformat()
+            "answered_at": answered_at
         }
+        if self._writer is not None:
+            self._answer_queue.put({
+                "question_id": str(question_id),
+                "user_choice_idx": user_choice_idx,
+                "is_correct": is_correct,
+                "points_earned": points_earned,
+                "time_spent_sec": time_spent_sec
+            })
+        if user_choice_idx is not None:
+            self.stat_deltas.append({
+                "question_id": str(question_id),
+                "delta_fail": 0 if is_correct else 1,
+                "delta_success": 1 if is_correct else 0,
+                "last_attempted_at": answered_at,
+                "last_correct_at": answered_at if is_correct else None
+            })
         
         self.score_earned += points
         self.current_question_idx += 1
         
-        logger.debug(f"Answer recorded: Q={question_id[:8]}, Correct={is_correct}, Points={points}")
+        logger.debug(f"Answer recorded: Q={str(question_id)[:8]}, Correct={is_correct}, Points={points_earned}")
         
         return {
             "is_correct": is_correct,
-            "points_earned": float(points),
+            "points_earned": points_earned,
             "explanation": question.get("explanation", ""),
             "correct_answer_idx": question.get("correct_answer_idx"),
-            "total_score": float(self.score_earned)
+            "total_score": self.score_earned / self.SCORE_SCALE
         }
     
     def end_session(self) -> Dict:
@@ -203,13 +283,22 @@ class TestSession:
         self.ended_at = datetime.utcnow()
         self.status = "completed"
         
+        # Flush answers still queued for the background writer
+        if self._writer is not None:
+            self._answer_queue.put(None)
+            self._writer.join()
+            self._writer = None
+        answers_saved = self._db is not None and not self._unsaved
+        if self._db is not None and not answers_saved:
+            logger.error(f"Session {self.session_id}: {len(self._unsaved)} answers unsaved; finalize_session with answer_records()")
+        
         # Calculate pass status (50% = 50+ points out of 100)
-        pass_threshold = self.score_total / 2
+        pass_threshold = self.score_total // 2
         self.pass_status = self.score_earned >= pass_threshold
         
         # Calculate accuracy
-        answered = sum(1 for a in self.answers.values() if a["user_choice_idx"] is not None)
-        correct = sum(1 for a in self.answers.values() if a["is_correct"])
+        answered = self._answered
+        correct = self._correct
         accuracy = (correct / answered * 100) if answered > 0 else 0
         
         # Category breakdown
@@ -227,17 +316,19 @@ class TestSession:
             "session_id": str(self.session_id),
             "user_id": str(self.user_id),
             "status": self.status,
-            "score_earned": float(self.score_earned),
-            "score_total": float(self.score_total),
-            "percentage": float(self.score_earned / self.score_total * 100) if self.score_total > 0 else 0,
+            "score_earned": self.score_earned / self.SCORE_SCALE,
+            "score_total": self.score_total / self.SCORE_SCALE,
+            "percentage": self.score_earned / self.score_total * 100 if self.score_total > 0 else 0,
             "pass_status": self.pass_status,
-            "pass_threshold": float(pass_threshold),
+            "pass_threshold": pass_threshold / self.SCORE_SCALE,
             "questions_answered": answered,
             "questions_skipped": len(self.questions) - answered,
             "correct_count": correct,
             "accuracy_percent": accuracy,
             "duration_minutes": (self.ended_at - self.started_at).total_seconds() / 60,
             "category_breakdown": category_stats,
+            # False: pass answer_records() to DatabaseClient.finalize_session
+            "answers_saved": answers_saved,
             "started_at": self.started_at.isoformat(),
             "ended_at": self.ended_at.isoformat()
         }
@@ -246,6 +337,23 @@ class TestSession:
         
         return result
     
+    def answer_records(self) -> List[Dict]:
+        """Answers as session_answers rows (JSON-ready) for DatabaseClient.finalize_session.
+        With a db, after end_session only the rows the background writer failed to save ([] when
+        answers_saved), so finalizing with them never inserts an answer twice."""
+        if self._unsaved is not None:
+            return list(self._unsaved)
+        return [
+            {
+                "question_id": qid,
+                "user_choice_idx": a["user_choice_idx"],
+                "is_correct": a["is_correct"],
+                "points_earned": a["points_earned"],
+                "time_spent_sec": a["time_spent_sec"]
+            }
+            for qid, a in self.answers.items()
+        ]
+    
     def get_current_question(self) -> Dict:
         """Get the current question to display."""
         if self.current_question_idx >= len(self.questions):
@@ -254,8 +362,9 @@ class TestSession:
     
     def get_session_summary(self) -> Dict:
         """Get real-time summary for display during exam."""
-        answered = sum(1 for a in self.answers.values() if a["user_choice_idx"] is not None)
-        correct = sum(1 for a in self.answers.values() if a["is_correct"])
+        elapsed = (datetime.utcnow() - self.started_at).total_seconds()
+        answered = self._answered
+        correct = self._correct
         
         return {
             "session_id": str(self.session_id),
@@ -263,10 +372,10 @@ class TestSession:
             "total_questions": len(self.questions),
             "questions_answered": answered,
             "questions_skipped": len(self.questions) - answered,
-            "current_score": float(self.score_earned),
+            "current_score": self.score_earned / self.SCORE_SCALE,
             "correct_count": correct,
-            "time_elapsed_sec": (datetime.utcnow() - self.started_at).total_seconds(),
-            "time_remaining_sec": max(0, self.TIME_LIMIT_SECONDS - (datetime.utcnow() - self.started_at).total_seconds())
+            "time_elapsed_sec": elapsed,
+            "time_remaining_sec": max(0, self.TIME_LIMIT_SECONDS - elapsed)
         }
 
 
@@ -14,17 +14,25 @@ WatuPRO / GoTest behavior (why certain fixes are required):
   bypasses visibility checks.
 """
 import argparse
+import functools
+import hashlib
+import json
 import logging
 import random
 import re
+import sqlite3
+import queue
 import sys
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional, Set
-from urllib.parse import urljoin
-from uuid import uuid5, NAMESPACE_DNS
+from typing import List, Dict, Tuple, Optional, Sequence, Set
+from urllib.parse import parse_qsl, unquote_plus, urlencode, urljoin
+from uuid import NAMESPACE_DNS
 
-from bs4 import BeautifulSoup, Comment
+from bs4 import BeautifulSoup, Comment, SoupStrainer
 
 _root = Path(__file__).resolve().parent.parent
 if str(_root) not in sys.path:
@@ -43,10 +51,166 @@ VERBAL_INDEX_URL = "https://gotest.com.pk/verbal-intelligence-test-online-prep/"
 QUANTITATIVE_INDEX_URL = "https://gotest.com.pk/quantitative-reasoning-test-online/"
 BASE_URL = "https://gotest.com.pk"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-REQUEST_DELAY = 1.5
+# Navigation throttle: bursts of up to 5 page loads, refilled at one token every 2s (5 per 10s).
+RATE_BURST = 5
+RATE_FILL_SECONDS = 10.0
 PAGE_TIMEOUT_MS = 60000
 SELECTOR_TIMEOUT_MS = 25000
 MAX_RETRIES = 3
+UPSERT_BATCH_SIZE = 50
+SCRAPE_CACHE = _root / ".gotest_cache.sqlite"
+BACKOFF_CAP_SECONDS = 30
+
+# Resource types the quiz never needs; WatuPRO only relies on document, script and xhr/fetch.
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media", "stylesheet"})
+_TRACKER_RE = re.compile(r"(google-analytics|googletagmanager|googlesyndication|doubleclick|facebook\.net|adservice)", re.I)
+
+
+# CSS selectors for the soup path. soupsieve compiles these once; [class*=...] keeps the old
+# substring-on-class semantics (e.g. "watupro-question-choice" inside a longer class name still matches).
+_SEL_QUESTION_BLOCK = 'div[class*="watu-question"], div[class*="show-question"]'
+_SEL_QUESTIONDIV = 'div[id*="questiondiv" i], div[id*="question_div" i]'
+_SEL_QUESTION_CONTENT = '[class*="question-content"]'
+_SEL_CHOICES = '[class*="question-choices"]'
+_SEL_CONTENT_OR_CHOICES = _SEL_QUESTION_CONTENT + ", " + _SEL_CHOICES
+_SEL_CHOICE = '[class*="watupro-question-choice"]'
+_SEL_CORRECT_MARKER = '[class*="correct-answer"], [class*="correct_answer"], [class*="right-answer"]'
+_SEL_SCREEN_READER = '[class*="watupro-screen-reader" i]'
+_SEL_QUIZ_FORM = 'form[class*="quiz"]'
+_QID_RE = re.compile(r"question-\d+$")
+_FEEDBACK_RE = re.compile(r"watupro.*feedback|feedback|explanation", re.I)
+_EXPLANATION_RE = re.compile(r"EXPLANATION\s*:", re.I)
+_OPTION_LETTER_RE = re.compile(r"^[A-Za-z][\.\)]\s*")
+_CORRECT_CLASS_RE = re.compile(r"correct[-_]answer|right-answer", re.I)
+# Cheap pre-check on raw HTML for _is_correct_comment: a comment containing correct-answer / correct_answer
+_CORRECT_COMMENT_HTML_RE = re.compile(r"<!--(?:(?!-->).)*?correct[-_]answer", re.I | re.S)
+_CORRECT_ANSWER_RE = re.compile(
+    r"correct\s+answer\s*[:\s]+([a-j])|"
+    r"right\s+answer\s*[:\s]+([a-j])|"
+    r"answer\s*[:\s]+([a-j])\s*[\.\)]|"
+    r"answer\s*[:\s]+([a-j])\s*$|"
+    r"\(([a-j])\)\s*correct|"
+    r"Correct Answer:\s*([A-J])",
+    re.I,
+)
+
+
+def _is_correct_comment(s) -> bool:
+    """find_all(string=...) predicate: HTML comment mentioning correct-answer / correct_answer."""
+    if not isinstance(s, Comment):
+        return False
+    low = str(s).lower()
+    return "correct-answer" in low or "correct_answer" in low
+
+
+def _letter_index(n_choices: int, text: str) -> int:
+    """0-based index of the first "Correct Answer: X"-style letter in text, clamped to the last choice; -1 if none."""
+    m = _CORRECT_ANSWER_RE.search(text)
+    if not m:
+        return -1
+    letter = next(g for g in m.groups() if g).upper()
+    return min(ord(letter) - ord("A"), n_choices - 1)
+
+
+def _classes(tag) -> Sequence[str]:
+    c = tag.get("class")
+    if not c:
+        return ()
+    return (c,) if isinstance(c, str) else c
+
+
+def _has_class(tag, cls: str) -> bool:
+    """Same answer as cls in " ".join(class) (a token never spans the joining space), without building the string."""
+    c = _classes(tag)
+    return cls in c or any(cls in x for x in c)
+
+# Question blocks in document order, filtered like the Python side: id question-N with question-content/question-choices
+# (so a 50-question test counts 50), else every candidate. Spliced into each script below so block indices agree.
+_JS_QUESTION_NODES = r"""
+    const sel = '.watu-question, .show-question, div[id^="questionDiv"]';
+    const all = Array.from(document.querySelectorAll(sel));
+    const real = all.filter(el => {
+        if (!/^question-\d+$/.test((el.id || '').trim())) return false;
+        return el.querySelector('[class*="question-content"]') || el.querySelector('[class*="question-choices"]');
+    });
+    const nodes = real.length ? real : all;
+"""
+
+# One round-trip per view: read question text, options and any pre-rendered correct marker straight
+# from the live DOM. Text is joined the way BeautifulSoup's get_text(strip=True) does so seeds (and
+# therefore row ids) match the soup path exactly.
+_JS_EXTRACT_VISIBLE = r"""(indices) => {""" + _JS_QUESTION_NODES + r"""    const texts = (root, sep) => {
+        const w = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+        const out = [];
+        let n;
+        while ((n = w.nextNode())) {
+            const tag = n.parentNode ? n.parentNode.nodeName : '';
+            if (tag === 'SCRIPT' || tag === 'STYLE') continue;
+            const t = n.nodeValue.trim();
+            if (t) out.push(t);
+        }
+        return out.join(sep);
+    };
+    const hasCorrectComment = (root) => {
+        const w = document.createTreeWalker(root, NodeFilter.SHOW_COMMENT);
+        let n;
+        while ((n = w.nextNode())) {
+            const t = (n.nodeValue || '').toLowerCase();
+            if (t.includes('correct-answer') || t.includes('correct_answer')) return true;
+        }
+        return false;
+    };
+    const marker = /correct-answer|correct_answer|right-answer/;
+    const items = indices.filter(i => i < nodes.length).map(i => {
+        const qb = nodes[i];
+        const content = qb.querySelector('[class*="question-content"]');
+        const text = (content ? texts(content, ' ') : '') || texts(qb, ' ').slice(0, 2000);
+        const choiceRoot = qb.querySelector('[class*="question-choices"]') || qb;
+        const choiceDivs = Array.from(choiceRoot.querySelectorAll('[class*="watupro-question-choice"]')).slice(0, 10);
+        const options = choiceDivs.map(ch => {
+            const label = ch.querySelector('label');
+            return (label ? texts(label, '') : '') || texts(ch, '');
+        });
+        const numOpts = Math.max(options.length, 2);
+        let choices = choiceDivs.filter(ch => ch.querySelector('input[type="radio"]')).slice(0, numOpts);
+        if (choices.length < 2) choices = choiceDivs.slice(0, numOpts);
+        const firstRadio = qb.querySelector('input[type="radio"]');
+        const valueToIndex = (val) => {
+            for (let j = 0; j < choiceDivs.length; j++) {
+                const inp = choiceDivs[j].querySelector('input[type="radio"]');
+                if (inp && inp.value === val) return j;
+                if (String(j) === val || (choiceDivs[j].id || '').includes(val)) return j;
+            }
+            const letter = (val || '').trim().toUpperCase();
+            if (/^[A-Z]$/.test(letter)) return Math.min(letter.charCodeAt(0) - 65, numOpts - 1);
+            return -1;
+        };
+        let correct = -1;
+        for (const inp of qb.querySelectorAll('input[type="radio"][checked], input[type="radio"][data-correct]')) {
+            const j = choiceDivs.findIndex(ch => ch.contains(inp));
+            correct = j >= 0 ? j : valueToIndex(inp.value || '');
+            if (correct >= 0) break;
+        }
+        if (correct < 0) {
+            for (const el of qb.querySelectorAll('[data-correct]')) {
+                correct = valueToIndex(el.getAttribute('data-correct') || (el.textContent || '').trim());
+                if (correct >= 0) break;
+            }
+        }
+        if (correct < 0) {
+            correct = choices.findIndex(ch => {
+                if (marker.test((ch.className || '').toString().toLowerCase())) return true;
+                if (ch.querySelector('[class*="correct-answer"], [class*="correct_answer"], [class*="right-answer"]')) return true;
+                const sr = ch.querySelector('[class*="watupro-screen-reader"]');
+                return !!sr && (sr.textContent || '').trim().toLowerCase() === 'correct';
+            });
+        }
+        if (correct < 0) correct = choices.findIndex(hasCorrectComment);
+        return { idx: i, id: (qb.id || '').trim(), name: firstRadio ? (firstRadio.name || '').trim() : '', text, options, correct };
+    });
+    return { total: nodes.length, items };
+}"""
+
 
 # Test name (or slug) -> sub_category
 GOTEST_NAME_TO_SUB_CATEGORY = {
@@ -120,6 +284,12 @@ GOTEST_NAME_TO_SUB_CATEGORY = {
     "analogies": "analogies",
 }
 
+# Longest keys first so the most specific name wins ("polynomials (algebra)" over "algebra"). The sub_category seeds
+# _row_id, so remapping a test re-inserts its questions under new ids; see supabase_migration_gotest_algebra_subcategories.sql.
+_GOTEST_PATTERN = re.compile("|".join(re.escape(k) for k in sorted(GOTEST_NAME_TO_SUB_CATEGORY, key=len, reverse=True)))
+_SLUG_STRIP = re.compile(r"[^\w\s-]")
+_SLUG_SPACES = re.compile(r"[-\s]+")
+
 
 def _discover_test_links(soup: BeautifulSoup, base_url: str, url_pattern: str) -> List[Tuple[str, str]]:
     """
@@ -148,45 +318,264 @@ def _discover_test_links(soup: BeautifulSoup, base_url: str, url_pattern: str) -
     return out
 
 
+@functools.lru_cache(maxsize=512)
 def _normalize_sub_category(test_name: str) -> str:
     """Map test name/link text to sub_category using dict + fallback slug."""
     lower = test_name.lower().strip()
-    for key, sub in GOTEST_NAME_TO_SUB_CATEGORY.items():
-        if key in lower:
-            return sub
+    m = _GOTEST_PATTERN.search(lower)
+    if m:
+        return GOTEST_NAME_TO_SUB_CATEGORY[m.group(0)]
     # Fallback: slug from name (lowercase, replace spaces/special with underscore)
-    slug = re.sub(r"[^\w\s-]", "", lower)
-    slug = re.sub(r"[-\s]+", "_", slug).strip("_")
+    slug = _SLUG_STRIP.sub("", lower)
+    slug = _SLUG_SPACES.sub("_", slug).strip("_")
     return slug or "general"
 
 
-def _get_page_soup(page, url: str) -> Optional[BeautifulSoup]:
-    """Playwright goto + wait + return BeautifulSoup of page.content()."""
+@functools.lru_cache(maxsize=256)
+def _seed_hasher(sub_category: str):
+    """SHA-1 state after NAMESPACE_DNS + the fixed "gotest_{sub_category}_" seed prefix; copied per row."""
+    return hashlib.sha1(NAMESPACE_DNS.bytes + f"gotest_{sub_category}_".encode("utf-8"))
+
+
+def _row_id(sub_category: str, q_text: str) -> str:
+    """
+    str(uuid5(NAMESPACE_DNS, f"gotest_{sub_category}_{q_text[:200]}")), hashing only the varying tail.
+    Must stay byte-identical to uuid5 or existing rows get new ids (see test_gotest_scraper.py).
+    """
+    h = _seed_hasher(sub_category).copy()
+    h.update(q_text[:200].encode("utf-8"))
+    b = bytearray(h.digest()[:16])
+    b[6] = (b[6] & 0x0F) | 0x50  # version 5
+    b[8] = (b[8] & 0x3F) | 0x80  # RFC 4122 variant
+    x = b.hex()
+    return f"{x[:8]}-{x[8:12]}-{x[12:16]}-{x[16:20]}-{x[20:]}"
+
+
+def _open_scrape_cache(path: Path) -> sqlite3.Connection:
+    # Shared by the worker threads; access is serialized through GotestScraper._lock.
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("CREATE TABLE IF NOT EXISTS tests(url TEXT PRIMARY KEY, validator TEXT, rows TEXT)")
+    return db
+
+
+class _TokenBucket:
+    """Blocking token bucket for page navigations: only sleeps once the burst allowance is used up."""
+
+    def __init__(self, capacity: int, fill_time_s: float):
+        self.capacity = capacity
+        self.rate = capacity / fill_time_s
+        self.tokens = float(capacity)
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        # Held while sleeping so concurrent workers queue up behind the same budget.
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                time.sleep(wait)
+                self.last = time.monotonic()
+                self.tokens = 1.0
+            self.tokens -= 1
+
+
+_GOTEST_BUCKET = _TokenBucket(capacity=RATE_BURST, fill_time_s=RATE_FILL_SECONDS)
+
+
+def _block_nonessential(route) -> None:
+    """Context route handler: abort images/fonts/media/CSS and ad/analytics hosts, pass everything else.
+    WatuPRO's own assets (stylesheet that hides paginated blocks, AJAX endpoints) are always let through."""
+    req = route.request
+    url = req.url
+    if "watupro" not in url and (req.resource_type in _BLOCKED_RESOURCE_TYPES or _TRACKER_RE.search(url)):
+        route.abort()
+        return
+    route.continue_()
+
+
+# {indices, hashes, firstId, firstHash} for the current view; see GotestScraper._get_visibility_snapshot.
+_JS_VISIBILITY_SNAPSHOT = r"""() => {""" + _JS_QUESTION_NODES + r"""    const indices = [], hashes = [];
+    nodes.forEach((el, i) => {
+        if (el.offsetParent === null || el.offsetHeight <= 0) return;
+        const content = el.querySelector('[class*="question-content"]') || el;
+        const text = (content.textContent || '').trim().slice(0, 200);
+        let h = 5381;
+        for (let k = 0; k < text.length; k++) h = ((h << 5) + h + text.charCodeAt(k)) | 0;
+        indices.push(i);
+        hashes.push(h);
+    });
+    const firstId = indices.length ? (nodes[indices[0]].id || null) : null;
+    const firstHash = hashes.length ? hashes[0] : null;
+    return { indices, hashes, firstId, firstHash };
+}"""
+
+
+# outerHTML of the requested question blocks only, indexed like _get_visibility_snapshot's indices.
+_JS_VISIBLE_FRAGMENTS = r"""(indices) => {""" + _JS_QUESTION_NODES + r"""    return { total: nodes.length, blocks: indices.filter(i => i < nodes.length).map(i => [i, nodes[i].outerHTML]) };
+}"""
+
+
+# Single wait after goto(wait_until="commit"): the HTML has finished parsing (so the quiz is not half-streamed)
+# and the quiz/content root exists. Scripts, iframes and subresources are not waited for.
+_JS_PAGE_READY = """() => document.readyState !== 'loading'
+    && document.querySelector('#watupro_quiz, .watu-question, .entry-content, .post-content') !== null"""
+
+
+# Quiz container only (falls back to the whole document on non-WatuPRO pages): a fraction of page.content().
+_JS_QUIZ_HTML = """() => {
+    const q = document.getElementById('watupro_quiz') || document.querySelector('.entry-content, .post-content');
+    return q ? q.outerHTML : document.documentElement.outerHTML;
+}"""
+
+
+# Block first, feedback box second; "" when the block is gone so the caller falls back to page.content().
+_JS_REVEAL_HTML = """(id) => {
+    const block = document.getElementById(id);
+    if (!block) return '';
+    const fb = document.getElementById('watuPracticeFeedback');
+    return block.outerHTML + (fb && !block.contains(fb) ? fb.outerHTML : '');
+}"""
+
+
+# Happy path after a reveal click: correct index and explanation straight from the live DOM. idx -1 sends the
+# caller to the BeautifulSoup resolver. Explanation mirrors it: the element holding "Explanation:", else the feedback box.
+_JS_REVEALED_CORRECT = r"""({id, numOpts}) => {
+    const root = document.getElementById(id);
+    if (!root) return {idx: -1, explanation: ''};
+    const texts = (el) => {
+        const w = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+        const out = [];
+        let n;
+        while ((n = w.nextNode())) {
+            const t = n.nodeValue.trim();
+            if (t) out.push(t);
+        }
+        return out.join(' ');
+    };
+    const isCorrect = (el) => (el && (el.textContent || '').trim().toLowerCase() === 'correct');
+    const all = root.querySelectorAll('.watupro-question-choice, [class*="question-choice"]');
+    const choices = Array.from(all).filter(el => el.querySelector('input[type="radio"]')).slice(0, numOpts);
+    let idx = -1;
+    for (let i = 0; i < choices.length && idx < 0; i++) {
+        const el = choices[i];
+        const next = el.nextElementSibling;
+        if ((el.className || '').toLowerCase().includes('correct-answer')
+            || el.querySelector('.correct-answer, [class*="correct-answer"]')
+            || isCorrect(el.querySelector('.watupro-screen-reader'))
+            || (next && next.classList.contains('watupro-screen-reader') && isCorrect(next))
+            || (el.textContent || '').includes('✓') || (el.textContent || '').includes('✔')) idx = i;
+    }
+    let explanation = '';
+    const fb = document.getElementById('watuPracticeFeedback');
+    for (const r of [root, fb]) {
+        if (!r || explanation) continue;
+        const w = document.createTreeWalker(r, NodeFilter.SHOW_TEXT);
+        let n;
+        while ((n = w.nextNode()) && !explanation) {
+            if (!/EXPLANATION\s*:/i.test(n.nodeValue)) continue;
+            let p = n.parentElement;
+            for (let k = 0; k < 5 && p; k++, p = p.parentElement) {
+                if (['DIV', 'P', 'SECTION', 'TD'].includes(p.nodeName)) { explanation = texts(p); break; }
+            }
+        }
+    }
+    if (!explanation && fb) explanation = texts(fb);
+    return {idx, explanation: explanation.slice(0, 2000)};
+}"""
+
+
+def _quiz_html(page) -> str:
+    return page.evaluate(_JS_QUIZ_HTML)
+
+
+def _replay_submit_fields(tpl: Dict, name: str, value: str) -> List[Tuple[str, str]]:
+    """
+    Re-target a captured submit body at another question. Only fields keyed by the captured radio name
+    (answer-12, answer-12[]) are rewritten: the key moves to the new name and the captured answer value
+    becomes the new one. Everything else (quiz/exam ids, page numbers) is sent back unchanged.
+    """
+    old_name = tpl["name"]
+    out = []
+    for k, v in tpl["fields"]:
+        if k == old_name or k.startswith(old_name + "["):
+            k = name + k[len(old_name):]
+            if v == tpl["value"]:
+                v = value
+        out.append((k, v))
+    return out
+
+
+def _submit_response_html(body: str) -> str:
+    """WatuPRO answers either with an HTML fragment or with JSON wrapping one; flatten JSON string values."""
+    body = body.strip()
+    if not body.startswith(("{", "[")):
+        return body
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    parts: List[str] = []
+    stack = [data]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            stack.extend(cur)
+        elif isinstance(cur, str):
+            parts.append(cur)
+    return "\n".join(parts)
+
+
+def _backoff(attempt: int, resp=None) -> None:
+    """Sleep before a retry: the server's numeric Retry-After on 429/503 (capped at 60s), else full-jitter exponential backoff."""
+    delay = None
+    if resp is not None and resp.status in (429, 503):
+        retry_after = (resp.headers.get("retry-after") or "").strip()
+        if retry_after.isdigit():
+            delay = min(60, int(retry_after))
+    if delay is None:
+        delay = random.uniform(0, min(BACKOFF_CAP_SECONDS, 2 ** attempt))
+    logger.info("  Retrying in %.1fs", delay)
+    time.sleep(delay)
+
+
+_LINKS_ONLY = SoupStrainer("a", href=True)
+
+
+def _get_page_soup(page, url: str, quiz_only: bool = False, parse_only: Optional[SoupStrainer] = None) -> Optional[BeautifulSoup]:
+    """
+    Playwright goto + wait + return BeautifulSoup of page.content(). quiz_only (test pages) serializes just the quiz container;
+    parse_only is handed to lxml so index pages only build the nodes they read.
+    """
     for attempt in range(MAX_RETRIES):
         try:
             logger.info("  Fetching %s (attempt %s/%s)...", url[:60] + "..." if len(url) > 60 else url, attempt + 1, MAX_RETRIES)
-            resp = page.goto(url, wait_until="domcontentloaded", timeout=PAGE_TIMEOUT_MS)
+            _GOTEST_BUCKET.acquire()
+            resp = page.goto(url, wait_until="commit", timeout=PAGE_TIMEOUT_MS)
             if resp and resp.status >= 400:
                 logger.warning("Fetch failed HTTP %s (attempt %s/%s)", resp.status, attempt + 1, MAX_RETRIES)
                 if attempt < MAX_RETRIES - 1:
-                    time.sleep(2 + attempt)
+                    _backoff(attempt, resp)
                 continue
             try:
-                page.wait_for_selector("#watupro_quiz, .watu-question, .entry-content, .post-content", timeout=SELECTOR_TIMEOUT_MS)
+                page.wait_for_function(_JS_PAGE_READY, timeout=SELECTOR_TIMEOUT_MS)
             except Exception:
                 pass
-            page.wait_for_load_state("domcontentloaded", timeout=15000)
-            html = page.content()
-            return BeautifulSoup(html, "html.parser")
+            html = _quiz_html(page) if quiz_only else page.content()
+            return BeautifulSoup(html, "lxml", parse_only=parse_only)
         except Exception as e:
             logger.warning("Fetch failed (attempt %s/%s): %s", attempt + 1, MAX_RETRIES, e)
             if attempt < MAX_RETRIES - 1:
-                time.sleep(2 + attempt)
+                _backoff(attempt)
     return None
 
 
 class GotestScraper:
-    def __init__(self, dry_run: bool = False, max_tests: Optional[int] = None, max_questions_per_test: Optional[int] = None, allow_unknown_correct: bool = False, verbal_only: bool = False, quant_only: bool = False, single_url: Optional[str] = None):
+    def __init__(self, dry_run: bool = False, max_tests: Optional[int] = None, max_questions_per_test: Optional[int] = None, allow_unknown_correct: bool = False, verbal_only: bool = False, quant_only: bool = False, single_url: Optional[str] = None, workers: int = 1, use_cache: bool = True, refresh: bool = False):
         self.dry_run = dry_run
         self.max_tests = max_tests
         self.max_questions_per_test = max_questions_per_test
@@ -194,26 +583,39 @@ class GotestScraper:
         self.verbal_only = verbal_only
         self.quant_only = quant_only
         self.single_url = (single_url or "").strip().rstrip("/") + "/" if single_url else None
-        self.stats = {"tests": 0, "questions": 0, "skipped": 0, "errors": 0}
+        self.stats = {"tests": 0, "questions": 0, "skipped": 0, "errors": 0, "cached": 0}
+        self.use_cache = use_cache
+        self.refresh = refresh
+        self._cache: Optional[sqlite3.Connection] = None
+        self._on_chunk: Optional[callable] = None
+        self._chunk_size = UPSERT_BATCH_SIZE
+        self._pending: List[Dict] = []
+        self.workers = max(1, workers)
+        self.paths: Counter = Counter()
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._submit_templates: Dict[str, Dict] = {}
+
+    def _bump(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
 
     def _discover_all_test_urls(self, page) -> List[Tuple[str, str]]:
         """Load both index pages, discover test links, return (url, test_name). Order: quantitative first, then verbal (so --max-tests 1 = first quant test)."""
         quant_links = []
         verbal_links = []
         if not self.verbal_only:
-            soup = _get_page_soup(page, QUANTITATIVE_INDEX_URL)
+            soup = _get_page_soup(page, QUANTITATIVE_INDEX_URL, parse_only=_LINKS_ONLY)
             if soup:
                 links = _discover_test_links(soup, BASE_URL, "gotest.com.pk/aptitude-test/")
                 quant_links = links
                 logger.info("Quantitative index: %s test links", len(links))
-            time.sleep(REQUEST_DELAY)
         if not self.quant_only:
-            soup = _get_page_soup(page, VERBAL_INDEX_URL)
+            soup = _get_page_soup(page, VERBAL_INDEX_URL, parse_only=_LINKS_ONLY)
             if soup:
                 links = _discover_test_links(soup, BASE_URL, "gotest.com.pk/forces/")
                 verbal_links = links
                 logger.info("Verbal index: %s test links", len(links))
-            time.sleep(REQUEST_DELAY)
         # Quantitative first, then verbal; dedupe by URL (first occurrence wins)
         combined = []
         seen = set()
@@ -226,53 +628,62 @@ class GotestScraper:
             combined = combined[: self.max_tests]
         return combined
 
-    def _get_visible_question_indices(self, page) -> List[int]:
-        """Return 0-based indices of question blocks currently visible. Same filter as Python: id question-N and has question-content/question-choices so count stays 50."""
+    def _get_visibility_snapshot(self, page) -> Dict:
+        """One page.evaluate for the current view: {indices, hashes, firstId, firstHash}. indices are 0-based positions of visible
+        question blocks (same filter as Python: id question-N with question-content/question-choices, so count stays 50);
+        hashes[i] is a djb2 of the first 200 chars of that block's question-content text (cheap "already seen" key);
+        firstId/firstHash identify the first visible block for swap detection."""
         try:
-            indices = page.evaluate("""() => {
-                const sel = '.watu-question, .show-question, div[id^="questionDiv"]';
-                const all = Array.from(document.querySelectorAll(sel));
-                const real = all.filter(el => {
-                    const id = (el.id || '').trim();
-                    if (!/^question-\\d+$/.test(id)) return false;
-                    return el.querySelector('.question-content, [class*="question-content"]') || el.querySelector('.question-choices, [class*="question-choices"]');
-                });
-                const nodes = real.length ? real : all;
-                return Array.from(nodes)
-                    .map((el, i) => ({ i, visible: el.offsetParent !== null && el.offsetHeight > 0 }))
-                    .filter(x => x.visible)
-                    .map(x => x.i);
-            }""")
-            return list(indices) if indices else []
+            snap = page.evaluate(_JS_VISIBILITY_SNAPSHOT)
         except Exception:
-            return []
+            snap = None
+        return snap or {"indices": [], "hashes": [], "firstId": None, "firstHash": None}
 
-    def _get_first_visible_question_id(self, page) -> Optional[str]:
-        """Return the DOM id of the first visible question block (for state-change verification)."""
+    def _get_visible_fragments(self, page, visible: List[int]) -> Tuple[Dict[int, BeautifulSoup], int]:
+        """Serialize only the visible question blocks (outerHTML) instead of page.content(). Returns
+        ({block index: parsed block}, total block count); ({}, 0) if the JS fails."""
         try:
-            return page.evaluate("""() => {
-                const sel = '.watu-question, .show-question, div[id^="questionDiv"]';
-                const el = Array.from(document.querySelectorAll(sel))
-                    .find(e => e.offsetParent !== null && e.offsetHeight > 0);
-                return el ? (el.id || null) : null;
-            }""")
+            res = page.evaluate(_JS_VISIBLE_FRAGMENTS, sorted(visible))
         except Exception:
-            return None
+            return {}, 0
+        blocks = {}
+        for idx, html in (res or {}).get("blocks") or []:
+            qb = BeautifulSoup(html, "lxml").find("div")
+            if qb is not None:
+                blocks[idx] = qb
+        return blocks, (res or {}).get("total") or len(blocks)
 
-    def _click_question_block_link(self, page, next_question_num: int) -> bool:
+    def _wait_first_question_swapped(self, page, before: Dict, timeout: int = 12000) -> bool:
+        """Poll until the first visible question (id or content hash) differs from the before snapshot. Starts at 150ms and doubles on no change (capped at 1s), so fast swaps return almost immediately."""
+        deadline = time.monotonic() + timeout / 1000
+        interval = 150
+        old = (before.get("firstId"), before.get("firstHash"))
+        while True:
+            snap = self._get_visibility_snapshot(page)
+            current = (snap["firstId"], snap["firstHash"])
+            if snap["indices"] and current != old:
+                return True
+            remaining = (deadline - time.monotonic()) * 1000
+            if remaining <= 0:
+                return False
+            page.wait_for_timeout(min(interval, remaining))
+            interval = min(interval * 2, 1000)
+
+    def _click_question_block_link(self, page, next_question_num: int, before: Optional[Dict] = None) -> bool:
         """
         Advance to the next block of questions (e.g. 26-50). GoTest WatuPRO pagination:
 
         - Paginator range: Footer shows blocks (e.g. 1-25). If target "26" is not visible,
           the script MUST find and click the >> (li.rewind-up) button so the next block appears.
-        - After clicking a page number, wait_for_function verifies the first question ID on the
-          page has changed. Do not return True until the DOM has swapped.
+        - After clicking a page number, _wait_first_question_swapped verifies the first visible question
+          (id or content hash, from the caller's snapshot) has changed. Do not return True until the DOM has swapped.
         - All clicks use force=True to bypass CSS that hides the real inputs.
         """
         if next_question_num < 2:
             return False
         target_num = str(next_question_num)
-        old_first_id = self._get_first_visible_question_id(page)
+        if before is None:
+            before = self._get_visibility_snapshot(page)
         try:
             paginator = page.locator(".watupro-paginator-wrap, .watupro-paginator, [class*='paginator']").first
             paginator.scroll_into_view_if_needed(timeout=5000)
@@ -297,9 +708,9 @@ class GotestScraper:
                         }""")
                     except Exception:
                         pass
-                page.wait_for_timeout(800)
                 try:
-                    visible = btn.is_visible()
+                    btn.wait_for(state="visible", timeout=3000)
+                    visible = True
                 except Exception:
                     visible = False
             if not visible:
@@ -319,7 +730,8 @@ class GotestScraper:
                 }""", target_num)
                 if not clicked_target:
                     return False
-                page.wait_for_timeout(800)
+                if self._wait_first_question_swapped(page, before, timeout=3000):
+                    return True
                 try:
                     visible = btn.is_visible()
                 except Exception:
@@ -344,21 +756,7 @@ class GotestScraper:
                 }""", target_num)
                 if not clicked:
                     return False
-            page.wait_for_timeout(400)
-            try:
-                page.wait_for_function(
-                    """(oldId) => {
-                        const sel = '.watu-question, .show-question, div[id^="questionDiv"]';
-                        const el = Array.from(document.querySelectorAll(sel))
-                            .find(e => e.offsetParent !== null && e.offsetHeight > 0);
-                        const currentId = el ? (el.id || '') : '';
-                        return currentId !== '' && currentId !== oldId;
-                    }""",
-                    timeout=12000,
-                    arg=old_first_id,
-                )
-            except Exception:
-                pass
+            self._wait_first_question_swapped(page, before)
             return True
         except Exception:
             return False
@@ -369,13 +767,13 @@ class GotestScraper:
         then click in-page paginator (or >> then page number) to show next block. _click_question_block_link
         does not return True until the first question ID on the page has changed (DOM swapped).
         """
-        soup = _get_page_soup(page, url)
+        soup = _get_page_soup(page, url, quiz_only=True)
         if not soup:
             return []
-        time.sleep(REQUEST_DELAY)
         all_rows = []
         view_num = 0
         seen_seeds = set()
+        seen_hashes: Set[int] = set()
         last_visible: Optional[tuple] = None
         questions_attempted_so_far = 0
         while view_num < 50:
@@ -383,7 +781,8 @@ class GotestScraper:
             if self.max_questions_per_test is not None and questions_attempted_so_far >= self.max_questions_per_test:
                 logger.info("  [View %s] Reached max_questions_per_test (%s), stopping.", view_num, self.max_questions_per_test)
                 break
-            visible = self._get_visible_question_indices(page)
+            snapshot = self._get_visibility_snapshot(page)
+            visible = snapshot["indices"]
             if not visible:
                 logger.info("  [View %s] No visible question blocks, stopping.", view_num)
                 break
@@ -393,23 +792,30 @@ class GotestScraper:
                 break
             last_visible = visible_key
             logger.info("  [View %s] %s visible question(s) (indices %s...).", view_num, len(visible), visible[:5] if len(visible) > 5 else visible)
-            soup = BeautifulSoup(page.content(), "html.parser")
-            rows, attempted = self._extract_questions_from_soup(
-                page, soup, url, sub_category, visible_indices=set(visible), seen_seeds=seen_seeds, questions_attempted_so_far=questions_attempted_so_far
-            )
+            hash_by_idx = dict(zip(visible, snapshot.get("hashes") or []))
+            if hash_by_idx and all(h in seen_hashes for h in hash_by_idx.values()):
+                logger.info("  [View %s] All visible questions already processed, skipping extraction.", view_num)
+                path, extracted = "seen", ([], 0)
+            else:
+                path, extracted = self._extract_view(page, url, sub_category, visible, seen_seeds, questions_attempted_so_far)
+            with self._lock:
+                self.paths[path] += 1
+            rows, attempted = extracted
             questions_attempted_so_far += attempted
+            seen_hashes.update(hash_by_idx[i] for i in sorted(visible)[:attempted] if i in hash_by_idx)
             if rows:
                 all_rows.extend(rows)
-                logger.info("  [View %s] Extracted %s questions (total so far: %s).", view_num, len(rows), len(all_rows))
+                self._pending.extend(rows)
+                self._flush()
+                logger.info("  [View %s] Extracted %s questions via %s path (total so far: %s).", view_num, len(rows), path, len(all_rows))
             next_q_num = max(visible) + 2
             if not self._click_question_block_link(page, next_q_num):
                 logger.info("  No link for question %s (end of test).", next_q_num)
                 break
             try:
-                page.wait_for_load_state("networkidle", timeout=8000)
+                page.wait_for_selector("div[id^='question-'] .question-content", state="attached", timeout=5000)
             except Exception:
                 pass
-            time.sleep(0.4)
         return all_rows
 
     def _find_next_page(self, soup: BeautifulSoup, current_url: str) -> Optional[str]:
@@ -431,40 +837,72 @@ class GotestScraper:
                 return full + "/"
         return None
 
+    def _extract_view(
+        self, page, url: str, sub_category: str, visible: List[int], seen_seeds: Set[str], questions_attempted_so_far: int
+    ) -> Tuple[str, Tuple[List[Dict], int]]:
+        """Extract one view, WatuPRO fast path first: "dom" (single page.evaluate, assumes the WatuPRO layout), then the
+        generic BS4 parser on just the visible blocks ("fragment"), then on the whole quiz container ("page"). Returns (path, (rows, attempted))."""
+        extracted = self._extract_questions_from_dom(page, sub_category, visible, seen_seeds, questions_attempted_so_far)
+        if extracted is not None:
+            return "dom", extracted
+        logger.info("  WatuPRO fast path found no question blocks, using generic parser.")
+        blocks, n_total = self._get_visible_fragments(page, visible)
+        if blocks:
+            return "fragment", self._extract_questions_from_soup(
+                page, None, url, sub_category, visible_indices=set(visible), seen_seeds=seen_seeds,
+                questions_attempted_so_far=questions_attempted_so_far, blocks=blocks, n_total=n_total,
+            )
+        soup = BeautifulSoup(_quiz_html(page), "lxml")
+        return "page", self._extract_questions_from_soup(
+            page, soup, url, sub_category, visible_indices=set(visible), seen_seeds=seen_seeds, questions_attempted_so_far=questions_attempted_so_far
+        )
+
+    def _find_question_blocks(self, soup: BeautifulSoup) -> list:
+        """Question blocks of the whole quiz in document order (same filter as the visibility snapshot JS)."""
+        quiz = soup.find(id="watupro_quiz") or soup.select_one(_SEL_QUIZ_FORM)
+        if not quiz:
+            quiz = soup.find("div", class_="entry-content") or soup.find("div", class_="post-content") or soup
+        question_blocks = quiz.select(_SEL_QUESTION_BLOCK)
+        if not question_blocks:
+            question_blocks = quiz.select(_SEL_QUESTIONDIV)
+        # Keep only blocks that are real questions (have content/choices) and have id question-N so we don't count injected feedback/explanation divs (fixes 50->68->83).
+        question_blocks = [
+            qb for qb in question_blocks
+            if qb.select_one(_SEL_CONTENT_OR_CHOICES)
+            and (_QID_RE.match((qb.get("id") or "").strip()))
+        ]
+        if not question_blocks:
+            raw = quiz.select(_SEL_QUESTION_BLOCK)
+            question_blocks = [qb for qb in raw if qb.select_one(_SEL_CONTENT_OR_CHOICES)]
+            if not question_blocks:
+                question_blocks = quiz.select(_SEL_QUESTIONDIV)
+        return question_blocks
+
     def _extract_questions_from_soup(
         self,
         page,
-        soup: BeautifulSoup,
+        soup: Optional[BeautifulSoup],
         test_url: str,
         sub_category: str,
         visible_indices: Optional[Set[int]] = None,
         seen_seeds: Optional[Set[str]] = None,
         questions_attempted_so_far: int = 0,
+        blocks: Optional[Dict[int, BeautifulSoup]] = None,
+        n_total: Optional[int] = None,
     ) -> List[Dict]:
         """Parse WatuPRO quiz: .watu-question or .show-question blocks; get options; resolve correct answer.
         If visible_indices is set, only process those block indices (for in-page pagination). If seen_seeds is set, skip rows already in it.
+        If blocks is given ({block index: parsed block}, from _get_visible_fragments) the quiz lookup is skipped and soup may be None.
         If max_questions_per_test is set, only process that many questions per test (stops early so run doesn't hang)."""
         rows = []
         seen = seen_seeds if seen_seeds is not None else set()
-        quiz = soup.find(id="watupro_quiz") or soup.find("form", class_=lambda c: c and "quiz" in " ".join(c) if isinstance(c, list) else "quiz" in str(c or ""))
-        if not quiz:
-            quiz = soup.find("div", class_="entry-content") or soup.find("div", class_="post-content") or soup
-        question_blocks = quiz.find_all("div", class_=lambda c: c and ("watu-question" in " ".join(c) or "show-question" in " ".join(c)) if isinstance(c, list) else "watu-question" in str(c or "") or "show-question" in str(c or ""))
-        if not question_blocks:
-            question_blocks = quiz.find_all("div", id=re.compile(r"questionDiv|question_div", re.I))
-        # Keep only blocks that are real questions (have content/choices) and have id question-N so we don't count injected feedback/explanation divs (fixes 50->68->83).
-        question_blocks = [
-            qb for qb in question_blocks
-            if (qb.find(class_=lambda c: c and "question-content" in " ".join(c) if isinstance(c, list) else "question-content" in str(c or "")) or qb.find(class_=lambda c: c and "question-choices" in " ".join(c) if isinstance(c, list) else "question-choices" in str(c or "")))
-            and (re.match(r"question-\d+$", (qb.get("id") or "").strip()))
-        ]
-        if not question_blocks:
-            raw = quiz.find_all("div", class_=lambda c: c and ("watu-question" in " ".join(c) or "show-question" in " ".join(c)) if isinstance(c, list) else "watu-question" in str(c or "") or "show-question" in str(c or ""))
-            question_blocks = [qb for qb in raw if qb.find(class_=lambda c: c and "question-content" in " ".join(c) if isinstance(c, list) else "question-content" in str(c or "")) or qb.find(class_=lambda c: c and "question-choices" in " ".join(c) if isinstance(c, list) else "question-choices" in str(c or ""))]
-            if not question_blocks:
-                question_blocks = quiz.find_all("div", id=re.compile(r"questionDiv|question_div", re.I))
-        n_blocks = len(question_blocks)
-        to_process = sorted(visible_indices) if visible_indices is not None else list(range(n_blocks))
+        if blocks is not None:
+            question_blocks = blocks
+            n_blocks = n_total if n_total is not None else len(blocks)
+        else:
+            question_blocks = dict(enumerate(self._find_question_blocks(soup)))
+            n_blocks = len(question_blocks)
+        to_process = sorted(visible_indices) if visible_indices is not None else sorted(question_blocks)
         if self.max_questions_per_test is not None:
             remaining = max(0, self.max_questions_per_test - questions_attempted_so_far)
             to_process = to_process[:remaining]
@@ -472,112 +910,200 @@ class GotestScraper:
                 return rows, 0
         logger.info("  Parsing %s question block(s) (this view: %s)...", n_blocks, len(to_process))
         for q_idx in to_process:
-            if q_idx >= n_blocks:
+            qb = question_blocks.get(q_idx)
+            if qb is None:
                 continue
-            qb = question_blocks[q_idx]
             logger.info("  Question %s/%s: extracting...", q_idx + 1, n_blocks)
-            q_text_el = qb.find(class_=lambda c: c and "question-content" in " ".join(c) if isinstance(c, list) else "question-content" in str(c or ""))
+            q_text_el = qb.select_one(_SEL_QUESTION_CONTENT)
             q_text = (q_text_el.get_text(separator=" ", strip=True) if q_text_el else "").strip() or (qb.get_text(separator=" ", strip=True)[:2000]).strip()
             if not q_text or len(q_text) < 5:
                 continue
             seed = f"gotest_{sub_category}_{q_text[:200]}"
             if seed in seen:
                 continue
-            choices_el = qb.find(class_=lambda c: c and "question-choices" in " ".join(c) if isinstance(c, list) else "question-choices" in str(c or ""))
+            choices_el = qb.select_one(_SEL_CHOICES)
             if not choices_el:
                 choices_el = qb
-            choice_divs = choices_el.find_all(class_=lambda c: c and "watupro-question-choice" in " ".join(c) if isinstance(c, list) else "watupro-question-choice" in str(c or ""))
+            choice_divs = choices_el.select(_SEL_CHOICE)
             options = []
             for ch in choice_divs[:10]:
                 label = ch.find("label")
                 t = (label.get_text(strip=True) if label else "").strip() or ch.get_text(strip=True)
                 if t:
-                    t = re.sub(r"^[A-Za-z][\.\)]\s*", "", t).strip()
+                    t = _OPTION_LETTER_RE.sub("", t).strip()
                 options.append(t or "")
             while len(options) < 2:
                 options.append("")
             if len(options) < 2:
-                self.stats["skipped"] += 1
+                self._bump("skipped")
                 continue
             correct_idx = self._get_correct_answer_from_dom(qb, len(options))
             explanation = ""
             if correct_idx < 0 and page:
                 logger.info("  Question %s/%s: correct not in DOM, clicking once to reveal answer + explanation...", q_idx + 1, n_blocks)
                 correct_idx, explanation = self._get_correct_by_click(page, qb, choice_divs, len(options), q_idx + 1, n_blocks)
-            if correct_idx < 0:
-                if self.allow_unknown_correct:
-                    correct_idx = 0
-                    explanation = "(Correct answer not verified - gotest). " + (explanation or "")
-                    logger.info("  Question %s/%s: saving with placeholder correct (index 0); fix manually if needed.", q_idx + 1, n_blocks)
-                else:
-                    self.stats["skipped"] += 1
-                    continue
-            row_id = str(uuid5(NAMESPACE_DNS, seed))
-            n_opts = len(options)
-            if correct_idx >= n_opts:
-                correct_idx = n_opts - 1
-            row = {
-                "id": row_id,
-                "category": "gat",
-                "sub_category": sub_category,
-                "text": q_text[:5000],
-                "options": options[:10],
-                "correct_answer_idx": correct_idx,
-                "explanation": (explanation or "")[:2000],
-                "source": "gotest",
-            }
+            row = self._finish_row(q_idx, n_blocks, sub_category, q_text, options, correct_idx, explanation)
+            if row is None:
+                continue
             rows.append(row)
             seen.add(seed)
-            self.stats["questions"] += 1
-            opt_letter = chr(ord("A") + correct_idx) if 0 <= correct_idx < 26 else str(correct_idx)
-            logger.info("  Extracted Q%s: correct = option %s (index %s) | %s", q_idx + 1, opt_letter, correct_idx, (q_text[:55] + "…") if len(q_text) > 55 else q_text)
             if len(rows) % 5 == 0 or q_idx == to_process[-1]:
                 logger.info("  Progress: %s/%s questions extracted.", len(rows), n_blocks)
         return rows, len(to_process)
 
+    def _extract_questions_from_dom(
+        self,
+        page,
+        sub_category: str,
+        visible: List[int],
+        seen_seeds: Set[str],
+        questions_attempted_so_far: int = 0,
+    ) -> Optional[Tuple[List[Dict], int]]:
+        """Same contract as _extract_questions_from_soup, but reads the visible blocks with one page.evaluate
+        instead of page.content() + BeautifulSoup. Returns None when the JS finds nothing so the caller can
+        fall back to the soup path."""
+        to_process = sorted(visible)
+        if self.max_questions_per_test is not None:
+            remaining = max(0, self.max_questions_per_test - questions_attempted_so_far)
+            to_process = to_process[:remaining]
+            if not to_process:
+                return [], 0
+        try:
+            result = page.evaluate(_JS_EXTRACT_VISIBLE, to_process)
+        except Exception as e:
+            logger.debug("DOM extraction failed, falling back to soup: %s", e)
+            return None
+        items = (result or {}).get("items") or []
+        if not items:
+            return None
+        n_blocks = result.get("total") or len(items)
+        logger.info("  Parsing %s question block(s) (this view: %s)...", n_blocks, len(to_process))
+        rows = []
+        for item in items:
+            q_idx = item["idx"]
+            logger.info("  Question %s/%s: extracting...", q_idx + 1, n_blocks)
+            q_text = (item.get("text") or "").strip()
+            if not q_text or len(q_text) < 5:
+                continue
+            seed = f"gotest_{sub_category}_{q_text[:200]}"
+            if seed in seen_seeds:
+                continue
+            options = [_OPTION_LETTER_RE.sub("", t).strip() if t else "" for t in item.get("options") or []]
+            while len(options) < 2:
+                options.append("")
+            correct_idx = item.get("correct", -1)
+            explanation = ""
+            if correct_idx < 0 and item.get("name"):
+                logger.info("  Question %s/%s: correct not in DOM, clicking once to reveal answer + explanation...", q_idx + 1, n_blocks)
+                correct_idx, explanation = self._reveal_correct_by_click(page, item.get("id") or "", item["name"], len(options), q_idx + 1, n_blocks)
+            row = self._finish_row(q_idx, n_blocks, sub_category, q_text, options, correct_idx, explanation)
+            if row is None:
+                continue
+            rows.append(row)
+            seen_seeds.add(seed)
+            if len(rows) % 5 == 0 or q_idx == to_process[-1]:
+                logger.info("  Progress: %s/%s questions extracted.", len(rows), n_blocks)
+        return rows, len(to_process)
+
+    def _finish_row(
+        self, q_idx: int, n_blocks: int, sub_category: str, q_text: str, options: List[str], correct_idx: int, explanation: str
+    ) -> Optional[Dict]:
+        """Apply the unknown-correct policy and build the questions row; None means skipped."""
+        if correct_idx < 0:
+            if self.allow_unknown_correct:
+                correct_idx = 0
+                explanation = "(Correct answer not verified - gotest). " + (explanation or "")
+                logger.info("  Question %s/%s: saving with placeholder correct (index 0); fix manually if needed.", q_idx + 1, n_blocks)
+            else:
+                self._bump("skipped")
+                return None
+        row_id = _row_id(sub_category, q_text)
+        n_opts = len(options)
+        if correct_idx >= n_opts:
+            correct_idx = n_opts - 1
+        self._bump("questions")
+        opt_letter = chr(ord("A") + correct_idx) if 0 <= correct_idx < 26 else str(correct_idx)
+        logger.info("  Extracted Q%s: correct = option %s (index %s) | %s", q_idx + 1, opt_letter, correct_idx, (q_text[:55] + "…") if len(q_text) > 55 else q_text)
+        return {
+            "id": row_id,
+            "category": "gat",
+            "sub_category": sub_category,
+            "text": q_text[:5000],
+            "options": options[:10],
+            "correct_answer_idx": correct_idx,
+            "explanation": (explanation or "")[:2000],
+            "source": "gotest",
+        }
+
     def _get_correct_answer_from_dom(self, qb, num_options: int) -> int:
-        """Look for data-correct, input[type=radio][checked], or marker: .correct-answer, .watupro-screen-reader 'correct', or HTML comment with correct-answer."""
-        for inp in qb.find_all("input", type="radio"):
-            if inp.get("checked") or inp.get("data-correct"):
-                name = inp.get("name") or ""
-                val = inp.get("value") or ""
-                idx = self._option_value_to_index(val, name, qb, num_options)
-                if idx >= 0:
-                    return idx
-        for elem in qb.find_all(attrs={"data-correct": True}):
+        """Look for data-correct, input[type=radio][checked], or marker: .correct-answer, .watupro-screen-reader 'correct', or HTML comment with correct-answer.
+        One walk over qb.descendants collects every signal; a checked/data-correct radio wins immediately, the rest are resolved
+        afterwards in the same priority order (data-correct elements, choice markers, comments)."""
+        choice_divs = []
+        choice_has_radio = set()
+        data_correct = []
+        markers = []
+        comments = []
+        for el in qb.descendants:
+            if isinstance(el, Comment):
+                if _is_correct_comment(el):
+                    comments.append(el)
+                continue
+            if not getattr(el, "name", None):
+                continue
+            cls = _classes(el)
+            if _has_class(el, "watupro-question-choice"):
+                choice_divs.append(el)
+            if any(_CORRECT_CLASS_RE.search(c) for c in cls):
+                markers.append(el)
+            elif any("watupro-screen-reader" in c.lower() for c in cls) and el.get_text(strip=True).lower() == "correct":
+                markers.append(el)
+            if el.name == "input" and el.get("type") == "radio":
+                for a in el.parents:
+                    if a is qb:
+                        break
+                    choice_has_radio.add(id(a))
+                if el.get("checked") or el.get("data-correct"):
+                    idx = self._option_value_to_index(el.get("value") or "", el.get("name") or "", qb, num_options)
+                    if idx >= 0:
+                        return idx
+            if el.get("data-correct") is not None:
+                data_correct.append(el)
+        for elem in data_correct:
             val = elem.get("data-correct") or elem.get_text(strip=True)
-            idx = self._option_value_to_index(str(val), "", qb, num_options)
+            idx = self._option_value_to_index(str(val), "", qb, num_options, choice_divs=choice_divs)
             if idx >= 0:
                 return idx
-        choice_divs = qb.find_all(class_=lambda c: c and "watupro-question-choice" in " ".join(c) if isinstance(c, list) else "watupro-question-choice" in str(c or ""))
-        choices = [ch for ch in choice_divs[:10] if ch.find("input", type="radio")][:num_options]
+        choices = [ch for ch in choice_divs[:10] if id(ch) in choice_has_radio][:num_options]
         if len(choices) < 2:
             choices = choice_divs[:num_options]
-        for i, ch in enumerate(choices):
-            if ch.find(class_=lambda c: c and ("correct-answer" in " ".join(c) or "correct_answer" in " ".join(c) or "right-answer" in " ".join(c)) if isinstance(c, list) else "correct-answer" in str(c or "") or "correct_answer" in str(c or "") or "right-answer" in str(c or "")):
-                return i
-            cls = " ".join(ch.get("class") or []).lower()
-            if "correct-answer" in cls or "correct_answer" in cls or "right-answer" in cls:
-                return i
-            sr = ch.find(class_=re.compile(r"watupro-screen-reader", re.I))
-            if sr and (sr.get_text(strip=True) or "").strip().lower() == "correct":
-                return i
-        for comment in qb.find_all(string=lambda s: isinstance(s, Comment) and ("correct-answer" in str(s).lower() or "correct_answer" in str(s).lower())):
+        pos = {id(ch): i for i, ch in enumerate(choices)}
+
+        def choice_index(node) -> int:
+            # First choice (in order) that is node or one of its ancestors inside qb.
+            hits = [pos[id(a)] for a in (node, *node.parents) if id(a) in pos]
+            return min(hits) if hits else -1
+
+        hits = [i for i in map(choice_index, markers) if i >= 0]
+        if hits:
+            return min(hits)
+        for comment in comments:
             p = comment.parent
             for _ in range(10):
                 if not p:
                     break
-                if p.get("class") and "watupro-question-choice" in " ".join(p.get("class") or []):
-                    for ii, ch in enumerate(choices):
-                        if ch == p or (hasattr(p, "parents") and ch in list(p.parents)):
-                            return ii
+                if _has_class(p, "watupro-question-choice"):
+                    i = choice_index(p)
+                    if i >= 0:
+                        return i
                     break
-                p = getattr(p, "parent", None)
+                p = p.parent
         return -1
 
-    def _option_value_to_index(self, value: str, name: str, qb, num_options: int) -> int:
+    def _option_value_to_index(self, value: str, name: str, qb, num_options: int, choice_divs: Optional[list] = None) -> int:
         """Map value/name to 0..N-1. WatuPRO often uses answer IDs; match by order of choices."""
-        choice_divs = qb.find_all(class_=lambda c: c and "watupro-question-choice" in " ".join(c) if isinstance(c, list) else "watupro-question-choice" in str(c or ""))
+        if choice_divs is None:
+            choice_divs = qb.select(_SEL_CHOICE)
         for i, ch in enumerate(choice_divs[:10]):
             inp = ch.find("input", type="radio")
             if inp and (inp.get("value") == value or inp.get("name") == name):
@@ -598,21 +1124,17 @@ class GotestScraper:
         .correct-answer, .watupro-screen-reader "correct", or HTML comment containing correct-answer.
         Fallback: click Explanation button and regex "Correct Answer: (X)".
         """
-        correct_answer_re = re.compile(
-            r"correct\s+answer\s*[:\s]+([a-j])|"
-            r"right\s+answer\s*[:\s]+([a-j])|"
-            r"answer\s*[:\s]+([a-j])\s*[\.\)]|"
-            r"answer\s*[:\s]+([a-j])\s*$|"
-            r"\(([a-j])\)\s*correct|"
-            r"Correct Answer:\s*([A-J])",
-            re.I,
-        )
+        first_inp = qb.find("input", type="radio")
+        name = (first_inp.get("name") or "").strip() if first_inp else None
+        if not name:
+            return -1, ""
+        return self._reveal_correct_by_click(page, (qb.get("id") or "").strip(), name, num_options, q_num, q_total)
+
+    def _reveal_correct_by_click(
+        self, page, qid: str, name: str, num_options: int, q_num: int = 0, q_total: int = 0
+    ) -> Tuple[int, str]:
+        """Click-to-reveal for a question identified by its block id and radio group name (see _get_correct_by_click)."""
         try:
-            first_inp = qb.find("input", type="radio")
-            name = (first_inp.get("name") or "").strip() if first_inp else None
-            if not name:
-                return -1, ""
-            qid = (qb.get("id") or "").strip()
             if qid:
                 first_radio = page.query_selector(f'[id="{qid}"] input[type="radio"]')
             else:
@@ -622,231 +1144,435 @@ class GotestScraper:
                 first_radio = radios[0] if radios else None
             if not first_radio:
                 return -1, ""
-            if qid:
-                try:
-                    page.evaluate("""(id) => { const el = document.getElementById(id); if (el) el.scrollIntoView({ block: "center", behavior: "instant" }); }""", qid)
-                    time.sleep(0.3)
-                except Exception:
-                    pass
-            clicked = False
+            value = first_radio.get_attribute("value") or ""
+            replayed = self._reveal_correct_by_http(page, qid, name, value, num_options, q_num, q_total)
+            if replayed[0] >= 0:
+                return replayed
+            captured: List[Tuple[str, str]] = []
+
+            def _on_request(req) -> None:
+                if captured or req.method != "POST" or req.resource_type not in ("xhr", "fetch"):
+                    return
+                body = req.post_data or ""
+                if name in unquote_plus(body):
+                    captured.append((req.url, body))
+
+            page.on("request", _on_request)
             try:
-                first_radio.scroll_into_view_if_needed(timeout=5000)
-                first_radio.click(force=True, timeout=5000)
-                clicked = True
-            except Exception:
-                if qid:
-                    try:
-                        page.locator(f'[id="{qid}"] label').first.click(force=True, timeout=5000)
-                        clicked = True
-                    except Exception:
-                        pass
-                if not clicked and name:
-                    try:
-                        page.locator(f'input[type="radio"][name="{name}"]').first.locator("xpath=..").locator("label").first.click(force=True, timeout=5000)
-                        clicked = True
-                    except Exception:
-                        pass
-                if not clicked and qid:
-                    try:
-                        page.locator(f'[id="{qid}"] div.watupro-question-choice').first.click(force=True, timeout=5000)
-                        clicked = True
-                    except Exception:
-                        pass
+                clicked = self._click_and_submit(page, qid, name, first_radio)
+            finally:
+                page.remove_listener("request", _on_request)
             if not clicked:
                 return -1, ""
+            if captured and value:
+                with self._lock:
+                    self._submit_templates.setdefault(
+                        page.url, {"url": captured[0][0], "fields": parse_qsl(captured[0][1], keep_blank_values=True), "name": name, "value": value}
+                    )
+            if qid:
+                try:
+                    found = page.evaluate(_JS_REVEALED_CORRECT, {"id": qid, "numOpts": num_options})
+                except Exception:
+                    found = None
+                idx = found.get("idx") if isinstance(found, dict) else -1
+                if isinstance(idx, int) and 0 <= idx < num_options:
+                    logger.info("  Question %s/%s: found correct at option %s.", q_num, q_total, idx + 1)
+                    return idx, found.get("explanation") or ""
+            # Only the question block and the practice-feedback box are read; serialize just those.
+            html = page.evaluate(_JS_REVEAL_HTML, qid) if qid else ""
+            if not html:
+                html = page.content()
+            soup = BeautifulSoup(html, "lxml")
+            return self._resolve_correct_from_soup(soup, qid, name, num_options, q_num, q_total, html=html)
+        except Exception as e:
+            logger.warning("Click-to-reveal failed for question %s: %s", q_num, e)
+        return -1, ""
+
+    def _click_and_submit(self, page, qid: str, name: str, first_radio) -> bool:
+        """Click the first option, press Submit/Check and open the explanation. False if no click landed."""
+        if qid:
             try:
-                page.evaluate("""() => {
-                    const texts = ['Submit', 'Check', 'View Answer', 'Show Answer', 'Check Answer', 'Next'];
-                    const el = Array.from(document.querySelectorAll('a, button, input[type="submit"], span, div[role="button"]'))
-                        .find(e => { const t = (e.textContent || e.value || '').trim().toLowerCase(); return texts.some(x => t.includes(x.toLowerCase())); });
-                    if (el) el.click();
-                }""")
-                page.wait_for_timeout(300)
+                page.evaluate("""(id) => { const el = document.getElementById(id); if (el) el.scrollIntoView({ block: "center", behavior: "instant" }); }""", qid)
+                time.sleep(0.3)
             except Exception:
                 pass
+        clicked = False
+        try:
+            first_radio.scroll_into_view_if_needed(timeout=5000)
+            first_radio.click(force=True, timeout=5000)
+            clicked = True
+        except Exception:
             if qid:
                 try:
-                    page.wait_for_selector(
-                        f'[id="{qid}"] .correct-answer, [id="{qid}"] [class*="correct-answer"], [id="{qid}"] .watupro-screen-reader, [id="{qid}"] input[type="radio"]:checked',
-                        timeout=2200,
-                        state="attached",
-                    )
+                    page.locator(f'[id="{qid}"] label').first.click(force=True, timeout=5000)
+                    clicked = True
                 except Exception:
                     pass
-            page.wait_for_timeout(400)
+            if not clicked and name:
+                try:
+                    page.locator(f'input[type="radio"][name="{name}"]').first.locator("xpath=..").locator("label").first.click(force=True, timeout=5000)
+                    clicked = True
+                except Exception:
+                    pass
+            if not clicked and qid:
+                try:
+                    page.locator(f'[id="{qid}"] div.watupro-question-choice').first.click(force=True, timeout=5000)
+                    clicked = True
+                except Exception:
+                    pass
+        if not clicked:
+            return False
+        try:
+            page.evaluate("""() => {
+                const texts = ['Submit', 'Check', 'View Answer', 'Show Answer', 'Check Answer', 'Next'];
+                const el = Array.from(document.querySelectorAll('a, button, input[type="submit"], span, div[role="button"]'))
+                    .find(e => { const t = (e.textContent || e.value || '').trim().toLowerCase(); return texts.some(x => t.includes(x.toLowerCase())); });
+                if (el) el.click();
+            }""")
+            page.wait_for_timeout(300)
+        except Exception:
+            pass
+        if qid:
             try:
-                page.evaluate("""() => {
-                    const el = Array.from(document.querySelectorAll('a, button, span, div[role="button"]'))
-                        .find(e => e.textContent && e.textContent.trim().toLowerCase().includes('explanation'));
-                    if (el) el.click();
-                }""")
-                page.wait_for_timeout(250)
+                page.wait_for_selector(
+                    f'[id="{qid}"] .correct-answer, [id="{qid}"] [class*="correct-answer"], [id="{qid}"] .watupro-screen-reader, [id="{qid}"] input[type="radio"]:checked',
+                    timeout=2200,
+                    state="attached",
+                )
             except Exception:
                 pass
-            html = page.content()
-            soup = BeautifulSoup(html, "html.parser")
-            scope = soup.find("div", id=qid) if qid else None
-            if not scope and name:
-                inp = soup.find("input", type="radio", attrs={"name": name})
-                if inp:
-                    p = inp.parent
-                    for _ in range(15):
-                        if not p:
-                            break
-                        if p.name == "div" and (p.get("id") or "").startswith("question"):
-                            scope = p
-                            break
-                        if p.get("class") and ("watu-question" in " ".join(p.get("class") or []) or "show-question" in " ".join(p.get("class") or [])):
-                            scope = p
-                            break
-                        p = getattr(p, "parent", None)
-            if not scope:
-                scope = soup
-            all_choice_divs = scope.find_all(
-                class_=lambda c: c and "watupro-question-choice" in " ".join(c)
-                if isinstance(c, list)
-                else "watupro-question-choice" in str(c or ""),
+        page.wait_for_timeout(400)
+        try:
+            page.evaluate("""() => {
+                const el = Array.from(document.querySelectorAll('a, button, span, div[role="button"]'))
+                    .find(e => e.textContent && e.textContent.trim().toLowerCase().includes('explanation'));
+                if (el) el.click();
+            }""")
+            page.wait_for_timeout(250)
+        except Exception:
+            pass
+        return True
+
+    def _reveal_correct_by_http(
+        self, page, qid: str, name: str, value: str, num_options: int, q_num: int = 0, q_total: int = 0
+    ) -> Tuple[int, str]:
+        """Replay this test's captured WatuPRO submit request for another question; (-1, "") means use the click path."""
+        tpl = self._submit_templates.get(page.url)
+        if not tpl or not value:
+            return -1, ""
+        try:
+            _GOTEST_BUCKET.acquire()
+            resp = page.context.request.post(
+                tpl["url"],
+                data=urlencode(_replay_submit_fields(tpl, name, value)),
+                headers={"Content-Type": "application/x-www-form-urlencoded", "X-Requested-With": "XMLHttpRequest"},
+                timeout=15000,
             )
-            choices = [ch for ch in all_choice_divs[:10] if ch.find("input", type="radio")][:num_options]
-            if len(choices) < 2:
-                choices = all_choice_divs[:num_options]
-            correct_idx = -1
-            def _index_from_regex(text: str):
-                out = -1
-                for m in correct_answer_re.finditer(text):
-                    letter = (m.group(1) or m.group(2) or m.group(3) or m.group(4) or m.group(5) or m.group(6) or "").upper()
-                    if letter in "ABCDEFGHIJ":
-                        out = min(ord(letter) - ord("A"), len(choices) - 1)
-                return out
-            for comment in scope.find_all(string=lambda s: isinstance(s, Comment) and "correct-answer" in str(s).lower()):
-                p = comment.parent
-                for _ in range(10):
+            if not resp.ok:
+                return -1, ""
+            body = resp.text()
+        except Exception as e:
+            logger.debug("Submit replay failed for question %s: %s", q_num, e)
+            return -1, ""
+        html = _submit_response_html(body)
+        soup = BeautifulSoup(html, "lxml")
+        # A response without this question in it would let the resolver read some other question's answer.
+        if not ((qid and soup.find(id=qid)) or soup.find("input", attrs={"name": name})):
+            return -1, ""
+        idx, explanation = self._resolve_correct_from_soup(soup, qid, name, num_options, q_num, q_total, html=html)
+        if idx >= 0:
+            with self._lock:
+                self.paths["submit_replay"] += 1
+        return idx, explanation
+
+    def _resolve_correct_from_soup(
+        self, soup: BeautifulSoup, qid: str, name: str, num_options: int, q_num: int = 0, q_total: int = 0, html: Optional[str] = None
+    ) -> Tuple[int, str]:
+        """
+        Read the revealed answer + explanation from a parsed block (or a submit response). Fallback for _JS_REVEALED_CORRECT.
+        html, when given, lets the comment walk be skipped if no marker comment exists.
+        """
+        scope = soup.find("div", id=qid) if qid else None
+        if not scope and name:
+            inp = soup.find("input", type="radio", attrs={"name": name})
+            if inp:
+                p = inp.parent
+                for _ in range(15):
                     if not p:
                         break
-                    if p.get("class") and "watupro-question-choice" in " ".join(p.get("class") or []):
-                        for ii, ch in enumerate(choices):
-                            if ch == p or p in ch.descendants or (hasattr(p, "parents") and ch in list(p.parents)):
-                                correct_idx = ii
-                                break
+                    if p.name == "div" and (p.get("id") or "").startswith("question"):
+                        scope = p
+                        break
+                    if _has_class(p, "watu-question") or _has_class(p, "show-question"):
+                        scope = p
                         break
                     p = getattr(p, "parent", None)
-                if correct_idx >= 0:
+        if not scope:
+            scope = soup
+        all_choice_divs = scope.select(_SEL_CHOICE)
+        choices = [ch for ch in all_choice_divs[:10] if ch.find("input", type="radio")][:num_options]
+        if len(choices) < 2:
+            choices = all_choice_divs[:num_options]
+        choice_pos = {id(ch): i for i, ch in enumerate(choices)}
+
+        def _first_choice(node, pos: Dict[int, int]) -> int:
+            # First listed choice that is node or one of its ancestors (identity, not bs4's structural ==).
+            hits = [pos[id(a)] for a in (node, *node.parents) if id(a) in pos]
+            return min(hits) if hits else -1
+
+        correct_idx = -1
+        n_choices = len(choices) or num_options
+        comments = scope.find_all(string=_is_correct_comment) if html is None or _CORRECT_COMMENT_HTML_RE.search(html) else []
+        for comment in comments:
+            p = comment.parent
+            for _ in range(10):
+                if not p:
                     break
-            if correct_idx < 0:
-                for i, ch in enumerate(choices):
-                    cls = " ".join(ch.get("class") or []).lower()
-                    if "correct-answer" in cls or "correct_answer" in cls or "right-answer" in cls or ("correct" in cls and "incorrect" not in cls):
-                        correct_idx = i
-                        break
-                    if ch.find(class_=lambda c: c and ("correct-answer" in " ".join(c) or "correct_answer" in " ".join(c) or "right-answer" in " ".join(c)) if isinstance(c, list) else "correct-answer" in str(c or "") or "correct_answer" in str(c or "") or "right-answer" in str(c or "")):
-                        correct_idx = i
-                        break
-                    sr = ch.find(class_=re.compile(r"watupro-screen-reader", re.I))
-                    if sr and (sr.get_text(strip=True) or "").strip().lower() == "correct":
+                if _has_class(p, "watupro-question-choice"):
+                    correct_idx = _first_choice(p, choice_pos)
+                    break
+                p = getattr(p, "parent", None)
+            if correct_idx >= 0:
+                break
+        if correct_idx < 0:
+            for i, ch in enumerate(choices):
+                # Cheapest first: attribute/class reads, then soupsieve lookups. Any hit on choice i wins, so order is free.
+                cls = tuple(c.lower() for c in _classes(ch))
+                if any(_CORRECT_CLASS_RE.search(c) for c in cls) or (any("correct" in c for c in cls) and not any("incorrect" in c for c in cls)):
+                    correct_idx = i
+                    break
+                inp = ch.find("input", type="radio")
+                if inp and (inp.get("checked") or inp.get("data-correct")):
+                    correct_idx = i
+                    break
+                if ch.select_one(_SEL_CORRECT_MARKER):
+                    correct_idx = i
+                    break
+                sr = ch.select_one(_SEL_SCREEN_READER)
+                if sr and (sr.get_text(strip=True) or "").strip().lower() == "correct":
+                    correct_idx = i
+                    break
+                nxt = ch.find_next_sibling()
+                if nxt and id(nxt) not in choice_pos:
+                    sr2 = nxt.select_one(_SEL_SCREEN_READER)
+                    if sr2 and (sr2.get_text(strip=True) or "").strip().lower() == "correct":
                         correct_idx = i
                         break
-                    nxt = ch.find_next_sibling()
-                    if nxt and hasattr(nxt, "find"):
-                        sr2 = nxt.find(class_=re.compile(r"watupro-screen-reader", re.I))
-                        if sr2 and (sr2.get_text(strip=True) or "").strip().lower() == "correct":
-                            correct_idx = i
-                            break
-                    inp = ch.find("input", type="radio")
-                    if inp and (inp.get("checked") or inp.get("data-correct")):
-                        correct_idx = i
+        if correct_idx < 0 and qid:
+            block = scope if scope.get("id") == qid else soup.find("div", id=qid)
+            if block is scope:
+                in_block = all_choice_divs
+            else:
+                in_block = block.select(_SEL_CHOICE) if block else []
+            block_pos = {id(c): ii for ii, c in enumerate([c for c in in_block if c.find("input", type="radio")][:num_options])}
+            # A "correct" screen-reader label only counts inside this question's block, so search just the block.
+            for sr_el in block.select(_SEL_SCREEN_READER) if block_pos else ():
+                if (sr_el.get_text(strip=True) or "").strip().lower() != "correct":
+                    continue
+                p = sr_el.parent
+                choice_div = None
+                for _ in range(15):
+                    if not p or p is block:
                         break
-            if correct_idx < 0 and qid:
-                for sr_el in soup.find_all(class_=re.compile(r"watupro-screen-reader", re.I)):
-                    if (sr_el.get_text(strip=True) or "").strip().lower() != "correct":
-                        continue
-                    p = sr_el.parent
-                    choice_div = None
-                    for _ in range(15):
-                        if not p:
-                            break
-                        if p.get("id") == qid:
-                            break
-                        if p.get("class") and "watupro-question-choice" in " ".join(p.get("class") or []):
-                            choice_div = p
-                        p = getattr(p, "parent", None)
-                    if not choice_div:
-                        continue
-                    block = soup.find("div", id=qid)
-                    if not block or (choice_div not in block.descendants and choice_div != block):
-                        continue
-                    real_in_scope = [c for c in block.find_all(class_=lambda c: c and "watupro-question-choice" in " ".join(c) if isinstance(c, list) else "watupro-question-choice" in str(c or "")) if c.find("input", type="radio")][:num_options]
-                    for ii, c in enumerate(real_in_scope):
-                        if c == choice_div or choice_div in c.descendants or (hasattr(choice_div, "parents") and c in list(choice_div.parents)):
-                            correct_idx = ii
-                            break
+                    if _has_class(p, "watupro-question-choice"):
+                        choice_div = p
+                    p = p.parent
+                if choice_div:
+                    correct_idx = _first_choice(choice_div, block_pos)
                     if correct_idx >= 0:
                         break
-            if correct_idx < 0 and qid:
-                try:
-                    idx_from_page = page.evaluate("""(id, numOpts) => {
-                        const root = document.getElementById(id);
-                        if (!root) return -1;
-                        const all = root.querySelectorAll('.watupro-question-choice, [class*="question-choice"]');
-                        const choices = Array.from(all).filter(el => el.querySelector('input[type="radio"]')).slice(0, numOpts);
-                        for (let i = 0; i < choices.length; i++) {
-                            const el = choices[i];
-                            if ((el.className || '').toLowerCase().includes('correct-answer')) return i;
-                            if (el.querySelector('.correct-answer, [class*="correct-answer"]')) return i;
-                            const sr = el.querySelector('.watupro-screen-reader');
-                            if (sr && (sr.textContent || '').trim().toLowerCase() === 'correct') return i;
-                            const next = el.nextElementSibling;
-                            if (next && next.classList.contains('watupro-screen-reader') && (next.textContent || '').trim().toLowerCase() === 'correct') return i;
-                            if ((el.textContent || '').includes('✓') || (el.textContent || '').includes('✔')) return i;
-                        }
-                        return -1;
-                    }""", qid, num_options)
-                    if isinstance(idx_from_page, int) and 0 <= idx_from_page < num_options:
-                        correct_idx = idx_from_page
-                except Exception:
-                    pass
-            feedback = soup.find(id="watuPracticeFeedback") or soup.find(class_=re.compile(r"watupro.*feedback|feedback|explanation", re.I))
-            if correct_idx < 0:
-                correct_idx = _index_from_regex((feedback.get_text(separator=" ", strip=True) if feedback else "")[:2000])
-                if correct_idx >= 0:
-                    logger.info("  Question %s/%s: found correct at option %s (from feedback regex).", q_num, q_total, correct_idx + 1)
-            if correct_idx < 0:
-                correct_idx = _index_from_regex(scope.get_text(separator=" ", strip=True)[:2000])
-                if correct_idx >= 0:
-                    logger.info("  Question %s/%s: found correct at option %s (from scope regex).", q_num, q_total, correct_idx + 1)
-            if correct_idx < 0:
-                main = soup.find("div", class_="entry-content") or soup.find(id="watupro_quiz") or soup.body or soup
-                if main:
-                    correct_idx = _index_from_regex(main.get_text(separator=" ", strip=True)[:3000])
-                    if correct_idx >= 0:
-                        logger.info("  Question %s/%s: found correct at option %s (from page regex).", q_num, q_total, correct_idx + 1)
+        feedback = soup.find(id="watuPracticeFeedback") or soup.find(class_=_FEEDBACK_RE)
+        if correct_idx < 0:
+            correct_idx = _letter_index(n_choices, (feedback.get_text(separator=" ", strip=True) if feedback else "")[:2000])
             if correct_idx >= 0:
-                logger.info("  Question %s/%s: found correct at option %s.", q_num, q_total, correct_idx + 1)
-            explanation = ""
-            expl_str = soup.find(string=re.compile(r"EXPLANATION\s*:", re.I))
-            if expl_str:
-                parent = expl_str.parent
-                for _ in range(5):
-                    if not parent:
-                        break
-                    if parent.name in ("div", "p", "section", "td"):
-                        explanation = (parent.get_text(separator=" ", strip=True) or "")[:2000]
-                        break
-                    parent = getattr(parent, "parent", None)
-            if not explanation and feedback:
-                explanation = (feedback.get_text(separator=" ", strip=True) or "")[:2000]
-            elif not explanation and scope:
-                next_el = scope.find_next_sibling() or scope.find_next("div")
-                if next_el and next_el.get("id") != qid:
-                    explanation = (next_el.get_text(separator=" ", strip=True) or "")[:2000]
-            return correct_idx, explanation
+                logger.info("  Question %s/%s: found correct at option %s (from feedback regex).", q_num, q_total, correct_idx + 1)
+        if correct_idx < 0:
+            correct_idx = _letter_index(n_choices, scope.get_text(separator=" ", strip=True)[:2000])
+            if correct_idx >= 0:
+                logger.info("  Question %s/%s: found correct at option %s (from scope regex).", q_num, q_total, correct_idx + 1)
+        if correct_idx < 0:
+            main = soup.find("div", class_="entry-content") or soup.find(id="watupro_quiz") or soup.body or soup
+            if main:
+                correct_idx = _letter_index(n_choices, main.get_text(separator=" ", strip=True)[:3000])
+                if correct_idx >= 0:
+                    logger.info("  Question %s/%s: found correct at option %s (from page regex).", q_num, q_total, correct_idx + 1)
+        if correct_idx >= 0:
+            logger.info("  Question %s/%s: found correct at option %s.", q_num, q_total, correct_idx + 1)
+        explanation = ""
+        expl_str = soup.find(string=_EXPLANATION_RE)
+        if expl_str:
+            parent = expl_str.parent
+            for _ in range(5):
+                if not parent:
+                    break
+                if parent.name in ("div", "p", "section", "td"):
+                    explanation = (parent.get_text(separator=" ", strip=True) or "")[:2000]
+                    break
+                parent = getattr(parent, "parent", None)
+        if not explanation and feedback:
+            explanation = (feedback.get_text(separator=" ", strip=True) or "")[:2000]
+        elif not explanation and scope:
+            next_el = scope.find_next_sibling() or scope.find_next("div")
+            if next_el and next_el.get("id") != qid:
+                explanation = (next_el.get_text(separator=" ", strip=True) or "")[:2000]
+        return correct_idx, explanation
+
+    def _make_context(self, browser):
+        """One warm context for the whole run: fixed UA, no service workers, resource-blocking route installed once."""
+        context = browser.new_context(
+            user_agent=USER_AGENT,
+            viewport={"width": 1280, "height": 720},
+            java_script_enabled=True,
+            ignore_https_errors=True,
+            bypass_csp=True,
+            service_workers="block",
+        )
+        context.set_default_timeout(PAGE_TIMEOUT_MS)
+        context.route("**/*", _block_nonessential)
+        return context
+
+    def _reset_storage(self, context, page) -> None:
+        """Drop cookies and web storage between tests so WatuPRO state does not pile up over a long run."""
+        try:
+            context.clear_cookies()
+            page.evaluate("() => { try { localStorage.clear(); sessionStorage.clear(); } catch (e) {} }")
+        except Exception:
+            pass
+
+    def _launch_browser(self, p):
+        try:
+            return p.chromium.launch(
+                headless=True,
+                args=["--disable-blink-features=AutomationControlled", "--no-sandbox"],
+            )
+        except Exception:
+            return p.chromium.launch(headless=True, args=["--no-sandbox"])
+
+    def _scrape_test(self, page, idx: int, total_tests: int, test_url: str, test_name: str) -> List[Dict]:
+        """Scrape one test on the given page and flush what is left of it; errors are counted, not raised."""
+        self._bump("tests")
+        sub = _normalize_sub_category(test_name)
+        logger.info("Test [%s/%s]: %s -> sub_category=%s", idx, total_tests, test_url, sub)
+        # A --max-questions run only sees part of each test, so it neither reads nor writes the cache.
+        validator = self._page_validator(page, test_url) if self._cache and not self.max_questions_per_test else None
+        if validator:
+            cached = self._cache_get(test_url, validator)
+            if cached is not None:
+                logger.info("  Unchanged since last run (%s), %s cached rows; skipping.", validator, len(cached))
+                self._bump("cached")
+                return cached
+        logger.info("  Loading test page...")
+        rows = []
+        ok = False
+        try:
+            rows = self._extract_questions_from_test_page(page, test_url, sub)
+            logger.info("  Total from this test: %s", len(rows))
+            ok = True
         except Exception as e:
-            logger.warning("Click-to-reveal failed for question %s: %s", q_num, e)
-        return -1, ""
+            logger.warning("Failed test %s: %s", test_url, e)
+            self._bump("errors")
+        self._flush(force=True)
+        # Only remember tests whose rows actually reached the DB, so a failed upsert is retried next run. _pending is shared by
+        # the workers, so look for this test's own rows in it rather than requiring it to be empty.
+        if validator and ok and rows and self._on_chunk and not self.dry_run:
+            mine = {id(r) for r in rows}
+            if not any(id(r) in mine for r in list(self._pending)):
+                self._cache_put(test_url, validator, rows)
+        return rows
+
+    def _page_validator(self, page, url: str) -> Optional[str]:
+        """HEAD the test URL through the context (same cookies/UA) and return its ETag or Last-Modified, if any."""
+        try:
+            _GOTEST_BUCKET.acquire()
+            resp = page.context.request.head(url, timeout=15000)
+            headers = resp.headers
+            return headers.get("etag") or headers.get("last-modified") or None
+        except Exception:
+            return None
+
+    def _cache_key(self, url: str) -> str:
+        """Row sets differ with --allow-unknown-correct, so each setting gets its own cache entry per test URL."""
+        return f"{url}#allow_unknown={int(self.allow_unknown_correct)}"
+
+    def _cache_get(self, url: str, validator: str) -> Optional[List[Dict]]:
+        with self._lock:
+            hit = self._cache.execute("SELECT rows FROM tests WHERE url = ? AND validator = ?", (self._cache_key(url), validator)).fetchone()
+        return json.loads(hit[0]) if hit else None
+
+    def _cache_put(self, url: str, validator: str, rows: List[Dict]) -> None:
+        with self._lock:
+            self._cache.execute(
+                "INSERT OR REPLACE INTO tests(url, validator, rows) VALUES (?, ?, ?)", (self._cache_key(url), validator, json.dumps(rows))
+            )
+            self._cache.commit()
+
+    def _run_workers(self, jobs: List[Tuple[int, Tuple[str, str]]], total_tests: int, all_rows: List[Dict]) -> None:
+        """Scrape tests on `workers` threads. The sync Playwright API is per-thread, so each worker owns its own
+        Playwright instance, browser and context; they share the navigation token bucket and the upsert buffer."""
+        from playwright.sync_api import sync_playwright
+
+        todo: "queue.Queue[Tuple[int, Tuple[str, str]]]" = queue.Queue()
+        for job in jobs:
+            todo.put(job)
+
+        def worker() -> None:
+            with sync_playwright() as p:
+                browser = self._launch_browser(p)
+                context = self._make_context(browser)
+                page = context.new_page()
+                try:
+                    first = True
+                    while True:
+                        try:
+                            idx, (test_url, test_name) = todo.get_nowait()
+                        except queue.Empty:
+                            return
+                        if not first:
+                            self._reset_storage(context, page)
+                        first = False
+                        rows = self._scrape_test(page, idx, total_tests, test_url, test_name)
+                        with self._lock:
+                            all_rows.extend(rows)
+                finally:
+                    context.close()
+                    browser.close()
+
+        n = min(self.workers, len(jobs))
+        logger.info("Scraping with %s workers", n)
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            for fut in [pool.submit(worker) for _ in range(n)]:
+                try:
+                    fut.result()
+                except Exception as e:
+                    logger.warning("Worker failed: %s", e)
+                    self._bump("errors")
+
+    def _flush(self, force: bool = False) -> None:
+        """
+        Upsert pending rows in chunk_size batches as views complete; force sends the remainder. Rows stay pending if the upsert fails.
+        Upserts hold their own lock, not _lock, so other workers keep scraping; a non-forced flush that finds one running returns
+        at once (the running flush re-checks _pending and picks up what was just added).
+        """
+        if self.dry_run or not self._on_chunk:
+            return
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            while self._pending and (force or len(self._pending) >= self._chunk_size):
+                chunk = self._pending[: self._chunk_size]
+                try:
+                    self._on_chunk(chunk)
+                except Exception as e:
+                    logger.warning("Chunk upsert failed (%s rows kept pending): %s", len(self._pending), e)
+                    return
+                del self._pending[: len(chunk)]
+        finally:
+            self._flush_lock.release()
 
     def run(
         self,
         on_chunk: Optional[callable] = None,
-        chunk_size: int = 200,
+        chunk_size: int = UPSERT_BATCH_SIZE,
     ) -> List[Dict]:
         """Playwright: discover test URLs, for each test extract questions; optional incremental upsert."""
         try:
@@ -855,53 +1581,40 @@ class GotestScraper:
             logger.error("Playwright not installed. Run: pip install playwright && playwright install chromium")
             return []
         all_rows = []
-        pending = []
+        self._on_chunk = on_chunk
+        self._chunk_size = chunk_size
+        self._pending = []
+        if self.use_cache:
+            self._cache = _open_scrape_cache(SCRAPE_CACHE)
+            if self.refresh:
+                self._cache.execute("DELETE FROM tests")
+                self._cache.commit()
+        parallel = False
         with sync_playwright() as p:
-            try:
-                browser = p.chromium.launch(
-                    headless=True,
-                    args=["--disable-blink-features=AutomationControlled", "--no-sandbox"],
-                )
-            except Exception:
-                browser = p.chromium.launch(headless=True, args=["--no-sandbox"])
-            context = browser.new_context(
-                user_agent=USER_AGENT,
-                viewport={"width": 1280, "height": 720},
-                java_script_enabled=True,
-                ignore_https_errors=True,
-            )
-            context.set_default_timeout(PAGE_TIMEOUT_MS)
+            browser = self._launch_browser(p)
+            context = self._make_context(browser)
             page = context.new_page()
             try:
                 test_links = self._discover_all_test_urls(page)
                 logger.info("Total test URLs to scrape: %s", len(test_links))
                 total_tests = len(test_links)
-                for idx, (test_url, test_name) in enumerate(test_links, 1):
-                    self.stats["tests"] += 1
-                    sub = _normalize_sub_category(test_name)
-                    logger.info("Test [%s/%s]: %s -> sub_category=%s", idx, total_tests, test_url, sub)
-                    logger.info("  Loading test page...")
-                    try:
-                        rows = self._extract_questions_from_test_page(page, test_url, sub)
-                        all_rows.extend(rows)
-                        pending.extend(rows)
-                        logger.info("  Total from this test: %s", len(rows))
-                        while on_chunk and len(pending) >= chunk_size:
-                            chunk = pending[:chunk_size]
-                            pending = pending[chunk_size:]
-                            on_chunk(chunk)
-                    except Exception as e:
-                        logger.warning("Failed test %s: %s", test_url, e)
-                        self.stats["errors"] += 1
-                    time.sleep(REQUEST_DELAY)
+                parallel = self.workers > 1 and total_tests > 1
+                if not parallel:
+                    for idx, (test_url, test_name) in enumerate(test_links, 1):
+                        if idx > 1:
+                            self._reset_storage(context, page)
+                        all_rows.extend(self._scrape_test(page, idx, total_tests, test_url, test_name))
             finally:
                 context.close()
                 browser.close()
-        if on_chunk and pending:
-            try:
-                on_chunk(pending)
-            except Exception as e:
-                logger.warning("Final chunk upsert failed: %s", e)
+        if parallel:
+            self._run_workers(list(enumerate(test_links, 1)), total_tests, all_rows)
+        self._flush(force=True)
+        if self._pending:
+            logger.warning("Final chunk upsert failed: %s rows not saved", len(self._pending))
+        if self._cache:
+            self._cache.close()
+            self._cache = None
         return all_rows
 
 
@@ -914,7 +1627,10 @@ def main():
     parser.add_argument("--verbal-only", action="store_true", help="Only verbal index")
     parser.add_argument("--quant-only", action="store_true", help="Only quantitative index")
     parser.add_argument("--url", type=str, default=None, help="Scrape only this test URL (e.g. pattern-recognition test)")
-    parser.add_argument("--chunk-size", type=int, default=200, help="Upsert chunk size")
+    parser.add_argument("--workers", type=int, default=1, help="Scrape N tests in parallel (one browser per worker; navigations share the rate limit)")
+    parser.add_argument("--refresh", action="store_true", help=f"Forget cached tests ({SCRAPE_CACHE.name}) and re-scrape everything")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the scraped-test cache")
+    parser.add_argument("--chunk-size", type=int, default=UPSERT_BATCH_SIZE, help="Upsert chunk size (rows are flushed as each view completes)")
     args = parser.parse_args()
 
     scraper = GotestScraper(
@@ -925,6 +1641,9 @@ def main():
         verbal_only=args.verbal_only,
         quant_only=args.quant_only,
         single_url=args.url,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        refresh=args.refresh,
     )
     on_chunk = None if args.dry_run else upsert_questions_chunk_client
     rows = scraper.run(on_chunk=on_chunk, chunk_size=args.chunk_size)
@@ -934,6 +1653,9 @@ def main():
     logger.info("Questions extracted: %s", scraper.stats["questions"])
     logger.info("Skipped: %s", scraper.stats["skipped"])
     logger.info("Errors: %s", scraper.stats["errors"])
+    logger.info("Unchanged tests (cached): %s", scraper.stats["cached"])
+    if scraper.paths:
+        logger.info("Views by extraction path: %s", dict(scraper.paths))
 
     if args.dry_run and rows:
         logger.info("Sample row: %s", rows[0])
@@ -3,6 +3,7 @@ MCQ Discovery Module for finding online MCQs for low-count subcategories.
 Uses web search and source mapping to help users find more questions.
 """
 import logging
+from functools import lru_cache
 from typing import List, Dict, Optional
 from db import get_subcategory_counts
 
@@ -105,6 +106,7 @@ def get_sources_for_subcategory(sub_category: str) -> List[Dict]:
     return KNOWN_SOURCES.get(sub_category, [])
 
 
+@lru_cache(maxsize=512)
 def format_subcategory_name(sub_category: str) -> str:
     """Format subcategory name for display (replace underscores with spaces, title case)."""
     return sub_category.replace("_", " ").title()
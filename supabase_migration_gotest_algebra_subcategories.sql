@@ -0,0 +1,41 @@
+-- Migration: gotest algebra tests now get their own sub_category.
+-- src/gotest_live_scraper.py matches the longest test name first, so 'polynomials (algebra)', 'inequalities (algebra)'
+-- and 'word problems (algebra)' map to algebra_polynomials / algebra_inequalities / word_problems_algebra instead of
+-- algebra_equations. Row ids are uuid5("gotest_{sub_category}_{text[:200]}"), so a re-scrape inserts those questions
+-- again under new ids and the old algebra_equations copies stay behind.
+-- Run in Supabase SQL Editor AFTER re-scraping gotest. Old rows whose text now exists under one of the new
+-- sub_categories are removed; user_stats / session_answers are moved to the new id first so history is kept.
+-- (A question that also appears verbatim in the 'equations (algebra)' test itself is treated as moved too.)
+
+BEGIN;
+
+CREATE TEMP TABLE gotest_algebra_moves ON COMMIT DROP AS
+SELECT DISTINCT ON (old.id) old.id AS old_id, new.id AS new_id
+FROM questions old
+JOIN questions new
+  ON new.text = old.text
+ AND new.source = 'gotest'
+ AND new.sub_category IN ('algebra_polynomials', 'algebra_inequalities', 'word_problems_algebra')
+WHERE old.source = 'gotest'
+  AND old.sub_category = 'algebra_equations'
+ORDER BY old.id, new.id;
+
+-- Preview: SELECT count(*) FROM gotest_algebra_moves;
+
+-- A user who already has stats on the new id keeps those; the old row's stats go with the delete below.
+UPDATE user_stats us
+SET question_id = m.new_id
+FROM gotest_algebra_moves m
+WHERE us.question_id = m.old_id
+  AND NOT EXISTS (SELECT 1 FROM user_stats x WHERE x.user_id = us.user_id AND x.question_id = m.new_id);
+
+UPDATE session_answers sa
+SET question_id = m.new_id
+FROM gotest_algebra_moves m
+WHERE sa.question_id = m.old_id;
+
+DELETE FROM questions q
+USING gotest_algebra_moves m
+WHERE q.id = m.old_id;
+
+COMMIT;
@@ -0,0 +1,102 @@
+-- RPC functions called by db.py (client.rpc(...)).
+-- Run in Supabase SQL Editor after create_supabase_tables.sql. Safe to re-run (CREATE OR REPLACE / IF NOT EXISTS).
+
+-- Composite index for the (category, sub_category) filters used by the functions below and db.py reads.
+CREATE INDEX IF NOT EXISTS idx_questions_cat_sub ON questions(category, sub_category);
+
+-- n random questions from one category (sampling happens server-side; only n rows are sent back).
+CREATE OR REPLACE FUNCTION select_random_questions(p_category TEXT, n INT)
+RETURNS SETOF questions AS $$
+    SELECT * FROM questions WHERE category = p_category ORDER BY random() LIMIT n;
+$$ LANGUAGE sql VOLATILE;
+
+-- Mock test pool in one round-trip: n_gat random GAT rows + n_subject random Subject rows.
+CREATE OR REPLACE FUNCTION get_mock_test_questions(n_gat INT, n_subject INT)
+RETURNS SETOF questions AS $$
+    SELECT * FROM select_random_questions('gat', n_gat)
+    UNION ALL
+    SELECT * FROM select_random_questions('subject', n_subject);
+$$ LANGUAGE sql VOLATILE;
+
+-- {sub_category: count} aggregated in Postgres; NULL/empty sub_category reported as '(blank)'.
+-- p_category NULL counts across all categories.
+CREATE OR REPLACE FUNCTION subcategory_counts(p_category TEXT DEFAULT NULL)
+RETURNS TABLE(sub_category TEXT, n BIGINT) AS $$
+    SELECT COALESCE(NULLIF(q.sub_category, ''), '(blank)'), COUNT(*)
+    FROM questions q
+    WHERE p_category IS NULL OR q.category = p_category
+    GROUP BY 1;
+$$ LANGUAGE sql STABLE;
+
+-- fix_category_by_source.py: set category from source in two UPDATEs. p_dry_run only counts.
+CREATE OR REPLACE FUNCTION fix_category_by_source(
+    p_gat_sources TEXT[],
+    p_subject_sources TEXT[],
+    p_dry_run BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE(gat_updated BIGINT, subject_updated BIGINT) AS $$
+DECLARE
+    g BIGINT;
+    s BIGINT;
+BEGIN
+    IF p_dry_run THEN
+        SELECT COUNT(*) INTO g FROM questions
+        WHERE lower(trim(source)) = ANY(p_gat_sources) AND lower(trim(COALESCE(category, ''))) <> 'gat';
+        SELECT COUNT(*) INTO s FROM questions
+        WHERE lower(trim(source)) = ANY(p_subject_sources) AND lower(trim(COALESCE(category, ''))) <> 'subject';
+    ELSE
+        UPDATE questions SET category = 'gat'
+        WHERE lower(trim(source)) = ANY(p_gat_sources) AND lower(trim(COALESCE(category, ''))) <> 'gat';
+        GET DIAGNOSTICS g = ROW_COUNT;
+        UPDATE questions SET category = 'subject'
+        WHERE lower(trim(source)) = ANY(p_subject_sources) AND lower(trim(COALESCE(category, ''))) <> 'subject';
+        GET DIAGNOSTICS s = ROW_COUNT;
+    END IF;
+    RETURN QUERY SELECT g, s;
+END;
+$$ LANGUAGE plpgsql;
+
+-- fix_examveda_categories.py: examveda rows stored as 'subject' whose normalized sub_category contains
+-- none of p_subject_keywords become 'gat'. Returns rows updated (or matched, if p_dry_run).
+CREATE OR REPLACE FUNCTION fix_examveda_categories(p_subject_keywords TEXT[], p_dry_run BOOLEAN DEFAULT FALSE)
+RETURNS BIGINT AS $$
+DECLARE
+    n BIGINT;
+BEGIN
+    IF p_dry_run THEN
+        SELECT COUNT(*) INTO n FROM questions q
+        WHERE q.source = 'examveda' AND q.category = 'subject'
+          AND replace(replace(lower(trim(COALESCE(q.sub_category, ''))), '-', '_'), ' ', '_') <> ''
+          AND NOT EXISTS (
+              SELECT 1 FROM unnest(p_subject_keywords) k
+              WHERE position(k IN replace(replace(lower(trim(q.sub_category)), '-', '_'), ' ', '_')) > 0
+          );
+    ELSE
+        UPDATE questions q SET category = 'gat'
+        WHERE q.source = 'examveda' AND q.category = 'subject'
+          AND replace(replace(lower(trim(COALESCE(q.sub_category, ''))), '-', '_'), ' ', '_') <> ''
+          AND NOT EXISTS (
+              SELECT 1 FROM unnest(p_subject_keywords) k
+              WHERE position(k IN replace(replace(lower(trim(q.sub_category)), '-', '_'), ' ', '_')) > 0
+          );
+        GET DIAGNOSTICS n = ROW_COUNT;
+    END IF;
+    RETURN n;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Sorted distinct non-empty sub_category values for one category.
+CREATE OR REPLACE FUNCTION distinct_subcategories(p_category TEXT)
+RETURNS TABLE(sub_category TEXT) AS $$
+    SELECT DISTINCT q.sub_category
+    FROM questions q
+    WHERE q.category = p_category AND COALESCE(q.sub_category, '') <> ''
+    ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+-- Fix-script fallbacks: set category for a client-computed id list in one statement. Returns rows updated.
+CREATE OR REPLACE FUNCTION set_questions_category(p_ids UUID[], p_cat TEXT)
+RETURNS BIGINT AS $$
+    WITH u AS (UPDATE questions SET category = p_cat WHERE id = ANY(p_ids) RETURNING 1)
+    SELECT COUNT(*) FROM u;
+$$ LANGUAGE sql VOLATILE;
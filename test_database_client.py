@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+DatabaseClient against a fake PostgREST (httpx.MockTransport), so no Supabase is needed.
+finalize_session falls back to plain inserts only when the RPC isn't installed, never after a failure that may
+already have committed; upsert_questions_batch also works when called from a running event loop.
+Run: python -m pytest test_database_client.py  (or python test_database_client.py)
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+from uuid import uuid4
+
+import httpx
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.database import DatabaseClient
+
+_ANSWERS = [{"question_id": str(uuid4()), "user_choice_idx": 1, "is_correct": True, "points_earned": 1.0, "time_spent_sec": 3}]
+
+
+def _client(monkeypatch, rpc_response=None):
+    """DatabaseClient whose PostgREST calls are recorded as (method, path); /rpc/finalize_session gets rpc_response."""
+    monkeypatch.setenv("SUPABASE_URL", "http://localhost:54321")
+    monkeypatch.setenv("SUPABASE_KEY", "test-key")
+    calls = []
+    upserted = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append((request.method, request.url.path))
+        if request.url.path.endswith("/questions"):
+            upserted.extend(json.loads(request.content))
+        if request.url.path.endswith("/rpc/finalize_session"):
+            return rpc_response(request)
+        return httpx.Response(201 if request.method == "POST" else 200, json=[])
+
+    db = DatabaseClient()
+    old = db.client.postgrest.session
+    db.client.postgrest.session = httpx.Client(base_url=old.base_url, headers=old.headers, transport=httpx.MockTransport(handler))
+    db.upserted = upserted
+    return db, calls
+
+
+def _finalize(db):
+    return db.finalize_session(uuid4(), 1.0, False, 1, _ANSWERS)
+
+
+def test_rpc_result_is_returned(monkeypatch):
+    db, calls = _client(monkeypatch, lambda r: httpx.Response(200, json={"algebra": {"total": 1, "correct": 1}}))
+    assert _finalize(db) == {"algebra": {"total": 1, "correct": 1}}
+    assert len(calls) == 1
+
+
+def test_missing_rpc_falls_back_to_insert(monkeypatch):
+    missing = {"code": "PGRST202", "message": "Could not find the function public.finalize_session", "details": None, "hint": None}
+    db, calls = _client(monkeypatch, lambda r: httpx.Response(404, json=missing))
+    assert _finalize(db) == {}
+    assert ("POST", "/rest/v1/session_answers") in calls
+    assert ("PATCH", "/rest/v1/sessions") in calls
+
+
+def test_timeout_does_not_insert_again(monkeypatch):
+    def timeout(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    db, calls = _client(monkeypatch, timeout)
+    assert _finalize(db) is None
+    assert all(path.endswith("/rpc/finalize_session") for _, path in calls)
+
+
+
+def test_upsert_questions_batch_inside_running_loop(monkeypatch):
+    db, calls = _client(monkeypatch)
+    rows = [{"id": "a", "text": "old"}, {"text": "no id"}, {"id": "b", "text": "b"}, {"id": "a", "text": "new"}]
+
+    async def from_async_code():
+        return db.upsert_questions_batch(rows, chunk_size=2)
+
+    assert asyncio.run(from_async_code()) == 3
+    assert sorted(r["text"] for r in db.upserted) == ["b", "new", "no id"]
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+db.py question reads against a fake PostgREST (httpx.MockTransport), so no Supabase is needed.
+Run: python -m pytest test_db_reads.py  (or python test_db_reads.py)
+"""
+import json
+import sys
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import httpx
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+import db
+from supabase import create_client
+
+_ROWS = {"q-1": {"id": "q-1", "text": "What is 2 + 2?", "options": ["3", "4"], "correct_answer_idx": 1}}
+
+
+def _postgrest(request: httpx.Request) -> httpx.Response:
+    """GET /questions?id=eq.<id>, answering object requests (.single()) the way PostgREST does: 406 unless exactly one row."""
+    qid = parse_qs(request.url.query.decode()).get("id", [""])[0].removeprefix("eq.")
+    rows = [_ROWS[qid]] if qid in _ROWS else []
+    if request.headers.get("accept") == "application/vnd.pgrst.object+json":
+        if len(rows) != 1:
+            body = {"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned", "details": "The result contains 0 rows", "hint": None}
+            return httpx.Response(406, json=body)
+        return httpx.Response(200, content=json.dumps(rows[0]))
+    return httpx.Response(200, json=rows)
+
+
+_POOL = [{"id": f"{cat}-{i}", "category": cat, "text": f"{cat} {i}"} for cat, n in (("gat", 12), ("subject", 5)) for i in range(n)]
+
+
+def _postgrest_no_rpcs(request: httpx.Request) -> httpx.Response:
+    """Database without supabase_migration_rpc_functions.sql: /rpc/* is PGRST202; filters category=eq / id=in."""
+    if "/rpc/" in request.url.path:
+        return httpx.Response(404, json={"code": "PGRST202", "message": "Could not find the function", "details": None, "hint": None})
+    params = parse_qs(request.url.query.decode())
+    rows = _POOL
+    if "category" in params:
+        rows = [r for r in rows if r["category"] == params["category"][0].removeprefix("eq.")]
+    if "id" in params:
+        wanted = set(params["id"][0].removeprefix("in.(").removesuffix(")").split(","))
+        rows = [r for r in rows if r["id"] in wanted]
+    return httpx.Response(200, json=rows)
+
+
+def _fake_client(handler=_postgrest):
+    client = create_client("http://localhost:54321", "test-key")
+    old = client.postgrest.session
+    client.postgrest.session = httpx.Client(base_url=old.base_url, headers=old.headers, transport=httpx.MockTransport(handler))
+    return client
+
+
+def _use_fake(monkeypatch, handler=_postgrest):
+    client = _fake_client(handler)
+    monkeypatch.setattr(db, "get_supabase", lambda: client)
+    db.clear_question_cache()
+
+
+def test_get_question_by_id_found(monkeypatch):
+    _use_fake(monkeypatch)
+    assert db.get_question_by_id("q-1")["text"] == "What is 2 + 2?"
+
+
+def test_get_question_by_id_deleted_row_is_none(monkeypatch):
+    # Drill Mode skips ids whose row was deleted mid-session; that relies on None here rather than an APIError
+    _use_fake(monkeypatch)
+    assert db.get_question_by_id("deleted-id") is None
+
+
+def test_mock_test_questions_without_rpcs(monkeypatch):
+    _use_fake(monkeypatch, _postgrest_no_rpcs)
+    picked = db.get_mock_test_questions(7, 3)
+    assert isinstance(picked, list)
+    assert sum(q["category"] == "gat" for q in picked) == 7
+    assert sum(q["category"] == "subject" for q in picked) == 3
+    assert len({q["id"] for q in picked}) == 10
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+TestSession's background answer writer against a fake DatabaseClient (no Supabase needed).
+Run: python -m pytest test_engine.py  (or python test_engine.py)
+"""
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import uuid4
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src import engine
+
+
+class _FakeDb:
+    """save_session_answers_bulk that follows a script of outcomes (True, False or an exception), then succeeds."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.saved = []
+        self._lock = threading.Lock()
+
+    def save_session_answers_bulk(self, session_id, answers):
+        with self._lock:
+            outcome = self.outcomes.pop(0) if self.outcomes else True
+            if isinstance(outcome, Exception):
+                raise outcome
+            if outcome:
+                self.saved.extend(answers)
+            return outcome
+
+
+def _session(db, n=7):
+    pool = [{"id": str(uuid4()), "category": "gat", "correct_answer_idx": 0} for _ in range(n)]
+    session = engine.TestSession(uuid4(), pool, db=db)
+    session.generate_questions()
+    for i, q in enumerate(session.questions):
+        session.submit_answer(q["id"], i % 2)
+    return session
+
+
+def test_all_answers_saved():
+    db = _FakeDb()
+    session = _session(db)
+    assert session.end_session()["answers_saved"] is True
+    assert len(db.saved) == 7
+    assert session.answer_records() == []
+
+
+def test_failed_batch_is_retried():
+    db = _FakeDb(False)
+    session = _session(db)
+    assert session.end_session()["answers_saved"] is True
+    assert sorted(a["question_id"] for a in db.saved) == sorted(q["id"] for q in session.questions)
+
+
+def test_writer_survives_an_exception():
+    db = _FakeDb(ConnectionError("reset by peer"))
+    session = _session(db)
+    assert session.end_session()["answers_saved"] is True
+    assert len(db.saved) == 7
+
+
+def test_unsaved_answers_are_reported():
+    db = _FakeDb(*[False] * 10)
+    session = _session(db)
+    result = session.end_session()
+    assert result["answers_saved"] is False
+    assert db.saved == []
+    assert sorted(r["question_id"] for r in session.answer_records()) == sorted(q["id"] for q in session.questions)
+
+
+def test_without_db_nothing_is_saved():
+    session = _session(None, n=3)
+    assert session.end_session()["answers_saved"] is False
+    assert len(session.answer_records()) == 3
+
+
+
+def test_priority_weights_formula():
+    # Priority = fail_count * 2 + whole days since last attempt; 999 days if never attempted; floor of 0.1
+    now = datetime.now(timezone.utc)
+    session = engine.TestSession(uuid4(), [])
+    weights = session._priority_weights([
+        {"fail_count": 3, "last_attempted_at": (now - timedelta(days=2, hours=5)).isoformat()},
+        {"fail_count": 0, "last_attempted_at": None},
+        {"fail_count": 1, "last_attempted_at": (now - timedelta(days=4)).replace(tzinfo=None)},
+        {"fail_count": 0, "last_attempted_at": now.isoformat().replace("+00:00", "Z")},
+    ])
+    assert weights.tolist() == [8.0, 999.0, 6.0, 0.1]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
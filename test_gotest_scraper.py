@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the pure helpers in src/gotest_live_scraper.py (no browser, no DB).
+Run: python -m pytest test_gotest_scraper.py  (or python test_gotest_scraper.py)
+"""
+import sys
+from pathlib import Path
+from uuid import NAMESPACE_DNS, uuid5
+
+from bs4 import BeautifulSoup
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.gotest_live_scraper import _CORRECT_COMMENT_HTML_RE, _is_correct_comment, _letter_index, _replay_submit_fields, _row_id, _submit_response_html
+
+
+def test_replay_submit_fields_retargets_only_the_radio_fields():
+    tpl = {
+        "name": "answer-12",
+        "value": "901",
+        "fields": [
+            ("action", "watupro_submit"),
+            ("quiz_id", "12"),
+            ("answer-12", "901"),
+            ("answer-12[]", "901"),
+            ("page", "901"),
+        ],
+    }
+    assert _replay_submit_fields(tpl, "answer-13", "1001") == [
+        ("action", "watupro_submit"),
+        ("quiz_id", "12"),
+        ("answer-13", "1001"),
+        ("answer-13[]", "1001"),
+        ("page", "901"),
+    ]
+
+
+def test_replay_submit_fields_leaves_similar_names_alone():
+    tpl = {"name": "answer-1", "value": "5", "fields": [("answer-12", "5"), ("answer-1", "5")]}
+    assert _replay_submit_fields(tpl, "answer-2", "7") == [("answer-12", "5"), ("answer-2", "7")]
+
+
+def test_submit_response_html_passes_html_through():
+    assert _submit_response_html('  <div id="question-1">x</div>\n') == '<div id="question-1">x</div>'
+
+
+def test_submit_response_html_flattens_json_strings():
+    out = _submit_response_html('{"ok": 1, "html": "<div class=\\"correct-answer\\">B</div>", "parts": ["<p>Explanation: y</p>"]}')
+    assert '<div class="correct-answer">B</div>' in out
+    assert "<p>Explanation: y</p>" in out
+
+
+def test_submit_response_html_keeps_invalid_json_as_is():
+    assert _submit_response_html("{not json") == "{not json"
+
+
+def test_letter_index_first_match_and_clamp():
+    assert _letter_index(4, "Correct Answer: C. Later: Correct Answer: A") == 2
+    assert _letter_index(2, "correct answer: d") == 1
+    assert _letter_index(4, "(b) correct") == 1
+    assert _letter_index(4, "no answer letter here") == -1
+
+
+def test_row_id_matches_uuid5():
+    long_text = "Solve for x: " + "3x + 2 = 11; " * 40 + "é" * 50
+    for s, t in [
+        ("algebra_equations", "What is 2 + 2?"),
+        ("algebra_equations", ""),
+        ("word_problems_algebra", long_text),
+        ("general", "Ünïcödé — “quotes” and 数学"),
+        ("algebra_polynomials", long_text[:199] + "é"),
+    ]:
+        assert _row_id(s, t) == str(uuid5(NAMESPACE_DNS, f"gotest_{s}_{t[:200]}"))
+
+
+
+def test_correct_comment_predicate_and_precheck_agree():
+    for html, expected in [
+        ("<li>A<!-- correct-answer --></li>", True),
+        ("<li>A<!-- Correct_Answer --></li>", True),
+        ("<li>A<!-- wrong --></li>", False),
+        ("<li class='correct-answer'>A</li>", False),
+    ]:
+        found = BeautifulSoup(html, "html.parser").find_all(string=_is_correct_comment)
+        assert bool(found) is expected
+        assert bool(_CORRECT_COMMENT_HTML_RE.search(html)) is expected
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
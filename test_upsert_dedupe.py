@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Repeated ids in an import keep the LAST row (db._dedupe_by_id, db.upsert_questions_stream, importer.skip_unchanged).
+No Supabase needed: the client is a fake that applies upserts to a dict.
+Run: python -m pytest test_upsert_dedupe.py  (or python test_upsert_dedupe.py)
+"""
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from db import _dedupe_by_id, upsert_questions_stream
+from importer import skip_unchanged
+
+
+class _FakeUpsert:
+    """One upsert(...) call's builder: holds its own rows, so concurrent workers never execute each other's."""
+
+    def __init__(self, client, rows):
+        self._client = client
+        self._rows = list(rows)
+
+    def execute(self):
+        with self._client._lock:
+            for r in self._rows:
+                self._client.db[r["id"]] = r
+
+
+class _FakeClient:
+    """Just enough of supabase.Client for table("questions").upsert(rows, on_conflict="id").execute()."""
+
+    def __init__(self):
+        self.db = {}
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        return _FakeUpsert(self, rows)
+
+
+def _rows():
+    # id "a" repeats inside one chunk, id "b" repeats after its chunk was queued (chunk_size=2)
+    return [
+        {"id": "a", "text": "a-old"},
+        {"id": "a", "text": "a-new"},
+        {"id": "b", "text": "b-old"},
+        {"id": "c", "text": "c"},
+        {"id": "d", "text": "d"},
+        {"id": "b", "text": "b-new"},
+    ]
+
+
+def test_dedupe_by_id_keeps_last():
+    assert [r["text"] for r in _dedupe_by_id(_rows())] == ["a-new", "c", "d", "b-new"]
+
+
+def test_upsert_questions_stream_keeps_last():
+    client = _FakeClient()
+    upsert_questions_stream(client, iter(_rows()), chunk_size=2)
+    assert {k: v["text"] for k, v in client.db.items()} == {"a": "a-new", "b": "b-new", "c": "c", "d": "d"}
+
+
+def test_skip_unchanged_keeps_last():
+    cache = sqlite3.connect(":memory:")
+    cache.execute("CREATE TABLE IF NOT EXISTS h(id TEXT PRIMARY KEY, h BLOB)")
+    # First import stores the hashes of the final versions
+    pending = []
+    first = list(skip_unchanged(cache, iter(_rows()), pending, batch=2))
+    cache.executemany("INSERT OR REPLACE INTO h VALUES (?, ?)", pending)
+    client = _FakeClient()
+    upsert_questions_stream(client, iter(first), chunk_size=2)
+    assert client.db["b"]["text"] == "b-new"
+    # Re-import of the same file: whatever is re-sent, the DB still ends on the last occurrence
+    pending = []
+    again = list(skip_unchanged(cache, iter(_rows()), pending, batch=2))
+    client2 = _FakeClient()
+    client2.db = dict(client.db)
+    upsert_questions_stream(client2, iter(again), chunk_size=2)
+    assert {k: v["text"] for k, v in client2.db.items()} == {"a": "a-new", "b": "b-new", "c": "c", "d": "d"}
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")